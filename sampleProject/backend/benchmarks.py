@@ -0,0 +1,369 @@
+"""
+Timing helpers and seed data for the benchmark management commands.
+
+Seeded rows carry Aadhars (and seeded stock lines brand names) starting with
+SEED_PREFIX so they can be told apart from real data and purged again.
+"""
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from functools import cache
+from io import BytesIO
+
+import openpyxl
+from django.db import connection, transaction
+
+from . import latest, sequences
+from .models import (
+    Appointment, AutoimmuneTest, CTReport, CoagulationTest, Consultation, CultureSensitivityTest, DailyQuantity,
+    DailySequence, Dashboard, EnzymesCardiacProfile, FitnessAssessment, LatestRecord, LipidProfile,
+    LiverFunctionTest, MRIReport, MensPack, MotionTest, OccupationalProfile, OphthalmicReport, OthersTest,
+    PharmacyStock, PharmacyStockHistory, Prescription, RenalFunctionTest, RoutineSugarTests, SerologyTest,
+    ThyroidFunctionTest, USGReport, UrineRoutineTest, WomensPack, XRay, employee_details, heamatalogy, vitals,
+)
+from .numeric import sync_numeric_fields
+from .views import BASIC_DETAILS_MAP, HAEMATOLOGY_MAP, SUGAR_TESTS_MAP
+
+SEED_PREFIX = 'BENCH'
+SEED_BATCH_SIZE = 1000
+BENCH_BOOKED_BY = 'bench_appointment_numbers'
+
+# Investigations done at every visit; each of the others is done at INVESTIGATION_SHARE of the visits
+ROUTINE_INVESTIGATIONS = [heamatalogy, RoutineSugarTests]
+OTHER_INVESTIGATIONS = [
+    RenalFunctionTest, LipidProfile, LiverFunctionTest, ThyroidFunctionTest, AutoimmuneTest, CoagulationTest,
+    EnzymesCardiacProfile, UrineRoutineTest, SerologyTest, MotionTest, CultureSensitivityTest, MensPack,
+    WomensPack, OccupationalProfile, OthersTest, OphthalmicReport, XRay, USGReport, CTReport, MRIReport,
+]
+INVESTIGATION_SHARE = 0.2
+PRESCRIPTION_SHARE = 0.5  # of curative visits
+VISIT_MODELS = [Dashboard, vitals, Consultation, FitnessAssessment, Prescription] + ROUTINE_INVESTIGATIONS + OTHER_INVESTIGATIONS
+SEEDED_MODELS = [employee_details] + VISIT_MODELS
+MEDICINE_FORMS = ['Tablet', 'Syrup', 'Injection', 'Creams', 'Drops']
+DEPARTMENTS = ['Production', 'Maintenance', 'Electrical', 'Stores', 'Quality', 'Administration']
+REPORT_FINDINGS = ['Normal', 'Normal', 'Normal', 'Abnormal']
+
+
+def time_call(fn, repeat=5, warmup=1):
+    """ Runs fn warmup + repeat times; returns min/median/max of the timed runs in ms. """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'min': min(samples), 'median': statistics.median(samples), 'max': max(samples)}
+
+
+def format_ms(value):
+    return f"{value:9.2f} ms"
+
+
+def seeded_aadhar(n):
+    return f"{SEED_PREFIX}{n:08d}"
+
+
+def seed_visits(workers, visits_per_worker, start_date=None):
+    """
+    Bulk-creates `workers` synthetic workers with `visits_per_worker` visits
+    each (Dashboard, vitals, heamatalogy and Consultation rows sharing an MRD
+    number), spread over the last two years. Returns the number of visits.
+    """
+    rng = random.Random(workers * 1000 + visits_per_worker)
+    start_date = start_date or date.today() - timedelta(days=730)
+    visit = 0
+    batch = {model: [] for model in (employee_details, Dashboard, vitals, heamatalogy, Consultation)}
+
+    for n in range(workers):
+        aadhar = seeded_aadhar(n)
+        batch[employee_details].append(employee_details(
+            name=f"Bench Worker {n}", aadhar=aadhar, emp_no=f"B{n}",
+            sex=rng.choice(['Male', 'Female']), type='Staff',
+        ))
+        for _ in range(visits_per_worker):
+            visit += 1
+            mrd = f"{SEED_PREFIX}{visit:010d}"
+            day = start_date + timedelta(days=rng.randrange(730))
+            batch[Dashboard].append(Dashboard(aadhar=aadhar, mrdNo=mrd, date=day, type='Employee', register='Annual / Periodical'))
+            batch[vitals].append(vitals(aadhar=aadhar, mrdNo=mrd, systolic=str(rng.randint(100, 160)), diastolic=str(rng.randint(60, 100))))
+            batch[heamatalogy].append(heamatalogy(aadhar=aadhar, mrdNo=mrd, hemoglobin=str(round(rng.uniform(10, 17), 1))))
+            batch[Consultation].append(Consultation(aadhar=aadhar, mrdNo=mrd, entry_date=day, status='completed'))
+        if len(batch[Dashboard]) >= SEED_BATCH_SIZE:
+            _bulk_seed(batch)
+    _bulk_seed(batch)
+    return visit
+
+
+@cache
+def result_fields(model):
+    """ (field name, numeric) of every result an investigation model records: the fields with a _comments column. """
+    names = [field.name for field in model._meta.concrete_fields]
+    return [(name, f"{name}_unit" in names) for name in names if f"{name}_comments" in names]
+
+
+def investigation(model, rng, **keys):
+    """ An unsaved investigation row with every result filled in: a number when it has a unit, else a finding. """
+    results = {
+        name: str(round(rng.uniform(1, 200), 1)) if numeric else rng.choice(REPORT_FINDINGS)
+        for name, numeric in result_fields(model)
+    }
+    return model(**keys, **results)
+
+
+def seeded_medicine(n):
+    """ The stock line seed_pharmacy() creates for n. """
+    return {
+        'medicine_form': MEDICINE_FORMS[n % len(MEDICINE_FORMS)],
+        'brand_name': f"{SEED_PREFIX} Brand {n}",
+        'chemical_name': f"{SEED_PREFIX} Chemical {n // 3}",  # a few brands per chemical
+        'dose_volume': f"{(n % 4 + 1) * 125} mg",
+    }
+
+
+def _bulk_seed(batch):
+    """ Inserts the pending rows of every model in one transaction, with their numeric shadows and pointers. """
+    with transaction.atomic():
+        for model, rows in batch.items():
+            if rows:
+                for row in rows:
+                    sync_numeric_fields(row)
+                model.objects.bulk_create(rows, batch_size=SEED_BATCH_SIZE)
+                latest.refresh(model, {row.aadhar for row in rows})
+                rows.clear()
+
+
+def seed_synthetic(workers, visits_per_worker, stock_lines=0, first=0, start_date=None):
+    """
+    Bulk-creates synthetic workers numbered first .. first + workers - 1, each
+    with `visits_per_worker` visits spread over the last two years. Every visit
+    has a Dashboard, vitals, Consultation and the ROUTINE_INVESTIGATIONS rows;
+    each other investigation is added to INVESTIGATION_SHARE of the visits.
+    Preventive visits get a FitnessAssessment, and PRESCRIPTION_SHARE of the
+    curative ones a Prescription of stock lines below `stock_lines` (see
+    seed_pharmacy). Seeding more workers later with `first` set past the
+    earlier ones grows the same data set. Returns the number of visits.
+    """
+    rng = random.Random(first * 1000 + workers + visits_per_worker)
+    start_date = start_date or date.today() - timedelta(days=730)
+    visits = 0
+    batch = {model: [] for model in SEEDED_MODELS}
+
+    for n in range(first, first + workers):
+        aadhar = seeded_aadhar(n)
+        worker_type = rng.choices(['Employee', 'Contractor', 'Visitor'], weights=[70, 25, 5])[0]
+        batch[employee_details].append(employee_details(
+            name=f"Bench Worker {n}", aadhar=aadhar, emp_no=f"B{n}", type=worker_type,
+            sex=rng.choice(['Male', 'Female']), dob=date(1965, 1, 1) + timedelta(days=rng.randrange(14600)),
+            department=rng.choice(DEPARTMENTS), designation='Operator', bloodgrp=rng.choice(['A+', 'B+', 'O+', 'AB+']),
+            entry_date=start_date,
+        ))
+        for v in range(visits_per_worker):
+            visits += 1
+            keys = {'aadhar': aadhar, 'emp_no': f"B{n}", 'mrdNo': f"{SEED_PREFIX}{n:08d}{v:03d}"}
+            day = start_date + timedelta(days=rng.randrange(730))
+            preventive = rng.random() < 0.6
+            batch[Dashboard].append(Dashboard(
+                date=day, type=worker_type, type_of_visit='Preventive' if preventive else 'Curative',
+                register='Annual / Periodical' if preventive else 'Illness', **keys,
+            ))
+            batch[vitals].append(vitals(
+                systolic=str(rng.randint(100, 160)), diastolic=str(rng.randint(60, 100)),
+                pulse=str(rng.randint(60, 100)), **keys,
+            ))
+            batch[Consultation].append(Consultation(entry_date=day, status='completed', complaints='Routine', **keys))
+            for model in ROUTINE_INVESTIGATIONS:
+                batch[model].append(investigation(model, rng, **keys))
+            for model in OTHER_INVESTIGATIONS:
+                if rng.random() < INVESTIGATION_SHARE:
+                    batch[model].append(investigation(model, rng, **keys))
+            if preventive:
+                batch[FitnessAssessment].append(FitnessAssessment(status='completed', overall_fitness='fit', **keys))
+            elif stock_lines and rng.random() < PRESCRIPTION_SHARE:
+                tablets = [
+                    {'chemicalName': medicine['chemical_name'], 'brandName': medicine['brand_name'],
+                     'doseVolume': medicine['dose_volume'], 'qty': rng.randint(1, 10)}
+                    for medicine in map(seeded_medicine, rng.sample(range(stock_lines), min(3, stock_lines)))
+                ]
+                batch[Prescription].append(Prescription(
+                    name=f"Bench Worker {n}", tablets=tablets, submitted_by='bench', issued_by='bench', **keys,
+                ))
+        if len(batch[Dashboard]) >= SEED_BATCH_SIZE:
+            _bulk_seed(batch)
+    _bulk_seed(batch)
+    return visits
+
+
+def seed_pharmacy(stock_lines, days=90):
+    """
+    Bulk-creates `stock_lines` stock lines (seeded_medicine(0..)), each with its
+    PharmacyStockHistory row, and a DailyQuantity for roughly two days in three
+    of the last `days` days. Returns the number of DailyQuantity rows.
+    """
+    rng = random.Random(stock_lines * 1000 + days)
+    today = date.today()
+    stock, history, daily = [], [], []
+    for n in range(stock_lines):
+        medicine = seeded_medicine(n)
+        expiry = today + timedelta(days=rng.randrange(30, 720))
+        total = rng.randint(100, 1000)
+        stock.append(PharmacyStock(total_quantity=total, quantity=rng.randint(0, total), expiry_date=expiry,
+                                   batch_number=f"B{n}", **medicine))
+        history.append(PharmacyStockHistory(total_quantity=total, expiry_date=expiry, batch_number=f"B{n}", **medicine))
+        daily.extend(
+            DailyQuantity(chemical_name=medicine['chemical_name'], brand_name=medicine['brand_name'],
+                          dose_volume=medicine['dose_volume'], expiry_date=expiry,
+                          date=today - timedelta(days=day), quantity=rng.randint(1, 20))
+            for day in range(days) if rng.random() < 0.66
+        )
+    with transaction.atomic():
+        for model, rows in ((PharmacyStock, stock), (PharmacyStockHistory, history), (DailyQuantity, daily)):
+            model.objects.bulk_create(rows, batch_size=SEED_BATCH_SIZE)
+    return len(daily)
+
+
+def _workbook_bytes(header_rows, data_rows):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in header_rows + data_rows:
+        sheet.append(row)
+    out = BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def hr_workbook(workers, first=0):
+    """ An hrupload/employee sheet (two header rows) re-sending seeded workers first .. first + workers - 1. """
+    columns = [
+        ('BASIC DETAILS', 'Aadhar / Doc No.-Foreigner'), ('BASIC DETAILS', 'NAME'), ('BASIC DETAILS', 'Sex'),
+        ('Employment Details', 'Employee Number'), ('Employment Details', 'Department'),
+        ('Contact Details', 'Phone (Personal)'),
+    ]
+    rows = [
+        [seeded_aadhar(n), f"Bench Worker {n}", 'Male' if n % 2 else 'Female', f"B{n}",
+         DEPARTMENTS[n % len(DEPARTMENTS)], f"9{n:09d}"]
+        for n in range(first, first + workers)
+    ]
+    return _workbook_bytes([[level for level, _ in columns], [name for _, name in columns]], rows)
+
+
+def medical_workbook(workers, first=0, year='2025', batch='BENCH', hospital='Bench Hospital'):
+    """
+    A medical_upload camp sheet (three header rows) with haematology and sugar
+    results for seeded workers first .. first + workers - 1.
+    """
+    rng = random.Random(workers + first)
+    headers = list(BASIC_DETAILS_MAP.values()) + [
+        header for test_map in (HAEMATOLOGY_MAP, SUGAR_TESTS_MAP) for header in test_map.values()
+        if header.endswith('_RESULT')
+    ]
+    keys = {BASIC_DETAILS_MAP['year']: year, BASIC_DETAILS_MAP['batch']: batch, BASIC_DETAILS_MAP['hospitalName']: hospital}
+    rows = [
+        [
+            seeded_aadhar(n) if header == BASIC_DETAILS_MAP['aadhar'] else keys.get(header, round(rng.uniform(1, 200), 1))
+            for header in headers
+        ]
+        for n in range(first, first + workers)
+    ]
+    levels = [header.split('_', 2) for header in headers]
+    return _workbook_bytes([[parts[i] for parts in levels] for i in range(3)], rows)
+
+
+def purge_seeded():
+    """ Deletes every seeded row and its LatestRecord pointers. Returns the number of rows deleted. """
+    deleted = 0
+    with transaction.atomic():
+        for model in SEEDED_MODELS:
+            # A plain DELETE: the post_delete receivers would refresh pointers
+            # row by row, and the pointers are removed wholesale below anyway.
+            rows = model.objects.filter(aadhar__startswith=SEED_PREFIX)
+            deleted += rows._raw_delete(rows.db)
+        for model in (PharmacyStock, PharmacyStockHistory, DailyQuantity):
+            rows = model.objects.filter(brand_name__startswith=SEED_PREFIX)
+            deleted += rows._raw_delete(rows.db)
+        LatestRecord.objects.filter(aadhar__startswith=SEED_PREFIX).delete()
+    return deleted
+
+
+@contextmanager
+def indexes_dropped(models):
+    """
+    Temporarily drops the Meta.indexes of the given models, restoring them on
+    exit. Only meant for benchmark databases: on MySQL every drop and re-create
+    is a DDL statement that rebuilds the index on the whole table.
+    """
+    dropped = []
+    try:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+                    dropped.append((model, index))
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+
+
+def legacy_appointment_no(day):
+    """ The count-based numbering BookAppointment used before backend.sequences, kept for comparison. """
+    with transaction.atomic():
+        count = Appointment.objects.filter(date=day).select_for_update().count()
+    return f"{count + 1:04d}{day.strftime('%d%m%Y')}"
+
+
+def book_in_parallel(allocate, day, threads, bookings):
+    """
+    Books `bookings` appointments on `day` from each of `threads` threads,
+    numbering each with allocate(day) and saving it straight after, as
+    BookAppointment does. Returns (latencies in ms, error messages).
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker(n):
+        try:
+            start.wait()
+            for i in range(bookings):
+                began = time.perf_counter()
+                try:
+                    Appointment.objects.create(
+                        appointment_no=allocate(day), date=day, aadhar=seeded_aadhar(n),
+                        name=f"Bench Booking {n}-{i}", booked_by=BENCH_BOOKED_BY,
+                    )
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - began) * 1000)
+        finally:
+            connection.close()  # each thread has its own connection
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, errors
+
+
+def duplicate_appointment_numbers(day):
+    """ Appointment numbers issued more than once on `day`, with their counts. """
+    seen = {}
+    for appointment_no in Appointment.objects.filter(date=day).values_list('appointment_no', flat=True):
+        seen[appointment_no] = seen.get(appointment_no, 0) + 1
+    return {appointment_no: n for appointment_no, n in seen.items() if n > 1}
+
+
+def purge_bench_bookings(day):
+    """ Deletes the benchmark's appointments on `day` and the day's appointment sequence. """
+    with transaction.atomic():
+        deleted, _ = Appointment.objects.filter(date=day, booked_by=BENCH_BOOKED_BY).delete()
+        DailySequence.objects.filter(name=sequences.APPOINTMENT_SEQUENCE, day=day).delete()
+    return deleted
@@ -0,0 +1,291 @@
+"""
+In-process bitmap index over the latest record of every worker.
+
+Most cohort criteria are low-cardinality attributes (sex, blood group, habits,
+fitness verdict, BMI status, ...). For each attribute value the index keeps a
+NumPy boolean array with one slot per worker, built from the rows LatestRecord
+points at. AND / OR / NOT cohort expressions are then answered with bitwise
+operations, without touching the source tables.
+
+The index is built on first use and kept current incrementally: every query
+first reads the LatestRecord pointers whose updated_at passed the index's
+watermark and re-reads only those rows (backend.latest restamps a pointer on
+every write to its row, in place or not). Two kinds of change cannot be seen
+through the watermark:
+
+- removed pointers (a worker's last row of a model deleted), and pointers
+  stamped by a transaction that committed more than REFRESH_OVERLAP after its
+  write. A fingerprint of the pointer table (row count and the sums of the
+  pointer and record ids) that differs from the index's own triggers a full
+  rebuild for those, whether or not a new pointer made up for the count.
+- a row rewritten in place by such a late commit, which leaves the fingerprint
+  alone. The index is rebuilt at least every REBUILD_INTERVAL to bound that.
+
+Cohort answers are therefore exact for committed writes, except for rows
+rewritten in place by transactions longer than REFRESH_OVERLAP, which show up
+within REBUILD_INTERVAL.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.apps import apps
+from django.db.models import Count, Sum
+
+from .models import LatestRecord
+
+logger = logging.getLogger(__name__)
+
+# How far behind the watermark refresh() looks again, so rows stamped by a
+# transaction that committed after a later one are not missed.
+REFRESH_OVERLAP = timedelta(seconds=30)
+REBUILD_INTERVAL = 15 * 60  # seconds
+INITIAL_CAPACITY = 1024
+FETCH_CHUNK_SIZE = 1000
+
+
+def normalize(value):
+    """ Case- and whitespace-insensitive key for attribute values. """
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+def _json_path(*keys):
+    def extract(row, field):
+        value = row[field]
+        for key in keys:
+            if not isinstance(value, dict):
+                return []
+            value = value.get(key)
+        return [value]
+    return extract
+
+
+def _json_list_key(key):
+    def extract(row, field):
+        value = row[field]
+        if not isinstance(value, list):
+            return []
+        return [item.get(key) for item in value if isinstance(item, dict)]
+    return extract
+
+
+def _column(row, field):
+    return [row[field]]
+
+
+# name, source model, source field, extractor(row, field) -> iterable of raw values
+BitmapAttribute = namedtuple('BitmapAttribute', 'name model field extract')
+
+BITMAP_ATTRIBUTES = [
+    BitmapAttribute('sex', 'employee_details', 'sex', _column),
+    BitmapAttribute('bloodgrp', 'employee_details', 'bloodgrp', _column),
+    BitmapAttribute('role', 'employee_details', 'type', _column),
+    BitmapAttribute('status', 'employee_details', 'status', _column),
+    BitmapAttribute('marital_status', 'employee_details', 'marital_status', _column),
+    BitmapAttribute('smoking', 'MedicalHistory', 'personal_history', _json_path('smoking', 'yesNo')),
+    BitmapAttribute('alcohol', 'MedicalHistory', 'personal_history', _json_path('alcohol', 'yesNo')),
+    BitmapAttribute('paan/beetle', 'MedicalHistory', 'personal_history', _json_path('paan/beetle', 'yesNo')),
+    BitmapAttribute('overall_fitness', 'FitnessAssessment', 'overall_fitness', _column),
+    BitmapAttribute('fitness_special_cases', 'FitnessAssessment', 'special_cases', _column),
+    BitmapAttribute('consultation_special_cases', 'Consultation', 'special_cases', _column),
+    BitmapAttribute('bmi_status', 'vitals', 'bmi_status', _column),
+    BitmapAttribute('vaccine_status', 'VaccinationRecord', 'vaccination', _json_list_key('status')),
+]
+
+# Workers are the Aadhars with an employee_details record
+WORKER_MODEL = 'employee_details'
+
+
+class CohortQueryError(ValueError):
+    pass
+
+
+class BitmapIndex:
+    def __init__(self, attributes):
+        self.attributes = {attr.name: attr for attr in attributes}
+        self._by_model = defaultdict(list)
+        for attr in attributes:
+            self._by_model[attr.model].append(attr)
+        self._by_model.setdefault(WORKER_MODEL, [])  # workers are tracked even without attributes
+        self._lock = threading.RLock()
+        self._built = False
+
+    def _reset(self):
+        self._slots = {}
+        self._aadhars = []
+        self._capacity = INITIAL_CAPACITY
+        self._bitmaps = {name: {} for name in self.attributes}
+        self._workers = np.zeros(self._capacity, dtype=bool)
+        self._pointers = {}  # (model_label, aadhar) -> (pointer id, record id)
+        self._watermark = None
+        self._built_at = time.monotonic()
+
+    # -- maintenance -------------------------------------------------------
+
+    def _slot(self, aadhar):
+        slot = self._slots.get(aadhar)
+        if slot is None:
+            slot = len(self._aadhars)
+            if slot >= self._capacity:
+                self._grow(self._capacity * 2)
+            self._slots[aadhar] = slot
+            self._aadhars.append(aadhar)
+        return slot
+
+    def _grow(self, capacity):
+        def grown(array):
+            bigger = np.zeros(capacity, dtype=bool)
+            bigger[:len(array)] = array
+            return bigger
+        self._workers = grown(self._workers)
+        for values in self._bitmaps.values():
+            for value in values:
+                values[value] = grown(values[value])
+        self._capacity = capacity
+
+    def _apply(self, model_name, rows):
+        """ Writes the attribute values of the given latest rows into the bitmaps. """
+        attributes = self._by_model[model_name]
+        for row in rows:
+            slot = self._slot(row['aadhar'])
+            if model_name == WORKER_MODEL:
+                self._workers[slot] = True
+            for attr in attributes:
+                values = self._bitmaps[attr.name]
+                for bitmap in values.values():
+                    bitmap[slot] = False
+                for raw in attr.extract(row, attr.field):
+                    value = normalize(raw)
+                    if value is None:
+                        continue
+                    if value not in values:
+                        values[value] = np.zeros(self._capacity, dtype=bool)
+                    values[value][slot] = True
+
+    def _load(self, pointers):
+        """ pointers: iterable of (pointer id, model_label, aadhar, record_id) to (re)apply. """
+        ids_by_label = defaultdict(list)
+        for pointer_id, label, aadhar, record_id in pointers:
+            ids_by_label[label].append(record_id)
+            self._pointers[(label, aadhar)] = (pointer_id, record_id)
+        for model_name in self._by_model:
+            model = apps.get_model('backend', model_name)
+            ids = ids_by_label.get(model._meta.label_lower)
+            if not ids:
+                continue
+            fields = ['aadhar'] + sorted({attr.field for attr in self._by_model[model_name]})
+            for start in range(0, len(ids), FETCH_CHUNK_SIZE):
+                rows = model.objects.filter(id__in=ids[start:start + FETCH_CHUNK_SIZE]).values(*fields)
+                self._apply(model_name, rows)
+
+    def _labels(self):
+        return [apps.get_model('backend', name)._meta.label_lower for name in self._by_model]
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            pointers = LatestRecord.objects.filter(model_label__in=self._labels())
+            self._watermark = pointers.order_by('-updated_at').values_list('updated_at', flat=True).first()
+            self._load(pointers.values_list('id', 'model_label', 'aadhar', 'record_id'))
+            self._built = True
+            logger.info(f"Bitmap index rebuilt: {len(self._aadhars)} workers, {len(self._pointers)} pointers")
+
+    def _fingerprint(self):
+        return (
+            len(self._pointers),
+            sum(pointer_id for pointer_id, _ in self._pointers.values()),
+            sum(record_id for _, record_id in self._pointers.values()),
+        )
+
+    def refresh(self):
+        """ Brings the index up to date with LatestRecord; builds it on first use. """
+        with self._lock:
+            if not self._built or time.monotonic() - self._built_at > REBUILD_INTERVAL:
+                self.rebuild()
+                return
+            pointers = LatestRecord.objects.filter(model_label__in=self._labels())
+            changed = pointers
+            if self._watermark is not None:
+                changed = pointers.filter(updated_at__gte=self._watermark - REFRESH_OVERLAP)
+            changed = list(changed.values_list('id', 'model_label', 'aadhar', 'record_id', 'updated_at'))
+            if changed:
+                self._watermark = max(filter(None, [self._watermark] + [row[4] for row in changed]))
+                self._load(row[:4] for row in changed)
+            # Once every change is applied the index holds exactly the table's pointers; anything
+            # else is a deleted pointer or a write the watermark missed
+            totals = pointers.aggregate(total=Count('id'), ids=Sum('id'), records=Sum('record_id'))
+            if (totals['total'], totals['ids'] or 0, totals['records'] or 0) != self._fingerprint():
+                self.rebuild()
+
+    # -- queries -----------------------------------------------------------
+
+    def _leaf(self, attr_name, values):
+        if attr_name not in self.attributes:
+            raise CohortQueryError(f"Unknown attribute '{attr_name}'. Available: {', '.join(self.attributes)}")
+        result = np.zeros(self._capacity, dtype=bool)
+        bitmaps = self._bitmaps[attr_name]
+        for value in values:
+            bitmap = bitmaps.get(normalize(value))
+            if bitmap is not None:
+                result |= bitmap
+        return result
+
+    def _evaluate(self, expr):
+        if not isinstance(expr, dict):
+            raise CohortQueryError("Each cohort expression must be an object.")
+        if 'and' in expr or 'or' in expr:
+            op = 'and' if 'and' in expr else 'or'
+            parts = expr[op]
+            if not isinstance(parts, list) or not parts:
+                raise CohortQueryError(f"'{op}' needs a non-empty list.")
+            result = self._evaluate(parts[0])
+            for part in parts[1:]:
+                if op == 'and':
+                    result &= self._evaluate(part)
+                else:
+                    result |= self._evaluate(part)
+            return result
+        if 'not' in expr:
+            return ~self._evaluate(expr['not'])
+        if 'attr' in expr:
+            if 'in' in expr:
+                values = expr['in']
+                if not isinstance(values, list):
+                    raise CohortQueryError("'in' needs a list of values.")
+            elif 'value' in expr:
+                values = [expr['value']]
+            else:
+                raise CohortQueryError("An 'attr' expression needs 'value' or 'in'.")
+            return self._leaf(expr['attr'], values)
+        raise CohortQueryError("Expected one of 'and', 'or', 'not' or 'attr'.")
+
+    def match(self, expr):
+        """
+        Aadhars of the workers matching a cohort expression, e.g.
+        {"and": [{"attr": "sex", "value": "Male"},
+                 {"or": [{"attr": "smoking", "value": "Yes"}, {"attr": "alcohol", "value": "Yes"}]},
+                 {"not": {"attr": "overall_fitness", "value": "fit"}}]}
+        Values compare case-insensitively, ignoring surrounding whitespace.
+        """
+        with self._lock:
+            self.refresh()
+            mask = self._evaluate(expr) & self._workers
+            return [self._aadhars[slot] for slot in np.flatnonzero(mask[:len(self._aadhars)])]
+
+    def value_counts(self):
+        """ {attribute: {value: worker count}} for the current index. """
+        with self._lock:
+            self.refresh()
+            return {
+                name: {value: int(np.count_nonzero(bitmap & self._workers)) for value, bitmap in values.items()}
+                for name, values in self._bitmaps.items()
+            }
+
+
+cohort_index = BitmapIndex(BITMAP_ATTRIBUTES)
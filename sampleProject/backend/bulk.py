@@ -0,0 +1,113 @@
+"""
+Batched update_or_create for import paths.
+
+BulkUpserter collects (lookup, defaults) pairs for one model and applies them
+with a handful of queries per chunk instead of a SELECT plus an INSERT/UPDATE
+per row:
+
+    upserter = BulkUpserter(heamatalogy)
+    for row in rows:
+        upserter.add({'aadhar': ..., 'entry_date': ..., 'mrdNo': ...}, defaults)
+    created, updated = upserter.flush()
+
+Results match calling update_or_create() for each pair in order: a lookup
+seen twice merges its defaults (later values win), fields with auto_now are
+refreshed on update, numeric shadow columns are re-parsed, and LatestRecord
+pointers move for the created rows. Where several rows already match one
+lookup, the newest (highest id) is updated instead of raising
+MultipleObjectsReturned.
+
+Text lookup values compare as the MySQL collation does, ignoring case and
+trailing spaces: pending lookups that differ only that way are merged, and
+the rows the database returns for a chunk are paired with its lookups on
+those folded values, so 'abc ' updates the existing 'ABC' row rather than
+creating a duplicate.
+
+The tables have no unique constraint on the lookup fields, so the database's
+native upsert (INSERT ... ON DUPLICATE KEY UPDATE) cannot be used here.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from . import latest
+from .numeric import sync_numeric_fields, with_numeric_shadows
+
+UPSERT_CHUNK_SIZE = 500
+
+
+def fold(value):
+    """ A lookup value as the case-insensitive, PAD SPACE collation compares it. """
+    return value.rstrip(' ').casefold() if isinstance(value, str) else value
+
+
+def lookup_key(lookup):
+    return tuple(sorted((field, fold(value)) for field, value in lookup.items()))
+
+
+class BulkUpserter:
+    def __init__(self, model, chunk_size=UPSERT_CHUNK_SIZE):
+        self.model = model
+        self.chunk_size = chunk_size
+        self._pending = {}  # lookup key -> (lookup dict, merged defaults)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, lookup, defaults):
+        key = lookup_key(lookup)
+        if key in self._pending:
+            self._pending[key][1].update(defaults)
+        else:
+            self._pending[key] = (dict(lookup), dict(defaults))
+
+    def _rows_matching(self, lookups):
+        """ Every row the database matches to one of the lookups, oldest first. """
+        return self.model.objects.filter(reduce(or_, (Q(**lookup) for lookup in lookups))).order_by('id')
+
+    def _existing(self, lookups):
+        """ Newest existing row for each lookup key, in one query. """
+        matches = {}
+        fields = sorted({field for lookup in lookups for field in lookup})
+        for obj in self._rows_matching(lookups):
+            matches[lookup_key({field: getattr(obj, field) for field in fields})] = obj
+        return matches
+
+    def flush(self):
+        """ Writes every pending pair; returns (created, updated) counts. """
+        pending = list(self._pending.values())
+        self._pending = {}
+        created = updated = 0
+        auto_now = [f for f in self.model._meta.concrete_fields if getattr(f, 'auto_now', False)]
+
+        for start in range(0, len(pending), self.chunk_size):
+            chunk = pending[start:start + self.chunk_size]
+            existing = self._existing([lookup for lookup, _ in chunk])
+
+            to_create, to_update, update_fields = [], [], set()
+            for lookup, defaults in chunk:
+                obj = existing.get(lookup_key(lookup))
+                if obj is None:
+                    obj = self.model(**{**lookup, **defaults})
+                    sync_numeric_fields(obj)
+                    to_create.append(obj)
+                    continue
+                for field, value in defaults.items():
+                    setattr(obj, field, value)
+                for field in auto_now:
+                    field.pre_save(obj, add=False)
+                sync_numeric_fields(obj)
+                update_fields.update(defaults)
+                to_update.append(obj)
+
+            if to_create:
+                self.model.objects.bulk_create(to_create)
+                latest.refresh(self.model, {getattr(obj, 'aadhar', None) for obj in to_create})
+            if to_update:
+                fields = with_numeric_shadows(self.model, sorted(update_fields)) + [f.name for f in auto_now]
+                self.model.objects.bulk_update(to_update, list(dict.fromkeys(fields)))
+                latest.touch(self.model, {getattr(obj, 'aadhar', None) for obj in to_update})
+            created += len(to_create)
+            updated += len(to_update)
+        return created, updated
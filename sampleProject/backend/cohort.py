@@ -0,0 +1,156 @@
+"""
+Cohort planner for get_filtered_data.
+
+A cohort search is a set of per-table conditions on workers: "has some row in
+<table> matching <Q>", "has no row matching <Q>", or "has a matching row in
+any of these tables". Instead of chaining one aadhar__in subquery per
+condition, CohortPlanner groups the conditions by table and compiles each
+table into a single subquery:
+
+- one condition:   SELECT aadhar FROM t WHERE q
+- several:         SELECT aadhar FROM t WHERE q1 OR q2 ...
+                   GROUP BY aadhar
+                   HAVING COUNT(CASE WHEN q1 ...) > 0 AND COUNT(CASE WHEN q2 ...) > 0
+  which keeps the original meaning (each condition may be met by a different
+  row of the same worker) while scanning the table once.
+- exclusions:      NOT IN (SELECT aadhar FROM t WHERE q1 OR q2 ...)
+
+Table subqueries are attached cheapest first, using a static cost class
+derived from the lookups involved (exact matches before ranges before
+substring/JSON containment), so the database sees the most selective
+semi-joins first. describe() and the explain flag of get_filtered_data expose
+the compiled plan for debugging.
+"""
+from django.db.models import Count, Q
+
+# Cost class per lookup; lookups not listed cost COST_RANGE.
+COST_EXACT = 1
+COST_RANGE = 2
+COST_SCAN = 3
+LOOKUP_COSTS = {
+    'exact': COST_EXACT, 'iexact': COST_EXACT, 'in': COST_EXACT, 'isnull': COST_EXACT,
+    'gt': COST_RANGE, 'gte': COST_RANGE, 'lt': COST_RANGE, 'lte': COST_RANGE, 'range': COST_RANGE,
+    'contains': COST_SCAN, 'icontains': COST_SCAN, 'has_key': COST_SCAN,
+    'startswith': COST_SCAN, 'istartswith': COST_SCAN, 'endswith': COST_SCAN, 'iendswith': COST_SCAN,
+}
+
+
+def predicate_cost(q):
+    """ Highest cost class among the lookups of a Q tree (COST_EXACT for an empty Q). """
+    cost = COST_EXACT
+    for child in q.children:
+        if isinstance(child, Q):
+            cost = max(cost, predicate_cost(child))
+            continue
+        lookup = child[0].rsplit('__', 1)
+        if len(lookup) == 1:
+            cost = max(cost, COST_EXACT)
+        else:
+            cost = max(cost, LOOKUP_COSTS.get(lookup[1], COST_RANGE))
+    return cost
+
+
+class _TablePredicates:
+    """ All conditions the cohort places on one table. """
+
+    def __init__(self, model):
+        self.model = model
+        self.required = []
+        self.excluded = []
+
+    def _rows(self, key_field, predicates):
+        qs = self.model.objects.filter(**{f'{key_field}__isnull': False}).order_by()
+        # An empty Q matches every row, so it leaves the OR unrestricted.
+        if all(predicates):
+            combined = Q()
+            for q in predicates:
+                combined |= q
+            qs = qs.filter(combined)
+        return qs
+
+    def required_subquery(self, key_field):
+        rows = self._rows(key_field, self.required)
+        if len(self.required) == 1:
+            return rows.values(key_field)
+        matches = {f'_match_{i}': Count('pk', filter=q) if q else Count('pk') for i, q in enumerate(self.required)}
+        return (
+            rows.values(key_field).annotate(**matches)
+            .filter(**{f'{name}__gt': 0 for name in matches})
+            .values(key_field)
+        )
+
+    def excluded_subquery(self, key_field):
+        return self._rows(key_field, self.excluded).values(key_field)
+
+
+class CohortPlanner:
+    """
+    Collects per-table worker conditions and applies them to an
+    employee_details queryset in one pass:
+
+        planner = CohortPlanner()
+        planner.require(vitals, Q(bmi__gte='25'))
+        planner.exclude(MedicalHistory, Q(medical_data__has_key='HTN'))
+        planner.require_any((FitnessAssessment, Q(special_cases='x')), (Consultation, Q(special_cases='x')))
+        queryset = planner.apply(queryset)
+    """
+
+    def __init__(self, key_field='aadhar'):
+        self.key_field = key_field
+        self._tables = {}
+        self._unions = []
+
+    def _table(self, model):
+        if model not in self._tables:
+            self._tables[model] = _TablePredicates(model)
+        return self._tables[model]
+
+    def require(self, model, q=None):
+        """ Keep workers with at least one `model` row matching q. """
+        self._table(model).required.append(q or Q())
+
+    def exclude(self, model, q=None):
+        """ Drop workers with any `model` row matching q. """
+        self._table(model).excluded.append(q or Q())
+
+    def require_any(self, *branches):
+        """ Keep workers matching at least one (model, q) branch. """
+        self._unions.append([(model, q or Q()) for model, q in branches])
+
+    def _steps(self):
+        """ (cost, description, Q on the key field) for every compiled subquery, cheapest first. """
+        key = self.key_field
+        steps = []
+        for table in self._tables.values():
+            name = table.model.__name__
+            if table.required:
+                steps.append((
+                    max(predicate_cost(q) for q in table.required),
+                    f'{name}: {len(table.required)} required predicate(s)',
+                    Q(**{f'{key}__in': table.required_subquery(key)}),
+                ))
+            if table.excluded:
+                steps.append((
+                    max(predicate_cost(q) for q in table.excluded),
+                    f'{name}: {len(table.excluded)} excluded predicate(s)',
+                    ~Q(**{f'{key}__in': table.excluded_subquery(key)}),
+                ))
+        for branches in self._unions:
+            union = Q()
+            for model, q in branches:
+                union |= Q(**{f'{key}__in': _TablePredicates(model)._rows(key, [q]).values(key)})
+            steps.append((
+                max(predicate_cost(q) for _, q in branches),
+                'any of ' + ', '.join(model.__name__ for model, _ in branches),
+                union,
+            ))
+        # sorted() is stable, so equal-cost steps keep the order they were added in
+        return sorted(steps, key=lambda step: step[0])
+
+    def apply(self, queryset):
+        for _, _, condition in self._steps():
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def describe(self):
+        return [{'cost': cost, 'step': description} for cost, description, _ in self._steps()]
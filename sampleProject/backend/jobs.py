@@ -0,0 +1,235 @@
+"""
+Database-backed queue for large Excel imports.
+
+hrupload, MedicalDataUploadView and uploadAppointment accept background=1:
+instead of importing inside the request they store the upload as an ImportJob
+and answer 202 with its id right away. `manage.py run_import_jobs` claims
+queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can
+drain the queue side by side, and runs the import function registered for the
+job's kind. Imports report progress through JobProgress; GET
+import-jobs/<id>/ reads it back.
+
+The synchronous endpoints still import the whole file in one transaction. A
+job commits chunk by chunk instead, so its progress is visible while it runs
+and a failing row leaves the earlier chunks written; the failed rows are
+listed in the job's errors.
+
+A running job holds a lease: every progress write also stamps heartbeat_at.
+claim_next() first takes back the jobs whose heartbeat is older than
+LEASE_SECONDS (their worker crashed or was killed). HR and medical imports
+are upserts, so they are queued again, up to MAX_ATTEMPTS claims; an
+appointment import would book its committed chunks a second time, so it
+fails instead. A worker that was only slow finds out at its next progress
+write (JobLost) and stops without touching the job again.
+
+Once a job has succeeded or failed its uploaded file is deleted; the job
+keeps the file name.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Import functions take (file, params, progress) and return a JSON-able result
+JOB_HANDLERS = {
+    ImportJob.Kind.HR: 'backend.views.import_hr_file',
+    ImportJob.Kind.MEDICAL: 'backend.views.import_medical_file',
+    ImportJob.Kind.APPOINTMENT: 'backend.views.import_appointment_file',
+}
+
+PROGRESS_SAVE_INTERVAL = 2.0  # seconds between progress writes
+MAX_STORED_ERRORS = 200
+LEASE_SECONDS = 600  # without a heartbeat for this long a running job is taken back
+MAX_ATTEMPTS = 3
+RETRYABLE_KINDS = {ImportJob.Kind.HR, ImportJob.Kind.MEDICAL}  # imports that can safely run again
+
+
+class JobLost(Exception):
+    """ The job was taken back from this worker after its lease ran out. """
+
+
+def _owned(job):
+    """ The job's row, as long as it is still this claim's. """
+    return ImportJob.objects.filter(
+        pk=job.pk, status=ImportJob.StatusChoices.RUNNING, worker=job.worker, attempts=job.attempts,
+    )
+
+
+def discard_file(job):
+    """ Deletes the stored upload of a finished job, keeping its name on the job. """
+    if not job.file.name:
+        return
+    try:
+        job.file.storage.delete(job.file.name)
+    except OSError:
+        logger.warning(f"Could not delete {job.file.name} of import job {job.pk}", exc_info=True)
+
+
+def enqueue(kind, upload, params=None, submitted_by=''):
+    """ Stores the uploaded file and queues it; returns the new ImportJob. """
+    job = ImportJob(kind=kind, params=params or {}, submitted_by=submitted_by or '')
+    job.file.save(upload.name, upload, save=False)
+    job.save()
+    logger.info(f"Queued {kind} import job {job.pk} ({upload.name})")
+    return job
+
+
+def release_stale(lease_seconds=LEASE_SECONDS):
+    """ Queues again (or fails) the running jobs whose worker stopped heartbeating; returns them. """
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    released = []
+    with transaction.atomic():
+        stale = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+            status=ImportJob.StatusChoices.RUNNING,
+        )
+        for job in stale:
+            if job.kind in RETRYABLE_KINDS and job.attempts < MAX_ATTEMPTS:
+                logger.warning(f"Import job {job.pk} lost worker {job.worker}; queued again")
+                job.status = ImportJob.StatusChoices.QUEUED
+                job.rows_total, job.rows_done, job.error_count, job.errors = None, 0, 0, []
+            else:
+                logger.warning(f"Import job {job.pk} lost worker {job.worker}; failed after {job.attempts} attempt(s)")
+                job.status = ImportJob.StatusChoices.FAILED
+                job.result = {'error': f"Worker {job.worker} stopped responding; {job.rows_done} rows were imported"}
+                job.finished_at = timezone.now()
+            job.worker = ''
+            job.save(update_fields=[
+                'status', 'worker', 'rows_total', 'rows_done', 'error_count', 'errors', 'result', 'finished_at',
+            ])
+            released.append(job)
+    for job in released:
+        if job.status == ImportJob.StatusChoices.FAILED:
+            discard_file(job)
+    return released
+
+
+def claim_next(worker):
+    """
+    Marks the oldest queued job as running for `worker` and returns it; None
+    when the queue is empty. Stale running jobs are released first.
+    """
+    release_stale()
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImportJob.StatusChoices.QUEUED)
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImportJob.StatusChoices.RUNNING
+        job.worker = worker
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at', 'attempts'])
+    return job
+
+
+class JobProgress:
+    """
+    Counters an import advances as it goes; written to the job, with a
+    heartbeat, at most every save_interval seconds. Raises JobLost once the
+    job is no longer this worker's.
+    """
+
+    def __init__(self, job, save_interval=PROGRESS_SAVE_INTERVAL):
+        self.job = job
+        self.save_interval = save_interval
+        self._saved_at = 0.0
+
+    def set_total(self, rows):
+        self.job.rows_total = rows
+        self.save(force=True)
+
+    def advance(self, rows=1, errors=()):
+        errors = list(errors)
+        self.job.rows_done += rows
+        self.job.error_count += len(errors)
+        room = MAX_STORED_ERRORS - len(self.job.errors)
+        if room > 0:
+            self.job.errors.extend(errors[:room])
+        self.save()
+
+    def save(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._saved_at < self.save_interval:
+            return
+        self.job.heartbeat_at = timezone.now()
+        written = _owned(self.job).update(
+            rows_total=self.job.rows_total,
+            rows_done=self.job.rows_done,
+            error_count=self.job.error_count,
+            errors=self.job.errors,
+            heartbeat_at=self.job.heartbeat_at,
+        )
+        if not written:
+            raise JobLost(f"Import job {self.job.pk} was taken back from {self.job.worker}")
+        self._saved_at = now
+
+
+def run(job):
+    """
+    Runs a claimed job to completion, recording its result or failure, and
+    deletes its upload. A job taken back meanwhile is left to its new claim.
+    """
+    progress = JobProgress(job)
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        with job.file.open('rb') as upload:
+            result = handler(upload, job.params, progress)
+    except JobLost:
+        logger.warning(f"Import job {job.pk} was taken back from {job.worker}; stopped")
+        return job
+    except Exception as e:
+        logger.exception(f"Import job {job.pk} failed")
+        job.status = ImportJob.StatusChoices.FAILED
+        job.result = {'error': str(e)}
+    else:
+        job.status = ImportJob.StatusChoices.SUCCEEDED
+        job.result = result
+    job.finished_at = job.heartbeat_at = timezone.now()
+    finished = _owned(job).update(
+        status=job.status, result=job.result, finished_at=job.finished_at, heartbeat_at=job.heartbeat_at,
+        rows_total=job.rows_total, rows_done=job.rows_done, error_count=job.error_count, errors=job.errors,
+    )
+    if not finished:
+        logger.warning(f"Import job {job.pk} was taken back from {job.worker} before it finished")
+        return job
+    discard_file(job)
+    return job
+
+
+def job_status(job):
+    """ The status endpoint's view of a job, including throughput in rows per second. """
+    elapsed = None
+    if job.started_at:
+        elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'file': job.file.name,
+        'submitted_by': job.submitted_by,
+        'rows_total': job.rows_total,
+        'rows_done': job.rows_done,
+        'error_count': job.error_count,
+        'errors': job.errors,
+        'result': job.result,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'heartbeat_at': job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+        'attempts': job.attempts,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'elapsed_seconds': round(elapsed, 1) if elapsed is not None else None,
+        'rows_per_second': round(job.rows_done / elapsed, 1) if elapsed else None,
+    }
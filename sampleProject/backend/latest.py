@@ -0,0 +1,144 @@
+"""
+Maintenance and lookup helpers for LatestRecord, the per-Aadhar pointer to the
+newest row (highest id) of each tracked model.
+
+Single-row writes are picked up by the post_save/post_delete receivers wired in
+BackendConfig.ready(), so they run inside the writer's own transaction.
+bulk_create/bulk_update do not send signals; bulk loaders call refresh() for
+the Aadhars they touched before their transaction commits.
+
+Every write to a pointed-at row stamps the pointer's updated_at, even when it
+stays on the same row, so readers that cache the latest rows (bitmaps) see the
+change: save() through the receivers, bulk_update() and QuerySet.update()
+paths by calling touch().
+"""
+from django.apps import apps
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import LatestRecord
+
+# Models whose newest row per Aadhar is tracked.
+TRACKED_MODELS = [
+    'employee_details', 'Dashboard', 'vitals', 'MedicalHistory', 'heamatalogy',
+    'RoutineSugarTests', 'RenalFunctionTest', 'LipidProfile', 'LiverFunctionTest',
+    'ThyroidFunctionTest', 'AutoimmuneTest', 'CoagulationTest', 'EnzymesCardiacProfile',
+    'UrineRoutineTest', 'SerologyTest', 'MotionTest', 'CultureSensitivityTest',
+    'MensPack', 'WomensPack', 'OccupationalProfile', 'OthersTest', 'OphthalmicReport',
+    'XRay', 'USGReport', 'CTReport', 'MRIReport', 'FitnessAssessment',
+    'VaccinationRecord', 'Consultation', 'Prescription', 'SignificantNotes',
+    'Form17', 'Form38', 'Form39', 'Form40', 'Form27',
+]
+
+REFRESH_CHUNK_SIZE = 500
+
+
+def tracked_models():
+    return [apps.get_model('backend', name) for name in TRACKED_MODELS]
+
+
+def record_written(model, aadhar, record_id):
+    """
+    Moves the pointer for (model, aadhar) forward to record_id if it is newer,
+    and restamps it when record_id is the row it already points at.
+    """
+    if aadhar is None or record_id is None:
+        return
+    pointers = LatestRecord.objects.filter(model_label=model._meta.label_lower, aadhar=aadhar)
+    if pointers.filter(record_id__lte=record_id).update(record_id=record_id, updated_at=timezone.now()):
+        return
+    pointer, created = LatestRecord.objects.get_or_create(
+        model_label=model._meta.label_lower, aadhar=aadhar, defaults={'record_id': record_id}
+    )
+    if not created and pointer.record_id < record_id:
+        # Lost a race with a writer that created the pointer for an older row.
+        pointers.filter(record_id__lt=record_id).update(record_id=record_id, updated_at=timezone.now())
+
+
+def refresh(model, aadhars):
+    """
+    Recomputes the pointers of `model` for the given Aadhars from the source
+    table. Used after bulk writes and deletes, which bypass record_written().
+    """
+    label = model._meta.label_lower
+    aadhars = list({a for a in aadhars if a is not None})
+    for start in range(0, len(aadhars), REFRESH_CHUNK_SIZE):
+        chunk = aadhars[start:start + REFRESH_CHUNK_SIZE]
+        newest = dict(
+            model.objects.filter(aadhar__in=chunk)
+            .values('aadhar')
+            .annotate(latest_id=Max('id'))
+            .values_list('aadhar', 'latest_id')
+        )
+        existing = {p.aadhar: p for p in LatestRecord.objects.filter(model_label=label, aadhar__in=chunk)}
+
+        to_update = []
+        now = timezone.now()
+        for aadhar, pointer in existing.items():
+            if aadhar in newest and pointer.record_id != newest[aadhar]:
+                pointer.record_id = newest[aadhar]
+                pointer.updated_at = now
+                to_update.append(pointer)
+        to_create = [
+            LatestRecord(model_label=label, aadhar=aadhar, record_id=record_id)
+            for aadhar, record_id in newest.items() if aadhar not in existing
+        ]
+        stale = [aadhar for aadhar in existing if aadhar not in newest]
+
+        if to_update:
+            LatestRecord.objects.bulk_update(to_update, ['record_id', 'updated_at'])
+        if to_create:
+            LatestRecord.objects.bulk_create(to_create)
+        if stale:
+            LatestRecord.objects.filter(model_label=label, aadhar__in=stale).delete()
+
+
+def touch(model, aadhars):
+    """ Restamps the pointers of `model` for the given Aadhars after their rows changed in place. """
+    label = model._meta.label_lower
+    aadhars = list({a for a in aadhars if a is not None})
+    now = timezone.now()
+    for start in range(0, len(aadhars), REFRESH_CHUNK_SIZE):
+        LatestRecord.objects.filter(
+            model_label=label, aadhar__in=aadhars[start:start + REFRESH_CHUNK_SIZE]
+        ).update(updated_at=now)
+
+
+def rebuild(model):
+    """ Rebuilds every pointer of `model` from scratch. Returns the pointer count. """
+    label = model._meta.label_lower
+    LatestRecord.objects.filter(model_label=label).delete()
+    rows = (
+        model.objects.filter(aadhar__isnull=False)
+        .values('aadhar')
+        .annotate(latest_id=Max('id'))
+        .values_list('aadhar', 'latest_id')
+    )
+    pointers = [LatestRecord(model_label=label, aadhar=aadhar, record_id=record_id) for aadhar, record_id in rows]
+    LatestRecord.objects.bulk_create(pointers, batch_size=1000)
+    return len(pointers)
+
+
+def latest_ids(model):
+    """ Subquery of the newest row id of `model` for every Aadhar. """
+    return LatestRecord.objects.filter(model_label=model._meta.label_lower).values('record_id')
+
+
+def latest_ids_for(model, aadhars):
+    """ Subquery of the newest row id of `model` for the given Aadhars. """
+    return latest_ids(model).filter(aadhar__in=aadhars)
+
+
+def _on_save(sender, instance, **kwargs):
+    record_written(sender, getattr(instance, 'aadhar', None), instance.pk)
+
+
+def _on_delete(sender, instance, **kwargs):
+    refresh(sender, [getattr(instance, 'aadhar', None)])
+
+
+def connect_signals():
+    for model in tracked_models():
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'latest_record_save_{model.__name__}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'latest_record_delete_{model.__name__}')
@@ -0,0 +1,63 @@
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import benchmarks, sequences
+from backend.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Book appointments from parallel threads and check the numbers handed out for duplicates and lock waits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent booking threads')
+        parser.add_argument('--bookings', type=int, default=50, help='Bookings per thread')
+        parser.add_argument('--date', default='2099-12-31',
+                            help='Day to book on (YYYY-MM-DD); pick one without real appointments')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also run the old count-based numbering for comparison')
+        parser.add_argument('--keep', action='store_true', help='Keep the booked appointments afterwards')
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date'])
+        except ValueError:
+            raise CommandError(f"Invalid --date '{options['date']}'")
+        if Appointment.objects.filter(date=day).exclude(booked_by=benchmarks.BENCH_BOOKED_BY).exists():
+            raise CommandError(f"{day} has real appointments; pass another --date")
+
+        allocators = [('sequence allocator', sequences.next_appointment_no)]
+        if options['legacy']:
+            allocators.insert(0, ('count-based (legacy)', benchmarks.legacy_appointment_no))
+
+        threads, bookings = options['threads'], options['bookings']
+        self.stdout.write(f"📅 {threads} threads x {bookings} bookings on {day}")
+        failed = False
+        for label, allocate in allocators:
+            benchmarks.purge_bench_bookings(day)
+            started = time.perf_counter()
+            latencies, errors = benchmarks.book_in_parallel(allocate, day, threads, bookings)
+            elapsed = time.perf_counter() - started
+            duplicates = benchmarks.duplicate_appointment_numbers(day)
+
+            self.stdout.write(f"\n{label}")
+            self.stdout.write(f"  booked      {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+            if latencies:
+                ordered = sorted(latencies)
+                p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+                self.stdout.write(
+                    f"  latency     median {benchmarks.format_ms(statistics.median(ordered))}"
+                    f"   p95 {benchmarks.format_ms(p95)}   max {benchmarks.format_ms(ordered[-1])}"
+                )
+            self.stdout.write(f"  errors      {len(errors)}" + (f" (first: {errors[0]})" if errors else ''))
+            self.stdout.write(f"  duplicates  {sum(duplicates.values()) - len(duplicates)} extra bookings on {len(duplicates)} number(s)")
+            if allocate is sequences.next_appointment_no and (duplicates or errors):
+                failed = True
+
+        if not options['keep']:
+            self.stdout.write(f"\n🧹 Removed {benchmarks.purge_bench_bookings(day)} benchmark appointments")
+        if failed:
+            raise CommandError("The sequence allocator produced duplicates or errors")
+        self.stdout.write("✅ No duplicate appointment numbers from the sequence allocator")
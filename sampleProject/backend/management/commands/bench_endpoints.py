@@ -0,0 +1,103 @@
+import json
+from contextlib import ExitStack
+from datetime import date, timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from backend import benchmarks, metrics
+
+
+class Command(BaseCommand):
+    help = ('Time the hot endpoints (fetchdata, fetchdatawithID, filters, prescription-in, dashboard, uploads) '
+            'against synthetic data sets of growing size')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000,100000',
+                            help='Comma-separated worker counts; each grows the seed of the previous one')
+        parser.add_argument('--visits', type=int, default=3, help='Visits per seeded worker')
+        parser.add_argument('--stock', type=int, default=300, help='Pharmacy stock lines to seed')
+        parser.add_argument('--upload-rows', type=int, default=500, help='Rows in the generated upload sheets')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per endpoint')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded rows in place when done')
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted(int(scale) for scale in options['scales'].split(','))
+        except ValueError:
+            raise CommandError(f"--scales must be comma-separated integers, got {options['scales']!r}")
+
+        self.stdout.write(f"🧹 Purged {benchmarks.purge_seeded()} seeded rows")
+        benchmarks.seed_pharmacy(options['stock'])
+        results, seeded = [], 0
+        try:
+            for scale in scales:
+                benchmarks.seed_synthetic(scale - seeded, options['visits'], options['stock'], first=seeded)
+                seeded = scale
+                self.stdout.write(f"\n⏱  {scale} workers, {scale * options['visits']} visits "
+                                  f"(median of {options['repeat']} runs)")
+                for name, call in self.endpoints(scale, options['upload_rows']):
+                    result = self.measure(call, options['repeat'])
+                    results.append({'scale': scale, 'endpoint': name, **result})
+                    self.stdout.write(
+                        f"  {name:<28}{benchmarks.format_ms(result['median'])}  {result['queries']:>5} queries"
+                        f"  {result['bytes']:>11} bytes  HTTP {result['status']}"
+                    )
+        finally:
+            if not options['keep']:
+                self.stdout.write(f"🧹 Purged {benchmarks.purge_seeded()} seeded rows")
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"📝 Wrote {options['json_path']}")
+
+    def endpoints(self, scale, upload_rows):
+        """ (name, call) pairs; each call sends one request through the full middleware stack and returns the response. """
+        client = Client()
+        today = date.today()
+        span = {'fromDate': (today - timedelta(days=30)).isoformat(), 'toDate': today.isoformat()}
+        aadhar = benchmarks.seeded_aadhar(scale // 2)
+        rows = min(upload_rows, scale)
+        hr_sheet = benchmarks.hr_workbook(rows)
+        medical_sheet = benchmarks.medical_workbook(rows)
+
+        def post_json(url, data):
+            return lambda: client.post(url, json.dumps(data), content_type='application/json')
+
+        # After the warm-up the sheets' rows are already in place, so the timed runs measure re-uploads
+        def upload(url, content):
+            return lambda: client.post(url, {'file': SimpleUploadedFile('bench.xlsx', content)})
+
+        return [
+            ('fetchdata', post_json(reverse('userData'), {})),
+            ('fetchdatawithID', post_json(reverse('userDataWithID'), {'aadhar': aadhar})),
+            ('get_filtered_data', post_json(reverse('get_filtered_data'), {})),
+            ('get_filtered_data (filtered)', post_json(reverse('get_filtered_data'), {'sex': 'Female'})),
+            ('get_prescription_in_data', lambda: client.get(
+                reverse('get_prescription_in_data'), {'year': today.year, 'month': today.month})),
+            ('dashboard_stats', lambda: client.get(reverse('dashboard'), span)),
+            (f"hrupload ({rows} rows)", upload(reverse('hrupload', args=('employee',)), hr_sheet)),
+            (f"medicalupload ({rows} rows)", upload(reverse('medical_upload'), medical_sheet)),
+        ]
+
+    def measure(self, call, repeat):
+        # One untimed run counts the queries (on every database) and sizes the response; it doubles as the warm-up
+        timer = metrics.QueryTimer()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = call()
+            size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+        timings = benchmarks.time_call(lambda: self.consume(call()), repeat, warmup=0)
+        return {**timings, 'queries': timer.queries, 'bytes': size, 'status': response.status_code}
+
+    @staticmethod
+    def consume(response):
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from backend import benchmarks
+from backend.models import Appointment, Consultation, Dashboard, heamatalogy, vitals
+from backend.profiles import visit_bundles
+
+
+class Command(BaseCommand):
+    help = 'Time the aadhar / mrdNo / entry_date lookups the views depend on, optionally without the lookup indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Seed this many synthetic workers first')
+        parser.add_argument('--visits', type=int, default=20, help='Visits per seeded worker')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per lookup')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also time every lookup with the Meta.indexes dropped (benchmark databases only)')
+        parser.add_argument('--purge', action='store_true', help='Delete the seeded rows when done')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            visits = benchmarks.seed_visits(options['seed'], options['visits'])
+            self.stdout.write(f"🌱 Seeded {options['seed']} workers, {visits} visits")
+
+        sample = Dashboard.objects.exclude(aadhar__isnull=True).exclude(mrdNo='').order_by('-id').values('aadhar', 'mrdNo').first()
+        if not sample:
+            self.stderr.write("❌ No Dashboard rows to benchmark against; use --seed")
+            return
+        aadhar, mrd = sample['aadhar'], sample['mrdNo']
+        today = date.today()
+
+        lookups = [
+            ('vitals history by aadhar', lambda: list(vitals.objects.filter(aadhar=aadhar).order_by('-entry_date')[:20])),
+            ('haematology by mrdNo', lambda: heamatalogy.objects.filter(mrdNo=mrd).first()),
+            ('consultations by (aadhar, entry_date)', lambda: list(Consultation.objects.filter(aadhar=aadhar, entry_date__gte=today - timedelta(days=365)))),
+            ('dashboard visits in a month', lambda: Dashboard.objects.filter(date__range=(today - timedelta(days=30), today)).count()),
+            ('appointments for today', lambda: Appointment.objects.filter(date=today).count()),
+            ('visit bundle by mrdNo', lambda: visit_bundles([mrd])),
+        ]
+
+        results = {label: [benchmarks.time_call(fn, options['repeat'])['median']] for label, fn in lookups}
+        if options['compare']:
+            indexed = [Appointment, Consultation, Dashboard, heamatalogy, vitals]
+            with benchmarks.indexes_dropped(indexed):
+                for label, fn in lookups:
+                    results[label].append(benchmarks.time_call(fn, options['repeat'])['median'])
+
+        self.stdout.write(f"\n⏱  Median of {options['repeat']} runs (aadhar {aadhar}, mrdNo {mrd})")
+        for label, timings in results.items():
+            line = f"  {label:<40}{benchmarks.format_ms(timings[0])}"
+            if len(timings) > 1:
+                speedup = timings[1] / timings[0] if timings[0] else 0
+                line += f"   without indexes {benchmarks.format_ms(timings[1])}   x{speedup:.1f}"
+            self.stdout.write(line)
+
+        if options['purge']:
+            self.stdout.write(f"🧹 Purged {benchmarks.purge_seeded()} seeded rows")
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import snapshot, transfer
+
+
+class Command(BaseCommand):
+    help = 'Load a snapshot written by dump_snapshot with bulk inserts that keep the primary keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Snapshot directory (with manifest.json)')
+        parser.add_argument('models', nargs='*', help='Model names to load (default: every model in the snapshot)')
+        parser.add_argument('--database', default='default', help='Database alias to write to')
+        parser.add_argument('--workers', type=int, default=4, help='Tables loaded in parallel')
+        parser.add_argument('--batch-size', type=int, default=snapshot.SNAPSHOT_BATCH_SIZE, help='Rows per insert batch')
+        parser.add_argument('--flush', action='store_true', help='Empty the tables before loading')
+
+    def handle(self, *args, **options):
+        if options['database'] not in settings.DATABASES:
+            raise CommandError(f"No database '{options['database']}' in settings.DATABASES")
+        try:
+            manifest = snapshot.read_manifest(options['directory'])
+        except FileNotFoundError:
+            raise CommandError(f"No {snapshot.MANIFEST_NAME} in {options['directory']}")
+        try:
+            models = transfer.models_named(options['models'])
+        except LookupError as e:
+            raise CommandError(str(e))
+        models = [model for model in models if model._meta.label in manifest['models']]
+        self.stdout.write(
+            f"\n📥 Loading {len(models)} models ({manifest['format']}, dumped {manifest['created_at']}) "
+            f"into {options['database']}\n"
+        )
+        try:
+            totals = snapshot.load_snapshot(
+                models, options['directory'], using=options['database'], workers=options['workers'],
+                batch_size=options['batch_size'], flush=options['flush'], report=self.stdout.write,
+            )
+        except RuntimeError as e:
+            raise CommandError(f"{e}. Tables that loaded are committed; load the failed models again by name.")
+        self.stdout.write(f"\n✅ {sum(totals.values())} rows loaded\n")
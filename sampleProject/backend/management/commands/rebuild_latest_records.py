@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend import latest
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the LatestRecord pointer table from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Model names to rebuild (default: every tracked model)')
+
+    def handle(self, *args, **options):
+        names = options['models'] or latest.TRACKED_MODELS
+        unknown = [name for name in names if name not in latest.TRACKED_MODELS]
+        if unknown:
+            raise CommandError(f"Not tracked: {', '.join(unknown)}")
+
+        models = {model.__name__: model for model in latest.tracked_models()}
+        for name in names:
+            with transaction.atomic():
+                count = latest.rebuild(models[name])
+            self.stdout.write(f"✅ {name}: {count} pointers")
@@ -0,0 +1,43 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from backend import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued Excel import jobs (see backend/jobs.py); start several to import in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit as soon as the queue is empty')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait between polls of an empty queue')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0: no limit)')
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        done = 0
+        self.stdout.write(f"Import worker {worker} started")
+        while not options['max_jobs'] or done < options['max_jobs']:
+            close_old_connections()
+            job = jobs.claim_next(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            self.stdout.write(f"▶ Job {job.pk}: {job.kind} import of {job.file.name}")
+            job = jobs.run(job)
+            done += 1
+            if job.status == job.StatusChoices.RUNNING:
+                self.stdout.write(f"⚠ Job {job.pk} was taken back after its lease ran out")
+                continue
+            status = jobs.job_status(job)
+            self.stdout.write(
+                f"{'✅' if job.status == job.StatusChoices.SUCCEEDED else '❌'} Job {job.pk} {job.status}: "
+                f"{status['rows_done']} rows, {status['error_count']} errors in {status['elapsed_seconds']}s"
+            )
+        self.stdout.write(f"Import worker {worker} stopped after {done} job(s)")
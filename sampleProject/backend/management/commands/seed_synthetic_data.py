@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic workers, visits, investigations and pharmacy stock for benchmarking (BENCH-prefixed rows)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1000, help='Synthetic workers to create')
+        parser.add_argument('--visits', type=int, default=3, help='Visits per worker')
+        parser.add_argument('--stock', type=int, default=300, help='Pharmacy stock lines to create')
+        parser.add_argument('--days', type=int, default=90, help='Days of daily pharmacy quantities')
+        parser.add_argument('--first', type=int, default=0,
+                            help='Number of the first worker, to add workers to an earlier seed')
+        parser.add_argument('--purge', action='store_true', help='Delete all seeded rows first')
+        parser.add_argument('--purge-only', action='store_true', help='Delete all seeded rows and stop')
+
+    def handle(self, *args, **options):
+        if options['purge'] or options['purge_only']:
+            self.stdout.write(f"🧹 Purged {benchmarks.purge_seeded()} seeded rows")
+            if options['purge_only']:
+                return
+
+        start = time.perf_counter()
+        if options['stock'] and not options['first']:
+            daily = benchmarks.seed_pharmacy(options['stock'], options['days'])
+            self.stdout.write(f"💊 Seeded {options['stock']} stock lines, {daily} daily quantities")
+        visits = benchmarks.seed_synthetic(options['workers'], options['visits'], options['stock'], options['first'])
+        self.stdout.write(
+            f"🌱 Seeded {options['workers']} workers, {visits} visits in {time.perf_counter() - start:.1f} s"
+        )
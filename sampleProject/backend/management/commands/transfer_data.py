@@ -1,47 +1,60 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from backend.models import (
-    user, employee_details, Dashboard, vitals, mockdrills, eventsandcamps,
-    heamatalogy, RoutineSugarTests, RenalFunctionTest, LipidProfile,
-    LiverFunctionTest, ThyroidFunctionTest, AutoimmuneTest, CoagulationTest,
-    EnzymesCardiacProfile, UrineRoutineTest, SerologyTest, MotionTest,
-    CultureSensitivityTest, MensPack, WomensPack, OccupationalProfile,
-    OthersTest, OphthalmicReport, XRay, USGReport, CTReport, MRIReport,
-    Appointment, FitnessAssessment, VaccinationRecord, ReviewCategory, Review
-)
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import transfer
+
 
 class Command(BaseCommand):
-    help = 'Transfer data from MySQL to MSSQL'
-
-    def handle(self, *args, **kwargs):
-        self.stdout.write("\n🚀 Starting MySQL → MSSQL Data Transfer...\n")
-        
-        model_list = [
-            user, employee_details, Dashboard, vitals, mockdrills, eventsandcamps,
-            heamatalogy, RoutineSugarTests, RenalFunctionTest, LipidProfile,
-            LiverFunctionTest, ThyroidFunctionTest, AutoimmuneTest, CoagulationTest,
-            EnzymesCardiacProfile, UrineRoutineTest, SerologyTest, MotionTest,
-            CultureSensitivityTest, MensPack, WomensPack, OccupationalProfile,
-            OthersTest, OphthalmicReport, XRay, USGReport, CTReport, MRIReport,
-            Appointment, FitnessAssessment, VaccinationRecord, ReviewCategory, Review
-        ]
-
-        for model in model_list:
-            model_name = model.__name__
-            self.stdout.write(f"🔄 Transferring: {model_name}")
-            try:
-                self.transfer_model_data(model)
-                self.stdout.write(f"✅ Done: {model_name}\n")
-            except Exception as e:
-                self.stderr.write(f"❌ Error in {model_name}: {str(e)}")
+    help = 'Transfer data from MySQL to MSSQL: resumable, keeps primary keys, copies tables in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Model names to copy (default: every backend model)')
+        parser.add_argument('--source', default='mysql', help='Database alias to read from')
+        parser.add_argument('--target', default='default', help='Database alias to write to')
+        parser.add_argument('--workers', type=int, default=4, help='Tables copied in parallel')
+        parser.add_argument('--page-size', type=int, default=transfer.TRANSFER_PAGE_SIZE, help='Rows per committed page')
+        parser.add_argument('--checkpoint-dir', default=os.path.join(settings.BASE_DIR, 'transfer_checkpoints'),
+                            help='Where the per-model checkpoints are kept')
+        parser.add_argument('--reset', action='store_true', help='Forget the checkpoints and start over')
+        parser.add_argument('--verify-only', action='store_true', help='Only compare row counts and checksums')
+        parser.add_argument('--skip-verify', action='store_true', help='Do not compare the copies afterwards')
 
-        self.stdout.write("\n✅ All transfers complete.\n")
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        for alias in (source, target):
+            if alias not in settings.DATABASES:
+                raise CommandError(f"No database '{alias}' in settings.DATABASES")
 
-    def transfer_model_data(self, model):
-        objs = list(model.objects.using('mysql').all())
+        try:
+            models = transfer.models_named(options['models'])
+        except LookupError as e:
+            raise CommandError(str(e))
 
-        for obj in objs:
-            obj.pk = None  # Reset PK to avoid conflicts
+        if not options['verify_only']:
+            if options['reset']:
+                for model in models:
+                    transfer.Checkpoint(options['checkpoint_dir'], model).reset()
+            self.stdout.write(f"\n🚀 Copying {len(models)} models {source} → {target} with {options['workers']} workers\n")
+            try:
+                transfer.run_transfer(
+                    models, source, target, options['checkpoint_dir'],
+                    workers=options['workers'], page_size=options['page_size'], report=self.stdout.write,
+                )
+            except RuntimeError as e:
+                raise CommandError(f"{e}. Run the command again to resume.")
 
-        with transaction.atomic(using='default'):
-            model.objects.using('default').bulk_create(objs, batch_size=500)
+        if options['skip_verify']:
+            return
+        self.stdout.write("\n🔎 Verifying row counts and checksums\n")
+        mismatched = []
+        for model in models:
+            result = transfer.verify_model(model, source, target)
+            mark = '✅' if result['match'] else '❌'
+            self.stdout.write(f"{mark} {result['model']}: {result['source_rows']} → {result['target_rows']} rows")
+            if not result['match']:
+                mismatched.append(result['model'])
+        if mismatched:
+            raise CommandError(f"Copies differ for: {', '.join(mismatched)}")
+        self.stdout.write("\n✅ All transfers verified.\n")
@@ -0,0 +1,171 @@
+"""
+In-process request metrics, recorded by backend.middleware.RequestMetricsMiddleware
+and read back at GET metrics/.
+
+Every request adds its wall time, database query count and time, and response
+size to the stats of its view (the URL name, e.g. userData for fetchdata).
+Stats are kept in one slot per SLOT_SECONDS and only the slots of the last
+WINDOW_SECONDS are reported, so the numbers describe recent traffic rather than
+everything since the process started. Latencies go into fixed log-scale
+buckets, from which the percentiles are read (as the bucket's upper bound).
+
+The registry lives in the process: behind several workers each keeps its own,
+and a restart empties it.
+"""
+import bisect
+import os
+import threading
+import time
+
+WINDOW_SECONDS = 600
+SLOT_SECONDS = 60
+# Upper bounds in milliseconds; slower requests land in the last (overflow) bucket
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SLOW_REQUEST_MS = 2000
+
+
+class ViewStats:
+    __slots__ = ('requests', 'errors', 'over_budget', 'wall_ms', 'max_wall_ms', 'queries', 'max_queries', 'db_ms',
+                 'response_bytes', 'streamed', 'unsized', 'buckets')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.over_budget = 0  # requests past their view's query budget
+        self.wall_ms = 0.0
+        self.max_wall_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+        self.response_bytes = 0
+        self.streamed = 0  # streaming responses, timed until the body was read or closed
+        self.unsized = 0  # async streams, recorded at the first byte with no size
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, wall_ms, queries, db_ms, response_bytes, status, over_budget=False, streamed=False):
+        self.requests += 1
+        self.errors += status >= 500
+        self.over_budget += over_budget
+        self.wall_ms += wall_ms
+        self.max_wall_ms = max(self.max_wall_ms, wall_ms)
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.db_ms += db_ms
+        self.streamed += streamed
+        if response_bytes is None:
+            self.unsized += 1
+        else:
+            self.response_bytes += response_bytes
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, wall_ms)] += 1
+
+    def merge(self, other):
+        for name in ('requests', 'errors', 'over_budget', 'wall_ms', 'queries', 'db_ms', 'response_bytes', 'streamed', 'unsized'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_wall_ms = max(self.max_wall_ms, other.max_wall_ms)
+        self.max_queries = max(self.max_queries, other.max_queries)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, fraction):
+        """ Upper bound (ms) of the bucket holding the given fraction of requests; None past the last bound. """
+        wanted = fraction * self.requests
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return bound
+        return None
+
+    def as_dict(self, view):
+        sized = self.requests - self.unsized
+        return {
+            'view': view,
+            'requests': self.requests,
+            'errors': self.errors,
+            'over_budget': self.over_budget,
+            'total_ms': round(self.wall_ms, 1),
+            'avg_ms': round(self.wall_ms / self.requests, 1),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max_wall_ms, 1),
+            'avg_queries': round(self.queries / self.requests, 1),
+            'max_queries': self.max_queries,
+            'avg_db_ms': round(self.db_ms / self.requests, 1),
+            'avg_response_bytes': round(self.response_bytes / sized) if sized else None,
+            'streamed': self.streamed,
+            'histogram': {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                'overflow': self.buckets[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, window_seconds=WINDOW_SECONDS, slot_seconds=SLOT_SECONDS, clock=time.time):
+        self.window_seconds = window_seconds
+        self.slot_seconds = slot_seconds
+        self.clock = clock
+        self.started_at = clock()
+        self._slots = {}  # slot number -> {view: ViewStats}
+        self._lock = threading.Lock()
+
+    def _current_slot(self):
+        return int(self.clock() // self.slot_seconds)
+
+    def _prune(self, slot):
+        oldest = slot - self.window_seconds // self.slot_seconds
+        for number in [number for number in self._slots if number <= oldest]:
+            del self._slots[number]
+
+    def record(self, view, wall_ms, queries, db_ms, response_bytes, status, over_budget=False, streamed=False):
+        slot = self._current_slot()
+        with self._lock:
+            views = self._slots.get(slot)
+            if views is None:
+                self._prune(slot)
+                views = self._slots[slot] = {}
+            stats = views.get(view)
+            if stats is None:
+                stats = views[view] = ViewStats()
+            stats.add(wall_ms, queries, db_ms, response_bytes, status, over_budget, streamed)
+
+    def snapshot(self):
+        """ Per-view stats over the window, slowest total time first. """
+        with self._lock:
+            self._prune(self._current_slot())
+            merged = {}
+            for views in self._slots.values():
+                for view, stats in views.items():
+                    merged.setdefault(view, ViewStats()).merge(stats)
+        return {
+            'pid': os.getpid(),
+            'window_seconds': min(self.window_seconds, round(self.clock() - self.started_at)),
+            'latency_buckets_ms': list(LATENCY_BUCKETS_MS),
+            'views': sorted(
+                (stats.as_dict(view) for view, stats in merged.items()), key=lambda row: row['total_ms'], reverse=True,
+            ),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._slots.clear()
+            self.started_at = self.clock()
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """ connection.execute_wrapper() hook counting the queries run and the time spent in them. """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - start
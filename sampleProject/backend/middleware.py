@@ -1,16 +1,79 @@
-from django.utils.timezone import now
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics, query_budgets
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request and counts its database queries (on every configured
+    database) and response bytes, recording them per view in metrics.registry.
+    Requests slower than metrics.SLOW_REQUEST_MS, or running more queries than
+    their view's budget (see query_budgets), are also logged.
+
+    A streaming body runs its queries while the server reads it, after the
+    view has returned, so its chunks are produced under the same query timer
+    and the request is recorded once the stream is exhausted or closed.
+    """
 
-class SimpleMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Code executed before the view is called
-        print(f"Request received at {now()} for {request.path}")
+        timer = metrics.QueryTimer()
+        start = time.perf_counter()
+        with self.timing(timer):
+            response = self.get_response(request)
+        if response.streaming and not response.is_async:
+            content = response.streaming_content
+            response.streaming_content = self.measured_stream(content, request, response, timer, start)
+        else:
+            # Async streams are read on another thread, out of reach of the timer: recorded at the first byte
+            self.record(request, response, timer, start, None if response.streaming else len(response.content))
+        return response
 
-        response = self.get_response(request)
+    @staticmethod
+    def timing(timer):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        return stack
 
-        # Code executed after the view is called
-        print(f"Response sent at {now()}")
+    def measured_stream(self, content, request, response, timer, start):
+        chunks = iter(content)
+        size = 0
+        try:
+            while True:
+                # Only while the chunk is produced: between chunks the connection may serve other code
+                with self.timing(timer):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                size += len(chunk)
+                yield chunk
+        finally:
+            # Runs when the body is exhausted, and when the server closes the response early
+            self.record(request, response, timer, start, size, streamed=True)
 
-        return response
+    def record(self, request, response, timer, start, size, streamed=False):
+        wall_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        db_ms = timer.seconds * 1000
+        budget = query_budgets.budget_for(view)
+        over_budget = budget is not None and timer.queries > budget
+        metrics.registry.record(view, wall_ms, timer.queries, db_ms, size, response.status_code, over_budget, streamed)
+        if over_budget:
+            logger.warning(
+                f"{request.method} {request.path} ({view}) ran {timer.queries} queries, budget {budget}"
+            )
+        if wall_ms > metrics.SLOW_REQUEST_MS:
+            logger.warning(
+                f"Slow request {request.method} {request.path} ({view}): {wall_ms:.0f} ms, "
+                f"{timer.queries} queries in {db_ms:.0f} ms, status {response.status_code}"
+            )
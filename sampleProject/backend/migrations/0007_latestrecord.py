@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:29
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+TRACKED_MODELS = [
+    'employee_details', 'Dashboard', 'vitals', 'MedicalHistory', 'heamatalogy',
+    'RoutineSugarTests', 'RenalFunctionTest', 'LipidProfile', 'LiverFunctionTest',
+    'ThyroidFunctionTest', 'AutoimmuneTest', 'CoagulationTest', 'EnzymesCardiacProfile',
+    'UrineRoutineTest', 'SerologyTest', 'MotionTest', 'CultureSensitivityTest',
+    'MensPack', 'WomensPack', 'OccupationalProfile', 'OthersTest', 'OphthalmicReport',
+    'XRay', 'USGReport', 'CTReport', 'MRIReport', 'FitnessAssessment',
+    'VaccinationRecord', 'Consultation', 'Prescription', 'SignificantNotes',
+    'Form17', 'Form38', 'Form39', 'Form40', 'Form27',
+]
+
+
+def backfill_latest_records(apps, schema_editor):
+    LatestRecord = apps.get_model('backend', 'LatestRecord')
+    for name in TRACKED_MODELS:
+        model = apps.get_model('backend', name)
+        label = f"backend.{name.lower()}"
+        rows = (
+            model.objects.filter(aadhar__isnull=False)
+            .values('aadhar')
+            .annotate(latest_id=Max('id'))
+            .values_list('aadhar', 'latest_id')
+        )
+        LatestRecord.objects.bulk_create(
+            [LatestRecord(model_label=label, aadhar=aadhar, record_id=record_id) for aadhar, record_id in rows],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_alter_autoimmunetest_emp_no_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('aadhar', models.CharField(max_length=225)),
+                ('record_id', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_label', 'record_id'], name='latestrec_label_record_idx'), models.Index(fields=['aadhar'], name='latestrec_aadhar_idx')],
+                'unique_together': {('model_label', 'aadhar')},
+            },
+        ),
+        migrations.RunPython(backfill_latest_records, migrations.RunPython.noop),
+    ]
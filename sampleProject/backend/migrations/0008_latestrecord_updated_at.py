@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_latestrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='latestrecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='latestrecord',
+            index=models.Index(fields=['updated_at'], name='latestrec_updated_idx'),
+        ),
+    ]
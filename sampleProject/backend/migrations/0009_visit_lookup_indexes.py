@@ -0,0 +1,614 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:37
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+MRD_MAX_LENGTH = 255
+WIDENED_MODELS = [
+    'appointment', 'autoimmunetest', 'coagulationtest', 'ctreport', 'culturesensitivitytest',
+    'enzymescardiacprofile', 'heamatalogy', 'lipidprofile', 'liverfunctiontest', 'menspack',
+    'motiontest', 'mrireport', 'occupationalprofile', 'ophthalmicreport', 'otherstest',
+    'renalfunctiontest', 'routinesugartests', 'serologytest', 'thyroidfunctiontest',
+    'urineroutinetest', 'usgreport', 'womenspack', 'xray',
+]
+
+
+def check_mrd_lengths(apps, schema_editor):
+    """Refuse to narrow mrdNo from TEXT to VARCHAR(255) while longer values exist.
+
+    MySQL in non-strict mode would silently truncate them, so list the offenders instead.
+    """
+    offenders = []
+    for name in WIDENED_MODELS:
+        model = apps.get_model('backend', name)
+        ids = list(
+            model.objects.annotate(mrd_length=Length('mrdNo'))
+            .filter(mrd_length__gt=MRD_MAX_LENGTH)
+            .values_list('pk', flat=True)[:10]
+        )
+        if ids:
+            offenders.append(f"{model._meta.db_table} (ids {', '.join(map(str, ids))})")
+    if offenders:
+        raise RuntimeError(
+            f"Cannot convert mrdNo to CharField({MRD_MAX_LENGTH}): values longer than "
+            f"{MRD_MAX_LENGTH} characters exist in {'; '.join(offenders)}. "
+            "Shorten or clear them and re-run the migration."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_latestrecord_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_mrd_lengths, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='autoimmunetest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='coagulationtest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='ctreport',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='culturesensitivitytest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='enzymescardiacprofile',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='heamatalogy',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='lipidprofile',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='liverfunctiontest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='menspack',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='motiontest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='mrireport',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='occupationalprofile',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='ophthalmicreport',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='otherstest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='renalfunctiontest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='routinesugartests',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='serologytest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='thyroidfunctiontest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='urineroutinetest',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='usgreport',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='womenspack',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='xray',
+            name='mrdNo',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='appt_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['mrdNo'], name='appt_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['entry_date'], name='appt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date'], name='appt_visit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autoimmunetest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='autoimm_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autoimmunetest',
+            index=models.Index(fields=['mrdNo'], name='autoimm_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autoimmunetest',
+            index=models.Index(fields=['entry_date'], name='autoimm_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coagulationtest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='coag_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coagulationtest',
+            index=models.Index(fields=['mrdNo'], name='coag_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coagulationtest',
+            index=models.Index(fields=['entry_date'], name='coag_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='consult_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['mrdNo'], name='consult_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['entry_date'], name='consult_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ctreport',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='ct_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ctreport',
+            index=models.Index(fields=['mrdNo'], name='ct_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ctreport',
+            index=models.Index(fields=['entry_date'], name='ct_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culturesensitivitytest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='culture_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culturesensitivitytest',
+            index=models.Index(fields=['mrdNo'], name='culture_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culturesensitivitytest',
+            index=models.Index(fields=['entry_date'], name='culture_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dashboard',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='dash_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dashboard',
+            index=models.Index(fields=['mrdNo'], name='dash_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dashboard',
+            index=models.Index(fields=['entry_date'], name='dash_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dashboard',
+            index=models.Index(fields=['date'], name='dash_visit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee_details',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='emp_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee_details',
+            index=models.Index(fields=['mrdNo'], name='emp_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee_details',
+            index=models.Index(fields=['entry_date'], name='emp_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enzymescardiacprofile',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='enzyme_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enzymescardiacprofile',
+            index=models.Index(fields=['mrdNo'], name='enzyme_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enzymescardiacprofile',
+            index=models.Index(fields=['entry_date'], name='enzyme_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessassessment',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='fitness_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessassessment',
+            index=models.Index(fields=['mrdNo'], name='fitness_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessassessment',
+            index=models.Index(fields=['entry_date'], name='fitness_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form17',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='form17_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form17',
+            index=models.Index(fields=['mrdNo'], name='form17_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form17',
+            index=models.Index(fields=['entry_date'], name='form17_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form27',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='form27_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form27',
+            index=models.Index(fields=['mrdNo'], name='form27_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form27',
+            index=models.Index(fields=['entry_date'], name='form27_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form38',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='form38_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form38',
+            index=models.Index(fields=['mrdNo'], name='form38_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form38',
+            index=models.Index(fields=['entry_date'], name='form38_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form39',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='form39_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form39',
+            index=models.Index(fields=['mrdNo'], name='form39_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form39',
+            index=models.Index(fields=['entry_date'], name='form39_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form40',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='form40_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form40',
+            index=models.Index(fields=['mrdNo'], name='form40_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='form40',
+            index=models.Index(fields=['entry_date'], name='form40_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='heamatalogy',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='haem_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='heamatalogy',
+            index=models.Index(fields=['mrdNo'], name='haem_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='heamatalogy',
+            index=models.Index(fields=['entry_date'], name='haem_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lipidprofile',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='lipid_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lipidprofile',
+            index=models.Index(fields=['mrdNo'], name='lipid_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lipidprofile',
+            index=models.Index(fields=['entry_date'], name='lipid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='liverfunctiontest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='liver_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='liverfunctiontest',
+            index=models.Index(fields=['mrdNo'], name='liver_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='liverfunctiontest',
+            index=models.Index(fields=['entry_date'], name='liver_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='medhist_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['mrdNo'], name='medhist_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['entry_date'], name='medhist_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menspack',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='menspack_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menspack',
+            index=models.Index(fields=['mrdNo'], name='menspack_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menspack',
+            index=models.Index(fields=['entry_date'], name='menspack_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motiontest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='motion_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motiontest',
+            index=models.Index(fields=['mrdNo'], name='motion_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motiontest',
+            index=models.Index(fields=['entry_date'], name='motion_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mrireport',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='mri_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mrireport',
+            index=models.Index(fields=['mrdNo'], name='mri_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mrireport',
+            index=models.Index(fields=['entry_date'], name='mri_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='occupationalprofile',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='occprofile_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='occupationalprofile',
+            index=models.Index(fields=['mrdNo'], name='occprofile_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='occupationalprofile',
+            index=models.Index(fields=['entry_date'], name='occprofile_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ophthalmicreport',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='ophthal_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ophthalmicreport',
+            index=models.Index(fields=['mrdNo'], name='ophthal_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ophthalmicreport',
+            index=models.Index(fields=['entry_date'], name='ophthal_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otherstest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='others_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otherstest',
+            index=models.Index(fields=['mrdNo'], name='others_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otherstest',
+            index=models.Index(fields=['entry_date'], name='others_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='presc_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['mrdNo'], name='presc_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['entry_date'], name='presc_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renalfunctiontest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='renal_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renalfunctiontest',
+            index=models.Index(fields=['mrdNo'], name='renal_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renalfunctiontest',
+            index=models.Index(fields=['entry_date'], name='renal_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routinesugartests',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='sugar_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routinesugartests',
+            index=models.Index(fields=['mrdNo'], name='sugar_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routinesugartests',
+            index=models.Index(fields=['entry_date'], name='sugar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serologytest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='serology_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serologytest',
+            index=models.Index(fields=['mrdNo'], name='serology_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serologytest',
+            index=models.Index(fields=['entry_date'], name='serology_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='significantnotes',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='signotes_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='significantnotes',
+            index=models.Index(fields=['mrdNo'], name='signotes_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='significantnotes',
+            index=models.Index(fields=['entry_date'], name='signotes_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thyroidfunctiontest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='thyroid_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thyroidfunctiontest',
+            index=models.Index(fields=['mrdNo'], name='thyroid_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thyroidfunctiontest',
+            index=models.Index(fields=['entry_date'], name='thyroid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urineroutinetest',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='urine_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urineroutinetest',
+            index=models.Index(fields=['mrdNo'], name='urine_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urineroutinetest',
+            index=models.Index(fields=['entry_date'], name='urine_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usgreport',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='usg_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usgreport',
+            index=models.Index(fields=['mrdNo'], name='usg_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usgreport',
+            index=models.Index(fields=['entry_date'], name='usg_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinationrecord',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='vacc_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinationrecord',
+            index=models.Index(fields=['mrdNo'], name='vacc_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinationrecord',
+            index=models.Index(fields=['entry_date'], name='vacc_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vitals',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='vitals_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vitals',
+            index=models.Index(fields=['mrdNo'], name='vitals_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vitals',
+            index=models.Index(fields=['entry_date'], name='vitals_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='womenspack',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='womenspack_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='womenspack',
+            index=models.Index(fields=['mrdNo'], name='womenspack_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='womenspack',
+            index=models.Index(fields=['entry_date'], name='womenspack_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xray',
+            index=models.Index(fields=['aadhar', 'entry_date'], name='xray_aadhar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xray',
+            index=models.Index(fields=['mrdNo'], name='xray_mrd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xray',
+            index=models.Index(fields=['entry_date'], name='xray_date_idx'),
+        ),
+    ]
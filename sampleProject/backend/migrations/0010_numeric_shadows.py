@@ -0,0 +1,212 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:39
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of backend.numeric as of this migration, so later changes there cannot alter it
+SHADOW_SUFFIX = '_num'
+SHADOWED_MODELS = ['vitals', 'heamatalogy', 'LipidProfile']
+BACKFILL_CHUNK_SIZE = 1000
+
+_NUMBER = re.compile(r'(?:(?<![\w.])[-+])?(?:\d+\.?\d*|\.\d+)')
+
+
+def parse_numeric(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def backfill_numeric_shadows(apps, schema_editor):
+    for name in SHADOWED_MODELS:
+        model = apps.get_model('backend', name)
+        shadows = [f.name for f in model._meta.concrete_fields if f.name.endswith(SHADOW_SUFFIX)]
+        sources = [shadow[:-len(SHADOW_SUFFIX)] for shadow in shadows]
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', *sources)[:BACKFILL_CHUNK_SIZE]
+            )
+            if not rows:
+                break
+            model.objects.bulk_update(
+                [model(id=row[0], **{shadow: parse_numeric(value) for shadow, value in zip(shadows, row[1:])}) for row in rows],
+                shadows,
+            )
+            last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_visit_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='Haemotocrit_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='basophil_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='eosinophil_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='esr_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='hemoglobin_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='lymphocyte_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='mch_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='mchc_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='mcv_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='monocyte_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='neutrophil_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='pcv_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='platelet_count_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='rdw_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='total_rbc_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='heamatalogy',
+            name='total_wbc_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='Total_Cholesterol_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='chol_hdl_ratio_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='hdl_cholesterol_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='ldl_chol_hdl_chol_ratio_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='ldl_cholesterol_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='triglycerides_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lipidprofile',
+            name='vldl_cholesterol_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='bmi_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='diastolic_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='height_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='pulse_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='respiratory_rate_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='spO2_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='systolic_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='temperature_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitals',
+            name='weight_num',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_numeric_shadows, migrations.RunPython.noop),
+    ]
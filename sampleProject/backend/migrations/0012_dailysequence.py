@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('name', 'day')},
+            },
+        ),
+    ]
@@ -3,6 +3,8 @@ from datetime import date, datetime
 from django.utils import timezone # Import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .numeric import sync_numeric_fields, with_numeric_shadows
+
 # --- Abstract Base Model ---
 class BaseModel(models.Model):
     # Assuming ID is handled automatically by Django unless specified
@@ -11,6 +13,35 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
+
+def visit_indexes(prefix, *extra):
+    """
+    Indexes for the lookups every visit table serves: a worker's history by
+    (aadhar, entry_date) -- which also covers plain aadhar lookups -- visits by
+    mrdNo, and date-range scans on entry_date. Names must stay under 30 chars.
+    """
+    return [
+        models.Index(fields=['aadhar', 'entry_date'], name=f'{prefix}_aadhar_date_idx'),
+        models.Index(fields=['mrdNo'], name=f'{prefix}_mrd_idx'),
+        models.Index(fields=['entry_date'], name=f'{prefix}_date_idx'),
+        *extra,
+    ]
+
+
+def numeric_shadow():
+    """ Indexed float copy of a free-text measurement (see backend/numeric.py). """
+    return models.FloatField(null=True, blank=True, db_index=True, editable=False)
+
+
+class NumericShadowMixin:
+    """ Keeps every "<field>_num" shadow column in step with its text field on save(). """
+
+    def save(self, *args, **kwargs):
+        sync_numeric_fields(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = with_numeric_shadows(type(self), kwargs['update_fields'])
+        super().save(*args, **kwargs)
+
 # --- User Model ---
 # No emp_no, so no aadhar added here
 class user(BaseModel):
@@ -150,6 +181,9 @@ class employee_details(BaseModel):
             self.profilepic_url = self.profilepic.url
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = visit_indexes('emp')
+
 
 # --- Dashboard Model ---
 class Dashboard(BaseModel):
@@ -188,9 +222,12 @@ class Dashboard(BaseModel):
     def __str__(self):
         return f"Dashboard Record {self.id} for Emp {self.emp_no or self.aadhar}"
 
+    class Meta:
+        indexes = visit_indexes('dash', models.Index(fields=['date'], name='dash_visit_date_idx'))
+
 
 
-class vitals(BaseModel):
+class vitals(NumericShadowMixin, BaseModel):
     
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True) # Added Aadhar
@@ -229,9 +266,23 @@ class vitals(BaseModel):
     self_declared = models.FileField(upload_to= 'self_declared/', blank = True, null=True)
     mrdNo = models.CharField(max_length=255, blank=True, null=True)
 
+    # --- Numeric shadows for range filters ---
+    systolic_num = numeric_shadow()
+    diastolic_num = numeric_shadow()
+    pulse_num = numeric_shadow()
+    respiratory_rate_num = numeric_shadow()
+    temperature_num = numeric_shadow()
+    spO2_num = numeric_shadow()
+    weight_num = numeric_shadow()
+    height_num = numeric_shadow()
+    bmi_num = numeric_shadow()
+
     def __str__(self):
         return f"Vitals for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('vitals')
+
 
 # --- Mock Drills Model --- *MODIFIED*
 class mockdrills(BaseModel):
@@ -300,10 +351,10 @@ from django.db import models
 # Assuming BaseModel is defined in your project, otherwise change to models.Model
 # from .models import BaseModel 
 
-class heamatalogy(BaseModel):
+class heamatalogy(NumericShadowMixin, BaseModel):
     
     checked = models.BooleanField(default=False)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True) 
@@ -414,14 +465,35 @@ class heamatalogy(BaseModel):
     peripheral_blood_smear_others = models.TextField(max_length=255)
     peripheral_blood_smear_others_comments = models.TextField(max_length=255)
 
+    # --- Numeric shadows for range filters ---
+    hemoglobin_num = numeric_shadow()
+    total_rbc_num = numeric_shadow()
+    total_wbc_num = numeric_shadow()
+    Haemotocrit_num = numeric_shadow()
+    neutrophil_num = numeric_shadow()
+    monocyte_num = numeric_shadow()
+    pcv_num = numeric_shadow()
+    mcv_num = numeric_shadow()
+    mch_num = numeric_shadow()
+    lymphocyte_num = numeric_shadow()
+    esr_num = numeric_shadow()
+    mchc_num = numeric_shadow()
+    platelet_count_num = numeric_shadow()
+    rdw_num = numeric_shadow()
+    eosinophil_num = numeric_shadow()
+    basophil_num = numeric_shadow()
+
     def _str_(self):
         return f"Haematology Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('haem')
+
 # --- Routine Sugar Tests Model --- *MODIFIED*
 class RoutineSugarTests(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
 
     # --- Glucose (F) ---
@@ -457,12 +529,15 @@ class RoutineSugarTests(BaseModel):
     def __str__(self):
         return f"Routine Sugar Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('sugar')
+
 # --- Renal Function Test Model --- *MODIFIED*
 # --- Renal Function Test Model ---
 class RenalFunctionTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
 
     # --- Urea ---
@@ -534,13 +609,16 @@ class RenalFunctionTest(BaseModel):
     def __str__(self):
         return f"Renal Function Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('renal')
+
 
 # --- Lipid Profile Model ---
-class LipidProfile(BaseModel):
+class LipidProfile(NumericShadowMixin, BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
     
     # --- Total Cholesterol ---
     Total_Cholesterol= models.TextField(max_length=255)
@@ -584,16 +662,28 @@ class LipidProfile(BaseModel):
     ldl_chol_hdl_chol_ratio_reference_range = models.TextField(max_length=255, null=True, blank=True)
     ldl_chol_hdl_chol_ratio_comments = models.TextField(max_length=255)
 
+    # --- Numeric shadows for range filters ---
+    Total_Cholesterol_num = numeric_shadow()
+    triglycerides_num = numeric_shadow()
+    hdl_cholesterol_num = numeric_shadow()
+    ldl_cholesterol_num = numeric_shadow()
+    chol_hdl_ratio_num = numeric_shadow()
+    vldl_cholesterol_num = numeric_shadow()
+    ldl_chol_hdl_chol_ratio_num = numeric_shadow()
+
     def __str__(self):
         return f"Lipid Profile Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('lipid')
+
 
 # --- Liver Function Test Model ---
 class LiverFunctionTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Bilirubin Total ---
     bilirubin_total = models.TextField(max_length=255)
@@ -670,12 +760,15 @@ class LiverFunctionTest(BaseModel):
     def __str__(self):
         return f"Liver Function Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('liver')
+
 # --- Thyroid Function Test Model ---
 class ThyroidFunctionTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- T3 Fields ---
     t3_triiodothyronine = models.TextField(max_length=255)
@@ -698,13 +791,16 @@ class ThyroidFunctionTest(BaseModel):
     def __str__(self):
         return f"Thyroid Function Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('thyroid')
+
 
 # --- Autoimmune test Model ---
 class AutoimmuneTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- ANA ---
     ANA = models.TextField(max_length=255)
@@ -733,13 +829,16 @@ class AutoimmuneTest(BaseModel):
     def __str__(self):
         return f"Autoimmune Test {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('autoimm')
+
 
 # --- Coagulation Test Model ---
 class CoagulationTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Prothrombin Time ---
     prothrombin_time = models.TextField(max_length=255)
@@ -768,13 +867,16 @@ class CoagulationTest(BaseModel):
     def __str__(self):
         return f"Coagulation Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('coag')
+
 
 # --- Enzymes Cardiac Profile Model ---
 class EnzymesCardiacProfile(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Acid Phosphatase ---
     acid_phosphatase = models.TextField(max_length=255)
@@ -843,13 +945,16 @@ class EnzymesCardiacProfile(BaseModel):
     def _str_(self):
         return f"Enzymes & Cardiac Profile Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('enzyme')
+
 
 # --- Urine Routine Test Model ---
 class UrineRoutineTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Colour ---
     colour = models.TextField(max_length=255)
@@ -950,12 +1055,15 @@ class UrineRoutineTest(BaseModel):
     def __str__(self):
         return f"Urine Routine Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('urine')
+
 # --- Serology Test Model ---
 class SerologyTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Screening HIV 1 ---
     screening_hiv = models.TextField(max_length=255)
@@ -1014,13 +1122,16 @@ class SerologyTest(BaseModel):
     def __str__(self):
         return f"Serology Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('serology')
+
 
 # --- Motion Test Model ---
 class MotionTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Colour ---
     colour_motion = models.TextField(max_length=255)
@@ -1079,13 +1190,16 @@ class MotionTest(BaseModel):
     def __str__(self):
         return f"Motion Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('motion')
+
 
 # --- Culture Sensitivity Test Model ---
 class CultureSensitivityTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Urine ---
     urine = models.TextField(max_length=255)
@@ -1114,13 +1228,16 @@ class CultureSensitivityTest(BaseModel):
     def __str__(self):
         return f"Culture & Sensitivity Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('culture')
+
 
 # --- Mens Pack Model ---
 class MensPack(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- PSA ---
     psa = models.TextField(max_length=255)
@@ -1131,6 +1248,9 @@ class MensPack(BaseModel):
     def __str__(self):
         return f"Men's Pack Test Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('menspack')
+
 
 # --- Womens Pack Model ---
 # No reference ranges in original code, usually just results/comments
@@ -1138,7 +1258,7 @@ class WomensPack(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True) 
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     Mammogaram  = models.TextField(max_length=255)
     Mammogaram_comments = models.TextField(max_length=255)
@@ -1148,6 +1268,9 @@ class WomensPack(BaseModel):
     
     def __str__(self):
         return f"Women's Pack {self.id} for Emp {self.emp_no}"
+
+    class Meta:
+        indexes = visit_indexes('womenspack')
     
 
 # --- OccupationalProfile Model ---
@@ -1156,7 +1279,7 @@ class OccupationalProfile(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)   
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     Audiometry  = models.TextField(max_length=255)
     Audiometry_comments = models.TextField(max_length=255)
@@ -1166,6 +1289,9 @@ class OccupationalProfile(BaseModel):
     
     def __str__(self):
         return f"Occupational Profile {self.id} for Emp {self.emp_no}"
+
+    class Meta:
+        indexes = visit_indexes('occprofile')
    
 
 # --- Others Test Model ---      
@@ -1173,7 +1299,7 @@ class OthersTest(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)   
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     # --- Bone Densitometry ---
     Bone_Densitometry = models.TextField(max_length=255)
@@ -1229,6 +1355,9 @@ class OthersTest(BaseModel):
     
     def _str_(self):
         return f"Others Test {self.id} for Emp {self.emp_no}"
+
+    class Meta:
+        indexes = visit_indexes('others')
     
 
 # --- Ophthalmic Report Model ---
@@ -1236,7 +1365,7 @@ class OphthalmicReport(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     vision = models.TextField(max_length=255)
     vision_comments = models.TextField(max_length=255)
@@ -1250,13 +1379,16 @@ class OphthalmicReport(BaseModel):
     def __str__(self):
         return f"Ophthalmic Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('ophthal')
+
 
 # --- XRay Model ---
 class XRay(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     Chest = models.TextField(max_length=255)
     Chest_comments = models.TextField(max_length=255)
@@ -1285,13 +1417,16 @@ class XRay(BaseModel):
     def __str__(self):
         return f"X-Ray {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('xray')
+
 
 # --- USG Report Model ---
 class USGReport(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     usg_abdomen = models.TextField(max_length=255)
     usg_abdomen_comments = models.TextField(max_length=255)
@@ -1308,6 +1443,9 @@ class USGReport(BaseModel):
     def __str__(self):
         return f"USG Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('usg')
+
 
 # --- CT Report Model --- *MODIFIED*
 
@@ -1316,7 +1454,7 @@ class CTReport(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     CT_brain = models.TextField(max_length=255)
     CT_brain_comments = models.TextField(max_length=255)
@@ -1350,6 +1488,9 @@ class CTReport(BaseModel):
     
     def __str__(self):
         return f"CT {self.id} for Emp {self.emp_no}"
+
+    class Meta:
+        indexes = visit_indexes('ct')
     
 
 # --- MRI Report Model ---
@@ -1357,7 +1498,7 @@ class MRIReport(BaseModel):
     checked = models.BooleanField(default=False)
     emp_no = models.TextField(max_length=200, blank=True, null=True)
     aadhar = models.CharField(max_length=225, blank=True, null=True)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
 
     mri_brain = models.TextField(max_length=255)
     mri_brain_comments = models.TextField(max_length=255)
@@ -1392,6 +1533,9 @@ class MRIReport(BaseModel):
     def __str__(self):
         return f"MRI Report {self.id} for Emp {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('mri')
+
 from django.db import models
 from datetime import date
 
@@ -1409,7 +1553,7 @@ class Appointment(BaseModel):
     # Core Fields
     appointment_no = models.TextField(max_length=255, blank=True)
     booked_date = models.DateField(default=date.today)
-    mrdNo = models.TextField(max_length=255, blank=True)
+    mrdNo = models.CharField(max_length=255, blank=True)
     
     # Classification
     role = models.TextField(max_length=100, blank=True) # e.g., "Employee"
@@ -1464,6 +1608,9 @@ class Appointment(BaseModel):
         apt_date_str = self.date.strftime('%Y-%m-%d') if self.date else 'N/A'
         return f"Appointment for {self.name} ({self.emp_no or 'N/A'}) on {apt_date_str}"
 
+    class Meta:
+        indexes = visit_indexes('appt', models.Index(fields=['date'], name='appt_visit_date_idx'))
+
 # --- Fitness Assessment Model --- *MODIFIED*
 class FitnessAssessment(BaseModel):
 
@@ -1558,6 +1705,7 @@ class FitnessAssessment(BaseModel):
     class Meta:
         verbose_name = "Fitness Assessment"
         verbose_name_plural = "Fitness Assessments"
+        indexes = visit_indexes('fitness')
 
 
 # --- Vaccination Record Model --- *MODIFIED*
@@ -1570,6 +1718,9 @@ class VaccinationRecord(BaseModel):
     def __str__(self):
         return f"Vaccination Record for {self.emp_no}"
 
+    class Meta:
+        indexes = visit_indexes('vacc')
+
 # --- Review Category Model ---
 # No emp_no, so no aadhar added here
 class ReviewCategory(BaseModel):
@@ -1638,6 +1789,9 @@ class MedicalHistory(BaseModel):
     def __str__(self):
         return f"Medical History for Emp No: {self.emp_no or 'N/A'}"
 
+    class Meta:
+        indexes = visit_indexes('medhist')
+
 
 # --- Consultation Model --- *MODIFIED*
 # Using models.Model directly as per original, ensure BaseModel features are replicated if needed
@@ -1712,6 +1866,7 @@ class Consultation(models.Model):
 
     class Meta:
         ordering = ['-entry_date', '-id']
+        indexes = visit_indexes('consult')
 
     def __str__(self):
         entry_date_str = self.entry_date.strftime('%Y-%m-%d') if self.entry_date else 'N/A'
@@ -1929,6 +2084,9 @@ class Prescription(BaseModel):
     def __str__(self): # Changed from str to __str__
         return f"Prescription #{self.pk} for {self.name} (Emp: {self.emp_no or 'N/A'})"
 
+    class Meta:
+        indexes = visit_indexes('presc')
+
 # --- Form Models (17, 38, 39, 40, 27) --- *MODIFIED*
 class Form17(BaseModel):
     mrdNo = models.CharField(max_length=255, blank=True, null=True)
@@ -1957,6 +2115,9 @@ class Form17(BaseModel):
     def __str__(self):
         return f"Form 17 - {self.workerName or 'N/A'} (Emp: {self.emp_no or 'N/A'})"
 
+    class Meta:
+        indexes = visit_indexes('form17')
+
 class Form38(BaseModel):
     mrdNo = models.CharField(max_length=255, blank=True, null=True)
     emp_no = models.CharField(max_length=255, blank=True, null=True)
@@ -1977,6 +2138,9 @@ class Form38(BaseModel):
     def __str__(self):
         return f"Form 38 - {self.workerName or 'N/A'} (Emp: {self.emp_no or 'N/A'})"
 
+    class Meta:
+        indexes = visit_indexes('form38')
+
 class Form39(BaseModel):
     mrdNo = models.CharField(max_length=255, blank=True, null=True)
     emp_no = models.CharField(max_length=255, blank=True, null=True)
@@ -1997,6 +2161,9 @@ class Form39(BaseModel):
     def __str__(self):
         return f"Form 39 - {self.workerName or 'N/A'} (Emp: {self.emp_no or 'N/A'})"
 
+    class Meta:
+        indexes = visit_indexes('form39')
+
 class Form40(BaseModel):
     mrdNo = models.CharField(max_length=255, blank=True, null=True)
     emp_no = models.CharField(max_length=255, blank=True, null=True)
@@ -2022,6 +2189,9 @@ class Form40(BaseModel):
     def __str__(self):
         return f"Form 40 - {self.workerName or 'N/A'} (Emp: {self.emp_no or 'N/A'})"
 
+    class Meta:
+        indexes = visit_indexes('form40')
+
 class Form27(BaseModel):
     mrdNo = models.CharField(max_length=255, blank=True, null=True)
     emp_no = models.CharField(max_length=255, blank=True, null=True)
@@ -2041,6 +2211,9 @@ class Form27(BaseModel):
 
     def __str__(self):
         return f"Form 27 - {self.nameOfWorks or 'N/A'} (Emp: {self.emp_no or 'N/A'})"
+
+    class Meta:
+        indexes = visit_indexes('form27')
     
 
 
@@ -2226,6 +2399,7 @@ class SignificantNotes(BaseModel):
         verbose_name = "Significant Note"
         verbose_name_plural = "Significant Notes"
         ordering = ['-entry_date', 'emp_no']
+        indexes = visit_indexes('signotes')
 
 
 # --- Pharmacy Stock History Model ---
@@ -2278,4 +2452,87 @@ class DailyQuantity(models.Model):
 
     def __str__(self):
         expiry_str = f" (Exp: {self.expiry_date})" if self.expiry_date else ""
-        return f"{self.chemical_name} ({self.brand_name} - {self.dose_volume}{expiry_str}) on {self.date}: {self.quantity}"
\ No newline at end of file
+        return f"{self.chemical_name} ({self.brand_name} - {self.dose_volume}{expiry_str}) on {self.date}: {self.quantity}"
+
+
+# --- Latest Record Pointers ---
+class LatestRecord(models.Model):
+    """
+    Points at the newest row (highest id) of a tracked model for one Aadhar.
+    Kept current on write by backend.latest, so "latest record per worker"
+    lookups are indexed reads instead of GROUP BY scans over the source table.
+    """
+    model_label = models.CharField(max_length=100) # e.g. "backend.vitals"
+    aadhar = models.CharField(max_length=225)
+    record_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True) # watermark for incremental consumers (backend.bitmaps)
+
+    class Meta:
+        unique_together = [['model_label', 'aadhar']]
+        indexes = [
+            models.Index(fields=['model_label', 'record_id'], name='latestrec_label_record_idx'),
+            models.Index(fields=['aadhar'], name='latestrec_aadhar_idx'),
+            models.Index(fields=['updated_at'], name='latestrec_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} latest for {self.aadhar}: {self.record_id}"
+
+
+class ImportJob(models.Model):
+    """
+    An Excel upload queued for the background import worker (backend.jobs,
+    `manage.py run_import_jobs`). Progress counters are written while it runs.
+    """
+    class Kind(models.TextChoices):
+        HR = 'hr', 'HR Data'
+        MEDICAL = 'medical', 'Medical Camp Data'
+        APPOINTMENT = 'appointment', 'Appointments'
+
+    class StatusChoices(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    params = models.JSONField(default=dict, blank=True) # e.g. {"data_type": "employee"} for HR uploads
+    file = models.FileField(upload_to='import_jobs/')
+    status = models.CharField(max_length=20, choices=StatusChoices.choices, default=StatusChoices.QUEUED)
+    submitted_by = models.CharField(max_length=255, blank=True, default='')
+    worker = models.CharField(max_length=255, blank=True, default='')
+    rows_total = models.PositiveIntegerField(null=True, blank=True) # None until the worker knows the size
+    rows_done = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True) # first messages only, see jobs.MAX_STORED_ERRORS
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True) # last sign of life from the running worker
+    attempts = models.PositiveIntegerField(default=0) # times claimed; a stale job is claimed again
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='importjob_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import #{self.pk} ({self.status})"
+
+
+class DailySequence(models.Model):
+    """
+    Last number handed out by a per-day counter such as MRD or appointment
+    numbers. Advanced only through backend.sequences, one atomic UPDATE per
+    reservation.
+    """
+    name = models.CharField(max_length=50) # e.g. "mrd"
+    day = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = [['name', 'day']]
+
+    def __str__(self):
+        return f"{self.name} {self.day}: {self.last_value}"
@@ -0,0 +1,65 @@
+"""
+Numeric shadow columns for free-text measurements.
+
+Vitals and lab results are stored as text ("120", "13.5 g/dL", "1,80,000").
+Range filters on those columns compare strings, so "9" > "10" and no index
+helps. Models that need range queries declare a FloatField named
+"<field>_num" next to the text field; NumericShadowMixin fills it on every
+save() and bulk writers call sync_numeric_fields() themselves, since
+bulk_create/bulk_update skip save().
+"""
+import re
+from functools import lru_cache
+
+SHADOW_SUFFIX = '_num'
+
+# A sign only counts when it does not follow a word character ("Hb-12" is 12)
+_NUMBER = re.compile(r'(?:(?<![\w.])[-+])?(?:\d+\.?\d*|\.\d+)')
+
+
+def parse_numeric(value):
+    """
+    First number in a measurement string, as a float; None when there is none.
+    Thousands separators are ignored: "1,80,000 /cumm" -> 180000.0.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def shadow_name(field_name):
+    return f'{field_name}{SHADOW_SUFFIX}'
+
+
+@lru_cache(maxsize=None)
+def numeric_pairs(model):
+    """ (source field, shadow field) attnames of every shadowed column of `model`. """
+    names = {f.attname for f in model._meta.concrete_fields}
+    return tuple(
+        (name[:-len(SHADOW_SUFFIX)], name) for name in sorted(names)
+        if name.endswith(SHADOW_SUFFIX) and name[:-len(SHADOW_SUFFIX)] in names
+    )
+
+
+def sync_numeric_fields(instance):
+    """ Re-parses every shadowed field of an unsaved or about-to-be-saved instance. """
+    for source, shadow in numeric_pairs(type(instance)):
+        setattr(instance, shadow, parse_numeric(getattr(instance, source)))
+
+
+def with_numeric_shadows(model, fields):
+    """ Extends an update_fields / bulk_update field list with the shadows of the listed fields. """
+    fields = list(fields)
+    listed = set(fields)
+    fields.extend(shadow for source, shadow in numeric_pairs(model) if source in listed and shadow not in listed)
+    return fields
+
+
+def numeric_lookup(model, field_name):
+    """ The field to range-filter on: the shadow when `model` has one, else the text field itself. """
+    if any(source == field_name for source, _ in numeric_pairs(model)):
+        return shadow_name(field_name)
+    return field_name
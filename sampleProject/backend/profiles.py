@@ -0,0 +1,226 @@
+"""
+Worker profile and visit bundle assembly.
+
+Profiles (fetchdatawithID):
+A profile is the newest employee_details row for an Aadhar with the newest row
+of every clinical section attached. "Newest" is the row with the highest id,
+the row LatestRecord points at, as in fetchdata: a back-dated record (say a
+camp upload with an old entry_date) saved after a later visit becomes the
+current one. All section pointers are read from LatestRecord in one query;
+the rows they point at are then read in a second one, a UNION ALL of one
+primary-key read per table with every column cast to text and padded to the
+widest table, and converted back per field. Sections without data get a
+placeholder whose structure is built once, when this module is imported.
+
+Visit bundles (fetchVisitDataWithDate, visitDataBundle):
+Every MRD-linked section of one or more visits. Each section table is queried
+once per chunk of MRD numbers, however many visits are requested, and rows are
+serialized straight from .values() dicts.
+"""
+import json
+import logging
+from datetime import date, datetime
+
+from django.db.models import (
+    BooleanField, DateField, FileField, FloatField, IntegerField, JSONField, Min, TextField, Value,
+)
+from django.db.models.functions import Cast
+
+from .models import (
+    LatestRecord, employee_details, Dashboard, vitals, MedicalHistory, heamatalogy,
+    RoutineSugarTests, RenalFunctionTest, LipidProfile, LiverFunctionTest, ThyroidFunctionTest,
+    AutoimmuneTest, CoagulationTest, EnzymesCardiacProfile, UrineRoutineTest,
+    SerologyTest, MotionTest, CultureSensitivityTest, MensPack, WomensPack,
+    OccupationalProfile, OthersTest, OphthalmicReport, XRay, USGReport,
+    CTReport, MRIReport, FitnessAssessment, VaccinationRecord, Consultation,
+    Prescription, SignificantNotes, Form17, Form38, Form39, Form40, Form27
+)
+from .record_templates import empty_record
+
+logger = logging.getLogger(__name__)
+
+# (response key, model) in the order the frontend has always received them.
+PROFILE_SECTIONS = [
+    ("dashboard", Dashboard), ("vitals", vitals), ("medicalhistory", MedicalHistory),
+    ("heamatalogy", heamatalogy), ("routinesugartests", RoutineSugarTests),
+    ("renalfunctiontests_and_electrolytes", RenalFunctionTest), ("lipidprofile", LipidProfile),
+    ("liverfunctiontest", LiverFunctionTest), ("thyroidfunctiontest", ThyroidFunctionTest),
+    ("autoimmunetest", AutoimmuneTest), ("coagulationtest", CoagulationTest),
+    ("enzymescardiacprofile", EnzymesCardiacProfile), ("urineroutinetest", UrineRoutineTest),
+    ("serologytest", SerologyTest), ("motiontest", MotionTest),
+    ("culturesensitivitytest", CultureSensitivityTest), ("menspack", MensPack),
+    ("womenspack", WomensPack), ("occupationalprofile", OccupationalProfile),
+    ("otherstest", OthersTest), ("ophthalmicreport", OphthalmicReport), ("xray", XRay),
+    ("usgreport", USGReport), ("ctreport", CTReport), ("mrireport", MRIReport),
+    ("fitnessassessment", FitnessAssessment), ("vaccinationrecord", VaccinationRecord),
+    ("consultation", Consultation), ("prescription", Prescription),
+    ("significantnotes", SignificantNotes), ("form17", Form17), ("form38", Form38),
+    ("form39", Form39), ("form40", Form40), ("form27", Form27),
+]
+
+
+def _isoformat_dates(record):
+    for k, v in record.items():
+        if isinstance(v, (datetime, date)):
+            record[k] = v.isoformat()
+    return record
+
+
+_PROFILE_WIDTH = max(len(model._meta.concrete_fields) for model in [employee_details] + [m for _, m in PROFILE_SECTIONS])
+
+
+def _text_row_query(key, model, record_id):
+    """ The row `record_id` of `model` as (section, col0 .. colN) text columns, padded to _PROFILE_WIDTH. """
+    fields = model._meta.concrete_fields
+    columns = {"section": Value(key, output_field=TextField())}
+    for i in range(_PROFILE_WIDTH):
+        columns[f"col{i}"] = (
+            Cast(fields[i].attname, TextField()) if i < len(fields) else Value(None, output_field=TextField())
+        )
+    return model.objects.filter(pk=record_id).order_by().values(**columns)
+
+
+def _from_text(field, value):
+    """ The value .values() would return for `field`, from its column cast to text. """
+    if value is None:
+        return None
+    if isinstance(field, JSONField):
+        return json.loads(value)
+    if isinstance(field, BooleanField):
+        return value not in ("0", "false", "False")
+    if isinstance(field, (DateField, FloatField, IntegerField)) or field.primary_key:
+        return field.to_python(value)
+    return value
+
+
+def _read_rows(sections):
+    """ {key: .values() dict} for (key, model, record_id) sections, read in one query. """
+    queries = [_text_row_query(key, model, record_id) for key, model, record_id in sections]
+    models = {key: model for key, model, _ in sections}
+    rows = {}
+    for row in queries[0].union(*queries[1:], all=True):
+        fields = models[row["section"]]._meta.concrete_fields
+        rows[row["section"]] = {field.attname: _from_text(field, row[f"col{i}"]) for i, field in enumerate(fields)}
+    return rows
+
+
+def assemble_profile(aadhar, media_url_prefix=""):
+    """
+    Returns the worker profile dict for `aadhar`, or None if the worker has no
+    employee_details record. Costs two queries however many sections hold data.
+    """
+    pointers = dict(
+        LatestRecord.objects.filter(aadhar=aadhar).values_list("model_label", "record_id")
+    )
+    employee_id = pointers.get(employee_details._meta.label_lower)
+    if employee_id is None:
+        return None
+
+    sections = [("employee", employee_details, employee_id)] + [
+        (key, model, pointers[model._meta.label_lower])
+        for key, model in PROFILE_SECTIONS if model._meta.label_lower in pointers
+    ]
+    rows = _read_rows(sections)
+    employee = rows.pop("employee", None)
+    if employee is None:
+        return None
+    employee["profilepic_url"] = f"{media_url_prefix}{employee['profilepic']}" if employee.get("profilepic") else None
+
+    for key, model in PROFILE_SECTIONS:
+        employee[key] = _isoformat_dates(rows.get(key) or empty_record(model))
+
+    return employee
+
+
+# (response key, model) for visit bundles, in the order the frontend has always received them.
+VISIT_SECTIONS = [
+    ("dashboard", Dashboard), ("vitals", vitals),
+    ("msphistory", MedicalHistory), ("haematology", heamatalogy),
+    ("routinesugartests", RoutineSugarTests),
+    ("renalfunctiontests_and_electrolytes", RenalFunctionTest),
+    ("lipidprofile", LipidProfile), ("liverfunctiontest", LiverFunctionTest),
+    ("thyroidfunctiontest", ThyroidFunctionTest), ("coagulationtest", CoagulationTest),
+    ("enzymesandcardiacprofile", EnzymesCardiacProfile), ("urineroutine", UrineRoutineTest),
+    ("serology", SerologyTest), ("motion", MotionTest), ("menspack", MensPack),
+    ("opthalamicreport", OphthalmicReport), ("usg", USGReport), ("mri", MRIReport),
+    ("fitnessassessment", FitnessAssessment), ("vaccination", VaccinationRecord),
+    ("significant_notes", SignificantNotes), ("consultation", Consultation),
+    ("prescription", Prescription), ("form17", Form17), ("form38", Form38),
+    ("form39", Form39), ("form40", Form40), ("form27", Form27),
+    ("autoimmunetest", AutoimmuneTest), ("routinecultureandsensitive", CultureSensitivityTest),
+    ("womenpack", WomensPack), ("occupationalprofile", OccupationalProfile),
+    ("otherstest", OthersTest), ("xray", XRay), ("ct", CTReport),
+]
+
+VISIT_MRD_CHUNK_SIZE = 500
+
+
+def _serialized_fields(model):
+    """ The fields model_to_dict would return: concrete and editable. """
+    return [f for f in model._meta.concrete_fields if f.editable]
+
+
+_VISIT_FIELDS = {model: _serialized_fields(model) for model in [employee_details] + [m for _, m in VISIT_SECTIONS]}
+
+
+def _serialize_row(model, row):
+    """ Same output as serialize_model_instance, for a .values() row. """
+    for field in _VISIT_FIELDS[model]:
+        value = row.get(field.attname)
+        if isinstance(field, FileField):
+            row[field.attname] = field.storage.url(value) if value else None
+        elif isinstance(value, (datetime, date)):
+            row[field.attname] = value.isoformat()
+    return row
+
+
+def _first_rows_by(model, lookup, keys):
+    """
+    The row .filter(<lookup>=key).first() would return, for every key, using
+    one query per chunk of keys.
+    """
+    attnames = [f.attname for f in _VISIT_FIELDS[model]]
+    ordering = model._meta.ordering or ["pk"]
+    first_rows = {}
+    for start in range(0, len(keys), VISIT_MRD_CHUNK_SIZE):
+        chunk = keys[start:start + VISIT_MRD_CHUNK_SIZE]
+        for row in model.objects.filter(**{f"{lookup}__in": chunk}).order_by(*ordering, "pk").values(*attnames):
+            first_rows.setdefault(row[lookup], row)
+    return first_rows
+
+
+def visit_bundles(mrd_nos):
+    """
+    Returns {mrdNo: bundle} for every requested MRD number. A bundle maps each
+    VISIT_SECTIONS key to the serialized record ({} when absent) and
+    "employee" to the worker's first employee_details record (None when no
+    section carried an Aadhar).
+    """
+    mrd_nos = list(dict.fromkeys(m for m in mrd_nos if m))
+    bundles = {mrd: {} for mrd in mrd_nos}
+    anchor_aadhars = {}
+
+    for key, model in VISIT_SECTIONS:
+        rows = _first_rows_by(model, "mrdNo", mrd_nos)
+        for mrd in mrd_nos:
+            row = rows.get(mrd)
+            bundles[mrd][key] = _serialize_row(model, row) if row else {}
+            # The first section holding an Aadhar anchors the visit to a worker
+            if row and mrd not in anchor_aadhars and row.get("aadhar"):
+                anchor_aadhars[mrd] = row["aadhar"]
+
+    aadhars = list(set(anchor_aadhars.values()))
+    first_ids = []
+    for start in range(0, len(aadhars), VISIT_MRD_CHUNK_SIZE):
+        first_ids.extend(
+            employee_details.objects.filter(aadhar__in=aadhars[start:start + VISIT_MRD_CHUNK_SIZE])
+            .values("aadhar").annotate(first_id=Min("id")).values_list("first_id", flat=True)
+        )
+    employees = _first_rows_by(employee_details, "id", first_ids)
+    employees_by_aadhar = {row["aadhar"]: _serialize_row(employee_details, row) for row in employees.values()}
+
+    for mrd in mrd_nos:
+        aadhar = anchor_aadhars.get(mrd)
+        bundles[mrd]["employee"] = employees_by_aadhar.get(aadhar) if aadhar else None
+
+    return bundles
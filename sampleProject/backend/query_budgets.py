@@ -0,0 +1,185 @@
+"""
+Query budgets: the most database queries one request to each URL name in
+backend/urls.py may run.
+
+backend/tests.py seeds twenty workers with their visits, twenty stock lines,
+twenty instruments and so on, varied in sex, type, status and clinical values
+so that filtered requests select some rows and skip others. It replays requests
+through every endpoint, with and without filters, and fails when one goes over
+its budget, listing the statements it repeated. Budgets are the seeded count
+plus a little headroom, so a query issued once per row shows up as twenty
+extra queries, far past it. At run time RequestMetricsMiddleware logs requests
+over budget and counts them in the metrics.
+
+The worker and visit listings read each section table once, whatever the
+number of workers or visits; their budgets are large because there are some
+thirty-five section tables, not because of the rows. Imports are not budgeted:
+their queries grow with the uploaded file.
+"""
+import re
+from collections import Counter
+
+DEFAULT_QUERY_BUDGET = 10  # for URL names missing below, which the tests do not allow
+REPEATED_QUERY_THRESHOLD = 5  # identical statements (literals aside) that point at a loop
+
+# None: not budgeted
+QUERY_BUDGETS = {
+    'login': 2,
+    'forgot_password': 2,
+    'verify_otp': 1,
+    'reset_password': 2,
+    'find_member_by_aadhar': 3,
+    'member-add': 6,
+    'member-list': 3,
+    'update_member': 4,
+    'delete_member': 4,
+    'addusers': 15,
+    'userData': 39,  # one query per section table
+    'userDataStream': 41,  # one query per section table and page
+    'get_worker_by_aadhar': 3,
+    'userDataWithID': 4,
+    'adminData': 3,
+    'add_Entries': 18,
+    'addDetails': 8,
+    'upload_image': 3,
+    'fetchVisitdata': 5,
+    'fetchVisitdataWithDate': 40,  # one query per section table
+    'fetchVisitDataBundle': 40,  # one query per section table and chunk of MRD numbers
+    'update_employee_status': 5,
+    'update_employee_data': 3,
+    'addVitals': 8,
+    'deleteUploadedFile': 3,
+    'get_worker_documents/': 4,
+    'addInvestigation': 8,
+    'addRoutineSugarTest': 14,
+    'addRenalFunctionTest': 14,
+    'addLipidProfile': 14,
+    'addLiverFunctionTest': 14,
+    'addThyroidFunctionTest': 14,
+    'addAutoimmuneFunctionTest': 14,
+    'addCoagulationTest': 14,
+    'addEnzymesAndCardiacProfile': 14,
+    'addUrineRoutine': 14,
+    'addSerology': 14,
+    'addMotion': 14,
+    'addCultureSensitivityTest': 14,
+    'create_medical_history': 14,
+    'addMensPack': 14,
+    'addWomensPack': 14,
+    'addOccupationalprofile': 14,
+    'addOtherstest': 14,
+    'addOphthalmicReport': 14,
+    'addUSG': 14,
+    'addMRI': 14,
+    'addXRay': 14,
+    'addCT': 14,
+    'insert_vaccination': 8,
+    'get_vaccination': 3,
+    'fitness_test': 13,
+    'add-medical-certificate': 8,
+    'get_medical_certificate_data': 3,
+    'add_alcohol_form_data': 9,
+    'add_consultation': 8,
+    'get_alcohol_form_data': 3,
+    'get_personal_leave_data': 3,
+    'save_personal_leave_data': 8,
+    'add_significant_note': 14,
+    'get_notes_by_aadhar': 4,
+    'get_notes_all': 4,
+    'get_filtered_data': 3,
+    'cohort_query': 9,
+    'create_form17': 8,
+    'create_form38': 8,
+    'create_form39': 8,
+    'create_form40': 8,
+    'create_form27': 8,
+    'book_appointment': 13,
+    'uploadAppointment': None,  # imports scale with the file; see ImportJob progress instead
+    'get_appointments': 3,
+    'get_currentfootfalls': 3,
+    'get_pendingfootfalls': 3,
+    'update_appointment_status': 6,
+    'add_prescription': 8,
+    'view_prescriptions': 3,
+    'get_prescription_in_data': 4,
+    'update_daily_quantities': 7,
+    'add-stock': 14,
+    'current_stock': 3,
+    'stock_history': 3,
+    'current_expiry': 8,
+    'remove_expiry': 6,
+    'expiry_register': 3,
+    'expiry_date': 3,
+    'quantity_suggestions': 2,
+    'get_brand_names': 3,
+    'get_chemical_name': 3,
+    'discarded_medicines': 3,
+    'add_discarded_medicine': 10,
+    'get_ward_consumable': 5,
+    'add_ward_consumable': 10,
+    'get_ambulance_consumable': 3,
+    'add_ambulance_consumable': 9,
+    'get_first_aid_consumable': 3,
+    'add_first_aid_consumable': 9,
+    'get_glucose_consumable': 3,
+    'add_glucose_consumable': 14,
+    'get-dose-volume': 3,
+    'get-chemical-name-by-brand': 3,
+    'get-chemical-name-by-chemical': 3,
+    'get_calibrations': 5,
+    'get_calibration_history': 3,
+    'complete_calibration': 7,
+    'add_instrument': 6,
+    'deleteInstrument': 5,
+    'EditInstrument': 7,
+    'get_unique_instruments': 4,
+    'archive_stock': 5,
+    'get_pending_next_month_count': 3,
+    'save_mockdrills': 3,
+    'get_mockdrills': 3,
+    'add_camp': 3,
+    'get_camps': 3,
+    'upload_files': 3,
+    'download_file': 1,
+    'delete_file': 3,
+    'get_categories': 3,
+    'get_reviews': 3,
+    'add_review': 4,
+    'dashboard': 7,
+    'fetchVisitdataAll': 3,
+    'fetchFitnessDataAll': 3,
+    'get_current_expiry_count': 3,
+    'get_red_status_count': 3,
+    'hrupload': None,  # imports scale with the file; see ImportJob progress instead
+    'medical_upload': None,  # imports scale with the file; see ImportJob progress instead
+    'import_job_status': 3,
+    'request_metrics': 2,
+    'get_investigations-details': 26,  # one query per investigation table
+    'update_pharmacy_stock': 8,
+    'get-chemical-name-suggestions': 4,
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"IN \((?:\?(?:, )?)+\)")
+_SELECT_LIST = re.compile(r"^SELECT .+? FROM ", re.DOTALL)
+
+
+def budget_for(url_name):
+    """ The URL name's budget; None when it has none. """
+    return QUERY_BUDGETS.get(url_name, DEFAULT_QUERY_BUDGET)
+
+
+def sql_template(sql):
+    """
+    A statement with its literal values and selected columns elided, so the
+    same query with other parameters compares equal and reads short.
+    """
+    sql = _NUMBER_LITERAL.sub('?', _STRING_LITERAL.sub('?', sql))
+    return _SELECT_LIST.sub('SELECT ... FROM ', _IN_LIST.sub('IN (...)', sql))
+
+
+def repeated_queries(statements, threshold=REPEATED_QUERY_THRESHOLD):
+    """ (template, count) of the statements run at least `threshold` times, most repeated first. """
+    counts = Counter(sql_template(sql) for sql in statements)
+    return [(template, count) for template, count in counts.most_common() if count >= threshold]
@@ -0,0 +1,65 @@
+"""
+Registry of placeholder ("empty") records per model.
+
+Views that return a section for a worker who has no record in it send an
+empty record so the frontend receives { "diabetes": false } rather than
+undefined. The templates are built once from model._meta when the app is
+ready (BackendConfig.ready) and stored read-only; empty_record() hands out a
+copy, deep-copying only the JSON values since everything else is immutable.
+"""
+import copy
+from types import MappingProxyType
+
+from django.db.models import BooleanField, CharField, JSONField
+
+# JSON fields whose empty value has a shape the frontend relies on.
+JSON_FIELD_DEFAULTS = {
+    "normal_doses": {"dates": [], "dose_names": []},
+    "booster_doses": {"dates": [], "dose_names": []},
+    "surgical_history": {"comments": "", "children": []},
+    "vaccination": {"vaccination": []},
+    "job_nature": [],
+    "conditional_fit_feilds": [],
+}
+
+_templates = {}
+_mutable_keys = {}
+
+
+def build_template(model):
+    """ Placeholder for a record of `model`, built from its concrete fields. """
+    template = {}
+    for field in model._meta.get_fields():
+        if not field.concrete or field.is_relation or field.primary_key:
+            continue
+        if isinstance(field, CharField):
+            template[field.name] = ""
+        elif isinstance(field, BooleanField):
+            template[field.name] = False
+        elif isinstance(field, JSONField):
+            template[field.name] = copy.deepcopy(JSON_FIELD_DEFAULTS.get(field.name, {}))
+        else:
+            template[field.name] = None
+    return template
+
+
+def register(model):
+    template = build_template(model)
+    _templates[model] = MappingProxyType(template)
+    _mutable_keys[model] = tuple(k for k, v in template.items() if isinstance(v, (dict, list)))
+
+
+def build_registry(models):
+    for model in models:
+        register(model)
+
+
+def empty_record(model):
+    """ Fresh, mutable copy of the placeholder record for `model`. """
+    if model not in _templates:
+        register(model)
+    template = _templates[model]
+    record = dict(template)
+    for key in _mutable_keys[model]:
+        record[key] = copy.deepcopy(template[key])
+    return record
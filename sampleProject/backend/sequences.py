@@ -0,0 +1,112 @@
+"""
+Per-day number sequences: MRD and appointment numbers, and anything else
+numbered per day.
+
+Each (name, day) pair is one DailySequence row. reserve() advances it with a
+single UPDATE ... SET last_value = last_value + n, so a reservation locks one
+row for one statement instead of locking and scanning all of the day's records
+to find the highest number issued so far.
+
+Callers reserve inside the same transaction.atomic() block as the insert that
+uses the numbers. If the insert fails the reservation rolls back with it and
+the numbers are issued again, so records that fail do not leave gaps. The
+cost is that the day's row stays locked until the block ends, so keep the
+block short. Outside a transaction a reservation commits at once, and the
+numbers of a request that fails afterwards are skipped.
+"""
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Appointment, DailySequence, employee_details
+
+MRD_SEQUENCE = 'mrd'
+MRD_SEQUENCE_DIGITS = 6
+APPOINTMENT_SEQUENCE = 'appointment'
+APPOINTMENT_SEQUENCE_DIGITS = 4
+
+
+def reserve(name, day, count=1, seed=None):
+    """
+    Reserves `count` consecutive values of the (name, day) sequence and
+    returns them as a range. `seed` is called once, when the day's row is
+    created, and returns the last value already in use (0 without one).
+    """
+    if count < 1:
+        return range(0)
+    sequence = DailySequence.objects.filter(name=name, day=day)
+    with transaction.atomic():
+        if not sequence.update(last_value=F('last_value') + count):
+            initial = (seed() if seed else 0) + count
+            try:
+                with transaction.atomic():
+                    DailySequence.objects.create(name=name, day=day, last_value=initial)
+            except IntegrityError:
+                # Another caller created the day's row first
+                sequence.update(last_value=F('last_value') + count)
+        last = sequence.values_list('last_value', flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+def next_value(name, day, seed=None):
+    return reserve(name, day, 1, seed)[0]
+
+
+def _highest_issued_mrd(day):
+    """
+    Highest sequence among the MRD numbers already issued for `day`, so a
+    sequence started mid-day continues after them. Runs once per day.
+    """
+    highest = (
+        employee_details.objects.filter(mrdNo__endswith=day.strftime('%d%m%Y'))
+        .order_by('-mrdNo')
+        .values_list('mrdNo', flat=True)
+        .first()
+    )
+    try:
+        return int(highest[:MRD_SEQUENCE_DIGITS]) if highest else 0
+    except ValueError:
+        return 0
+
+
+def mrd_numbers(count, day=None):
+    """ `count` consecutive MRD numbers for `day` (default today): <6-digit sequence><DDMMYYYY>. """
+    day = day or date.today()
+    date_part = day.strftime('%d%m%Y')
+    return [
+        f"{value:0{MRD_SEQUENCE_DIGITS}d}{date_part}"
+        for value in reserve(MRD_SEQUENCE, day, count, seed=lambda: _highest_issued_mrd(day))
+    ]
+
+
+def next_mrd(day=None):
+    return mrd_numbers(1, day)[0]
+
+
+def _highest_issued_appointment(day):
+    """
+    Highest number among the day's existing appointments. Count-based
+    numbering left gaps and duplicates behind, so every number is parsed
+    rather than trusting the count. Runs once per day.
+    """
+    highest = 0
+    for appointment_no in Appointment.objects.filter(date=day).values_list('appointment_no', flat=True).iterator():
+        try:
+            highest = max(highest, int(appointment_no[:-8]))  # strip the DDMMYYYY suffix
+        except (TypeError, ValueError):
+            continue
+    return highest
+
+
+def appointment_numbers(count, day):
+    """ `count` consecutive appointment numbers for `day`: <4-digit sequence><DDMMYYYY>. """
+    date_part = day.strftime('%d%m%Y')
+    return [
+        f"{value:0{APPOINTMENT_SEQUENCE_DIGITS}d}{date_part}"
+        for value in reserve(APPOINTMENT_SEQUENCE, day, count, seed=lambda: _highest_issued_appointment(day))
+    ]
+
+
+def next_appointment_no(day):
+    return appointment_numbers(1, day)[0]
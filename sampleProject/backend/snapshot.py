@@ -0,0 +1,282 @@
+"""
+Snapshots of the backend tables: one compressed file per model plus a
+manifest.json, in place of dumpdata JSON and split_json.py.
+
+Two formats:
+
+    parquet  columnar, zstd-compressed, typed columns (pyarrow)
+    ndjson   one gzip-compressed JSON object per row, for when pyarrow is missing
+
+Tables are read in primary-key order in batches of SNAPSHOT_BATCH_SIZE rows
+through values_list(), so no model instances are built and no table is held in
+memory. Models are dumped by a process pool, each worker writing its own
+files; the models are read separately, so dump a quiet database (or a replica)
+when the tables must agree with each other.
+
+Loading inserts raw batches that keep the primary keys and stored dates (see
+transfer.insert_raw), one dependency level of models at a time, the models of
+a level in parallel. Each model loads in one transaction.
+"""
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.duration import duration_iso_string
+
+from .transfer import dependency_levels, identity_insert, init_worker, insert_raw, reset_sequences
+
+SNAPSHOT_BATCH_SIZE = 5000
+SNAPSHOT_FORMATS = {'parquet': '.parquet', 'ndjson': '.ndjson.gz'}
+MANIFEST_NAME = 'manifest.json'
+
+_INTEGER_FIELDS = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveSmallIntegerField', 'PositiveBigIntegerField',
+}
+
+
+def snapshot_fields(model):
+    return list(model._meta.concrete_fields)
+
+
+def _column_field(field):
+    """ The field whose values a column holds: a foreign key stores its target's key. """
+    while field.is_relation:
+        field = field.target_field
+    return field
+
+
+def arrow_type(field):
+    import pyarrow as pa
+
+    field = _column_field(field)
+    kind = field.get_internal_type()
+    if kind in _INTEGER_FIELDS:
+        return pa.int64()
+    if kind == 'FloatField':
+        return pa.float64()
+    if kind == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if kind == 'BooleanField':
+        return pa.bool_()
+    if kind == 'DateField':
+        return pa.date32()
+    if kind == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    if kind == 'TimeField':
+        return pa.time64('us')
+    if kind == 'DurationField':
+        return pa.duration('us')
+    if kind == 'BinaryField':
+        return pa.binary()
+    # Char, Text, Email, URL, File and UUID values, and JSON encoded as text
+    return pa.string()
+
+
+def _is_json(field):
+    return _column_field(field).get_internal_type() == 'JSONField'
+
+
+def _json_default(value):
+    if isinstance(value, timedelta):
+        return duration_iso_string(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)  # Decimal, UUID
+
+
+def snapshot_path(directory, model, fmt):
+    return os.path.join(directory, f"{model._meta.label_lower}{SNAPSHOT_FORMATS[fmt]}")
+
+
+def _batches(model, using, batch_size):
+    """ Lists of value tuples in primary-key order, streamed from the database. """
+    attnames = [field.attname for field in snapshot_fields(model)]
+    rows = model._base_manager.using(using).order_by(model._meta.pk.attname).values_list(*attnames)
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _dump_parquet(model, path, using, batch_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = snapshot_fields(model)
+    schema = pa.schema([pa.field(field.attname, arrow_type(field)) for field in fields])
+    json_columns = [i for i, field in enumerate(fields) if _is_json(field)]
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch in _batches(model, using, batch_size):
+            columns = [list(column) for column in zip(*batch)]
+            for i in json_columns:
+                columns[i] = [None if value is None else json.dumps(value) for value in columns[i]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=schema.field(i).type) for i, column in enumerate(columns)], schema=schema,
+            ))
+            rows += len(batch)
+    return rows
+
+
+def _dump_ndjson(model, path, using, batch_size):
+    attnames = [field.attname for field in snapshot_fields(model)]
+    rows = 0
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as fh:
+        for batch in _batches(model, using, batch_size):
+            fh.writelines(
+                json.dumps(dict(zip(attnames, row)), default=_json_default, ensure_ascii=False) + '\n'
+                for row in batch
+            )
+            rows += len(batch)
+    return rows
+
+
+def dump_model(model, directory, using='default', fmt='parquet', batch_size=SNAPSHOT_BATCH_SIZE):
+    """ Writes one model's rows to its snapshot file and returns its manifest entry. """
+    path = snapshot_path(directory, model, fmt)
+    tmp = f"{path}.tmp"
+    dump = _dump_parquet if fmt == 'parquet' else _dump_ndjson
+    rows = dump(model, tmp, using, batch_size)
+    os.replace(tmp, path)
+    return {
+        'file': os.path.basename(path),
+        'rows': rows,
+        'columns': [field.attname for field in snapshot_fields(model)],
+    }
+
+
+def _read_parquet(path, batch_size, fields):
+    import pyarrow.parquet as pq
+
+    json_columns = {field.attname for field in fields if _is_json(field)}
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        columns = {}
+        for name, column in zip(record_batch.schema.names, record_batch.columns):
+            values = column.to_pylist()
+            if name in json_columns:
+                values = [None if value is None else json.loads(value) for value in values]
+            columns[name] = values
+        yield [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def _read_ndjson(path, batch_size, fields):
+    # JSON keeps its decoded value; everything else was written as text or a JSON number
+    parsers = {field.attname: (None if _is_json(field) else _column_field(field).to_python) for field in fields}
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        batch = []
+        for line in fh:
+            row = json.loads(line)
+            batch.append({
+                name: value if value is None or parsers.get(name) is None else parsers[name](value)
+                for name, value in row.items()
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def load_model(model, directory, fmt, using='default', batch_size=SNAPSHOT_BATCH_SIZE):
+    """ Inserts one model's snapshot rows, keeping their keys; returns the row count. """
+    fields = snapshot_fields(model)
+    known = {field.attname for field in fields}
+    read = _read_parquet if fmt == 'parquet' else _read_ndjson
+    rows = 0
+    with transaction.atomic(using=using), identity_insert(model, using):
+        for batch in read(snapshot_path(directory, model, fmt), batch_size, fields):
+            # Columns dropped from the model since the dump are ignored; new ones take their defaults
+            insert_raw(model, [model(**{k: v for k, v in row.items() if k in known}) for row in batch], using)
+            rows += len(batch)
+    reset_sequences(model, using)
+    return rows
+
+
+def flush_models(models, using='default'):
+    """ Empties the models' tables so a snapshot can be loaded into them. """
+    connection = connections[using]
+    tables = [model._meta.db_table for model in models]
+    connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, allow_cascade=True))
+
+
+def _dump_label(label, directory, using, fmt, batch_size):
+    return label, dump_model(apps.get_model(label), directory, using, fmt, batch_size)
+
+
+def _load_label(label, directory, fmt, using, batch_size):
+    return label, load_model(apps.get_model(label), directory, fmt, using, batch_size)
+
+
+def _run_parallel(pool, tasks, report):
+    """ Runs (function, label, args) tasks in the pool; returns {label: result}, raising once all have finished. """
+    futures = {pool.submit(function, label, *args): label for function, label, args in tasks}
+    results, failures = {}, []
+    for future in as_completed(futures):
+        label = futures[future]
+        try:
+            _, results[label] = future.result()
+        except Exception as e:
+            failures.append(f"{label}: {e}")
+            report(f"❌ {label}: {e}")
+            continue
+        rows = results[label]['rows'] if isinstance(results[label], dict) else results[label]
+        report(f"✅ {label}: {rows} rows")
+    if failures:
+        raise RuntimeError(f"{len(failures)} model(s) failed: " + '; '.join(failures))
+    return results
+
+
+def dump_snapshot(models, directory, using='default', fmt='parquet', workers=4, batch_size=SNAPSHOT_BATCH_SIZE,
+                  report=print):
+    """ Dumps the models in parallel and writes the manifest; returns it. """
+    if fmt == 'parquet':
+        import pyarrow  # noqa: F401 -- fail before starting the workers
+    os.makedirs(directory, exist_ok=True)
+    connections.close_all()  # the workers open their own
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        entries = _run_parallel(
+            pool, [(_dump_label, model._meta.label, (directory, using, fmt, batch_size)) for model in models], report,
+        )
+    manifest = {
+        'format': fmt,
+        'created_at': timezone.now().isoformat(),
+        'database': using,
+        'models': {model._meta.label: entries[model._meta.label] for model in models},
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_NAME)) as fh:
+        return json.load(fh)
+
+
+def load_snapshot(models, directory, using='default', workers=4, batch_size=SNAPSHOT_BATCH_SIZE, flush=False,
+                  report=print):
+    """ Loads the models' snapshot files, parents before the models that reference them; returns {label: rows}. """
+    fmt = read_manifest(directory)['format']
+    if flush:
+        flush_models(models, using)
+    connections.close_all()
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        for level in dependency_levels(models):
+            totals.update(_run_parallel(
+                pool, [(_load_label, model._meta.label, (directory, fmt, using, batch_size)) for model in level],
+                report,
+            ))
+    return totals
@@ -1,3 +1,935 @@
-from django.test import TestCase
+import importlib
+import json
+import shutil
+import tempfile
+from collections import namedtuple
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from pymssql_backend.pool import ConnectionPool
+
+from . import benchmarks, jobs, latest, metrics, query_budgets, sequences, snapshot, transfer, views
+from .bulk import BulkUpserter
+from .bitmaps import BITMAP_ATTRIBUTES, BitmapIndex
+from .cohort import COST_EXACT, COST_RANGE, COST_SCAN, CohortPlanner
+from .profiles import PROFILE_SECTIONS, assemble_profile
+from .record_templates import empty_record
+from .models import (
+    Appointment, Consultation, Dashboard, DailyQuantity, DiscardedMedicine, ExpiryRegister, FitnessAssessment,
+    DailySequence, ImportJob, InstrumentCalibration, LatestRecord, MedicalHistory, Member, MedicalCertificate, PharmacyStock, PharmacyStockHistory, Prescription,
+    Review, ReviewCategory, SignificantNotes, VaccinationRecord, WardConsumables, employee_details, eventsandcamps,
+    heamatalogy, mockdrills, vitals,
+)
+
+SEED_SIZE = 20
+
+# One request per URL name; GET data goes in the query string, 'post' data is sent as JSON, 'form' data as a form
+Replay = namedtuple('Replay', 'url_name method args data', defaults=((), None))
+
+# URL names the replay cannot exercise; their budgets are still enforced at run time
+NOT_REPLAYED = {
+    'login': 'needs a member with a known password',
+    'forgot_password': 'sends an OTP e-mail',
+    'verify_otp': 'needs the OTP sent by forgot_password',
+    'reset_password': 'needs a verified OTP',
+    'addusers': 'creates the fixed default accounts',
+    'upload_image': 'multipart image upload',
+    'hrupload': 'Excel upload',
+    'medical_upload': 'Excel upload',
+    'uploadAppointment': 'Excel upload',
+    'upload_files': 'multipart file upload',
+    'download_file': 'streams an uploaded file',
+    'delete_file': 'deletes an uploaded file',
+    'deleteUploadedFile': 'deletes an uploaded file',
+}
+
+INVESTIGATION_URL_NAMES = (
+    'addInvestigation', 'addRoutineSugarTest', 'addRenalFunctionTest', 'addLipidProfile', 'addLiverFunctionTest',
+    'addThyroidFunctionTest', 'addAutoimmuneFunctionTest', 'addCoagulationTest', 'addEnzymesAndCardiacProfile',
+    'addUrineRoutine', 'addSerology', 'addMotion', 'addCultureSensitivityTest', 'addMensPack', 'addWomensPack',
+    'addOccupationalprofile', 'addOtherstest', 'addOphthalmicReport', 'addUSG', 'addMRI', 'addXRay', 'addCT',
+)
+FORM_URL_NAMES = ('create_form17', 'create_form38', 'create_form39', 'create_form40', 'create_form27')
+
+
+def aadhar_of(i):
+    return f"{500000000000 + i}"
+
+
+def mrd_of(i):
+    return f"{i + 1:06d}{date.today():%d%m%Y}"
+
+
+# Cycled through the seeded workers, so every filter value matches some rows and misses others
+SEED_SEXES = ('Male', 'Female')
+SEED_TYPES = ('Employee', 'Contractor', 'Visitor')
+SEED_STATUSES = ('Active', 'Transferred To', 'Resigned', 'Active')
+SEED_ROLES = ('nurse', 'doctor', 'pharmacy')
+
+
+def seed_dataset(size=SEED_SIZE):
+    """
+    `size` workers, each with one visit and its records, and `size` rows of
+    pharmacy and calibration data. Workers vary in sex, type, status, age and
+    clinical values, so filtered requests return some rows and not others.
+    """
+    today = date.today()
+    expiry = today + timedelta(days=30)
+    for i in range(size):
+        aadhar, mrd = aadhar_of(i), mrd_of(i)
+        common = {'aadhar': aadhar, 'emp_no': f"E{i:04d}", 'mrdNo': mrd}
+        worker_type = SEED_TYPES[i % len(SEED_TYPES)]
+        employee_details.objects.create(
+            name=f"Worker {i}", type=worker_type, sex=SEED_SEXES[i % len(SEED_SEXES)],
+            status=SEED_STATUSES[i % len(SEED_STATUSES)], dob=date(1970 + i, 1, 1), entry_date=today, **common,
+        )
+        Dashboard.objects.create(date=today, type=worker_type, type_of_visit=('Preventive', 'Curative')[i % 2],
+                                 register=('Annual / Periodical', 'Illness')[i % 2], **common)
+        vitals.objects.create(systolic=str(110 + i), diastolic='80', **common)
+        heamatalogy.objects.create(hemoglobin=str(11 + i % 5), **common)
+        MedicalHistory.objects.create(personal_history={'smoking': {'yesNo': ('yes', 'no')[i % 2]}}, **common)
+        Consultation.objects.create(status='completed', complaints='Headache', **common)
+        FitnessAssessment.objects.create(status='completed', overall_fitness=('fit', 'unfit')[i % 2], **common)
+        Appointment.objects.create(appointment_no=f"{i + 1:04d}{today:%d%m%Y}", date=today, name=f"Worker {i}",
+                                   status='initiate', role=worker_type, **common)
+        Prescription.objects.create(name=f"Worker {i}", submitted_by='nurse', issued_by='doctor',
+                                    tablets=[{'chemicalName': 'Paracetamol', 'brandName': 'Dolo', 'qty': 2}], **common)
+        SignificantNotes.objects.create(healthsummary='Stable', **common)
+        VaccinationRecord.objects.create(vaccination=[{'name': 'Tetanus', 'status': 'completed'}], **common)
+        MedicalCertificate.objects.create(aadhar=aadhar, empNo=f"E{i:04d}", mrdNo=mrd)
+        Member.objects.create(name=f"Member {i}", aadhar=f"{600000000000 + i}", role=SEED_ROLES[i % len(SEED_ROLES)],
+                              type='ohc')
+
+        brand = f"Brand {i}"
+        stock = {'medicine_form': 'Tablet', 'brand_name': brand, 'chemical_name': f"Chemical {i}",
+                 'dose_volume': '500 mg', 'expiry_date': expiry}
+        PharmacyStock.objects.create(total_quantity=100, quantity=100, **stock)
+        PharmacyStockHistory.objects.create(total_quantity=100, **stock)
+        DailyQuantity.objects.create(chemical_name=stock['chemical_name'], brand_name=brand, dose_volume='500 mg',
+                                     expiry_date=expiry, date=today, quantity=1)
+        ExpiryRegister.objects.create(quantity=5, total_quantity=5, removed_date=today if i % 2 else None, **stock)
+        DiscardedMedicine.objects.create(quantity=1, reason='Damaged', **stock)
+        WardConsumables.objects.create(quantity=1, **stock)
+
+        InstrumentCalibration.objects.create(
+            equipment_sl_no=f"SL{i}", instrument_number=f"INST{i}", instrument_name='BP apparatus', freq='Yearly',
+            calibration_date=today - timedelta(days=300), next_due_date=today + timedelta(days=65),
+            calibration_status='Completed', certificate_number=f"C{i}",
+        )
+        InstrumentCalibration.objects.create(
+            equipment_sl_no=f"SL{i}", instrument_number=f"INST{i}", instrument_name='BP apparatus', freq='Yearly',
+            calibration_date=today, next_due_date=today + timedelta(days=365), calibration_status='pending',
+        )
+        mockdrills.objects.create(**{
+            field.name: 'x' for field in mockdrills._meta.concrete_fields
+            if field.get_internal_type() == 'TextField' and not field.null
+        } | {'date': today.isoformat()})
+        eventsandcamps.objects.create(camp_name=f"Camp {i}", start_date=today, end_date=today,
+                                      hospital_name='OHC', camp_details='Screening')
+
+    PharmacyStock.objects.create(medicine_form='Strip', brand_name='Glucose strips', chemical_name='Glucose',
+                                 dose_volume='50', total_quantity=50, quantity=50, expiry_date=expiry)
+    category = ReviewCategory.objects.create(name='Follow up')
+    Review.objects.create(category=category, pid='P1', name='Worker 0', gender='Male',
+                          appointment_date=today, status='today')
+    ImportJob.objects.create(kind=ImportJob.Kind.HR, file='import_jobs/seed.xlsx')
+
+
+def replays():
+    today = date.today().isoformat()
+    aadhar, mrd = aadhar_of(0), mrd_of(0)
+    span = {'fromDate': today, 'toDate': today}
+    visit = {'aadhar': aadhar, 'mrdNo': mrd, 'emp_no': 'E0000'}
+    expiry = (date.today() + timedelta(days=30)).isoformat()
+    stock = {'brand_name': 'Brand 0', 'chemical_name': 'Chemical 0', 'medicine_form': 'Tablet', 'dose_volume': '500 mg'}
+    daily = [
+        {'chemical_name': f"Chemical {i}", 'brand_name': f"Brand {i}", 'dose_volume': '500 mg',
+         'expiry_date': expiry, 'year': date.today().year,
+         'month': date.today().month, 'day': date.today().day, 'quantity': 2}
+        for i in range(SEED_SIZE)
+    ]
+    return [
+        # Reads
+        Replay('find_member_by_aadhar', 'get', data={'aadhar': '600000000000'}),
+        Replay('member-list', 'get'),
+        Replay('userData', 'post', data={}),
+        Replay('userDataStream', 'post', data={'limit': SEED_SIZE}),
+        Replay('get_worker_by_aadhar', 'post', data={'aadhar': aadhar}),
+        Replay('userDataWithID', 'post', data={'aadhar': aadhar}),
+        Replay('adminData', 'post', data={}),
+        Replay('fetchVisitdata', 'post', args=(aadhar,), data={}),
+        Replay('fetchVisitdataWithDate', 'get', args=(mrd,)),
+        Replay('fetchVisitDataBundle', 'post', data={'mrdNos': [mrd_of(i) for i in range(SEED_SIZE)]}),
+        Replay('get_worker_documents/', 'post', data={'aadhar': aadhar}),
+        Replay('get_vaccination', 'get', args=(aadhar,)),
+        Replay('get_medical_certificate_data', 'get', data={'aadhar': aadhar}),
+        Replay('get_alcohol_form_data', 'get', data={'aadhar': aadhar}),
+        Replay('get_personal_leave_data', 'get', data={'aadhar': aadhar}),
+        Replay('get_notes_by_aadhar', 'get', args=(aadhar,)),
+        Replay('get_notes_all', 'get'),
+        Replay('get_filtered_data', 'post', data={}),
+        Replay('get_filtered_data', 'post', data={'sex': 'Female', 'role': 'Contractor', 'status': 'Active'}),
+        Replay('get_filtered_data', 'post', data={
+            'sex': 'Male', 'ageFrom': 20, 'personal_HTN': 'No', 'fitness_1': {'overall_fitness': 'fit'},
+            'param_1': {'param': 'systolic', 'from': '110', 'to': '125'},
+            'investigation_1': {'form': 'heamatalogy', 'param': 'hemoglobin', 'from': '11', 'to': '14'},
+        }),
+        Replay('cohort_query', 'get'),
+        Replay('get_appointments', 'get', data=span),
+        Replay('get_currentfootfalls', 'post', data=span),
+        Replay('get_pendingfootfalls', 'post', data=span),
+        Replay('view_prescriptions', 'get'),
+        Replay('get_prescription_in_data', 'get', data={'year': date.today().year, 'month': date.today().month}),
+        Replay('current_stock', 'get'),
+        Replay('stock_history', 'get'),
+        Replay('expiry_register', 'get'),
+        Replay('expiry_date', 'get', data=stock),
+        Replay('quantity_suggestions', 'get', data=stock),
+        Replay('get_brand_names', 'get', data={'chemical_name': 'Chemical 0', 'medicine_form': 'Tablet'}),
+        Replay('get_chemical_name', 'get', data={'brand_name': 'Brand 0'}),
+        Replay('discarded_medicines', 'get'),
+        Replay('get_ward_consumable', 'get'),
+        Replay('get_ambulance_consumable', 'get'),
+        Replay('get_first_aid_consumable', 'get'),
+        Replay('get_glucose_consumable', 'get'),
+        Replay('get-dose-volume', 'get', data=stock),
+        Replay('get-chemical-name-by-brand', 'get', data=stock),
+        Replay('get-chemical-name-by-chemical', 'get', data=stock),
+        Replay('get-chemical-name-suggestions', 'get', data={'chemical_Name': 'Chem', 'medicine_form': 'Tablet'}),
+        Replay('get_calibrations', 'get'),
+        Replay('get_calibration_history', 'get'),
+        Replay('get_unique_instruments', 'get'),
+        Replay('get_pending_next_month_count', 'get'),
+        Replay('get_mockdrills', 'get'),  # both mock drill routes share the name
+        Replay('get_camps', 'get'),
+        Replay('get_categories', 'get'),
+        Replay('get_reviews', 'get', args=('today',)),
+        Replay('dashboard', 'get', data=span),
+        Replay('fetchVisitdataAll', 'post', data={}),
+        Replay('fetchFitnessDataAll', 'post', data={}),
+        Replay('get_current_expiry_count', 'get'),
+        Replay('get_red_status_count', 'get'),
+        Replay('import_job_status', 'get', args=(1,)),
+        Replay('request_metrics', 'get'),
+        Replay('get_investigations-details', 'post', args=(aadhar,), data={}),
+        # Writes
+        Replay('member-add', 'post', data={'name': 'New member', 'aadhar': '600000000099', 'role': 'nurse',
+                                           'memberTypeDetermined': 'ohc', 'designation': 'Nurse', 'emp_no': 'M99',
+                                           'doj': today, 'mail_id_Office': 'm99@example.com',
+                                           'phone_Office': '0400000099'}),
+        Replay('update_member', 'post', args=(1,), data={'name': 'Member 0', 'designation': 'Senior nurse'}),
+        Replay('add_Entries', 'post', data={
+            'formData': {'aadhar': aadhar_of(1), 'name': 'Worker 1', 'type': 'Employee', 'emp_no': 'E0001'},
+            'formDataDashboard': {'type': 'Employee', 'type_of_visit': 'Curative', 'register': 'Illness'},
+            'extraData': {},
+        }),
+        Replay('addDetails', 'post', data={**visit, 'name': 'Worker 0', 'department': 'Stores'}),
+        Replay('update_employee_status', 'post', data={'identifier': aadhar, 'status': 'Active', 'date_since': today}),
+        Replay('update_employee_data', 'post', data={'aadhar': aadhar, 'emp_no': 'E0000', 'field': 'department',
+                                                     'value': 'Stores'}),
+        Replay('addVitals', 'form', data={**visit, 'systolic': '118', 'diastolic': '78'}),
+        *(Replay(url_name, 'post', data={**visit, 'accessLevel': 'nurse'}) for url_name in INVESTIGATION_URL_NAMES),
+        Replay('create_medical_history', 'post', data=visit),
+        Replay('fitness_test', 'post', data={**visit, 'overall_fitness': 'fit'}),
+        Replay('add-medical-certificate', 'post', data={**visit, 'date': today, 'leaveFrom': today, 'leaveUpTo': today}),
+        Replay('add_alcohol_form_data', 'post', data={**visit, 'date': today}),
+        Replay('add_consultation', 'post', data={**visit, 'complaints': 'Fever', 'diagnosis': 'Viral fever'}),
+        Replay('save_personal_leave_data', 'post', data={**visit, 'date': today, 'daysLeave': '1'}),
+        *(Replay(url_name, 'post', data={**visit, 'date': today}) for url_name in FORM_URL_NAMES),
+        Replay('add_prescription', 'post', data={**visit, 'name': 'Worker 0', 'issued_by': 'doctor',
+                                                 'submitted_by': 'nurse', 'tablets': []}),
+        Replay('add-stock', 'post', data={**stock, 'quantity': 10, 'batch_number': 'B1',
+                                          'expiry_date': expiry[:7], 'total_amount': 100}),
+        Replay('add_discarded_medicine', 'post', data={**stock, 'expiry_date': expiry, 'quantity': 1,
+                                                       'reason': 'Damaged'}),
+        *(Replay(url_name, 'post', data={**stock, 'expiry_date': expiry, 'quantity': 1, 'consumed_date': today})
+          for url_name in ('add_ward_consumable', 'add_ambulance_consumable', 'add_first_aid_consumable')),
+        Replay('add_glucose_consumable', 'post', data={'aadhar': aadhar, 'quantity': 1}),
+        Replay('update_pharmacy_stock', 'post', data={
+            'action': 'decrease', 'brandName': 'Brand 1', 'chemicalName': 'Chemical 1', 'doseVolume': '500 mg',
+            'expiryDate': expiry, 'quantity': 1,
+        }),
+        Replay('complete_calibration', 'post', data={'id': 2, 'calibration_date': today, 'certificate_number': 'C9',
+                                                     'done_by': 'Vendor', 'freq': 'Yearly', 'next_due_date': expiry}),
+        Replay('add_instrument', 'post', data={'instrument_number': 'INST99', 'equipment_sl_no': 'SL99',
+                                               'instrument_name': 'Glucometer', 'make': 'Acme', 'freq': 'Yearly',
+                                               'calibration_date': today, 'calibration_status': 'pending'}),
+        Replay('EditInstrument', 'post', data={'id': 4, 'make': 'Acme'}),
+        Replay('save_mockdrills', 'post', data={'date': today, 'time': '10:00', 'department': 'Stores'}),
+        Replay('add_camp', 'post', data={'camp_name': 'Eye camp', 'camp_type': 'Upcoming', 'start_date': today,
+                                         'end_date': today, 'hospital_name': 'OHC', 'camp_details': 'Eye checks'}),
+        Replay('add_review', 'post', data={'category': 'Follow up', 'pid': 'P2', 'name': 'Worker 1',
+                                           'gender': 'Male', 'appointment_date': today, 'status': 'today'}),
+        Replay('update_daily_quantities', 'post', data=daily),
+        Replay('update_appointment_status', 'post', data={'id': mrd, 'field': 'consultation',
+                                                          'status': 'inprogress'}),
+        Replay('book_appointment', 'post', data={
+            'aadharNo': aadhar_of(1), 'appointmentDate': today, 'role': 'Employee', 'name': 'Worker 1',
+        }),
+        Replay('add_significant_note', 'post', data={'aadhar': aadhar, 'healthsummary': 'Improving'}),
+        Replay('insert_vaccination', 'post', data={'aadhar': aadhar, 'vaccination': []}),
+        Replay('current_expiry', 'post', data={}),
+        Replay('archive_stock', 'post', data={}),
+        Replay('remove_expiry', 'post', data={'id': 1}),
+        Replay('deleteInstrument', 'post', data={'instrument_number': 'INST9'}),
+        Replay('delete_member', 'post', args=(2,)),
+    ]
+
+
+def url_names():
+    return {name for name in get_resolver().reverse_dict if isinstance(name, str)}
+
+
+class QueryBudgetTests(TestCase):
+    """ Replays the seeded dataset through the endpoints and holds each to its query budget. """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset()
+
+    def test_every_url_name_has_a_budget(self):
+        missing = url_names() - set(query_budgets.QUERY_BUDGETS)
+        self.assertFalse(missing, f"No query budget declared for: {', '.join(sorted(missing))}")
+
+    def test_every_url_name_is_replayed(self):
+        replayed = {replay.url_name for replay in replays()}
+        missing = url_names() - replayed - set(NOT_REPLAYED)
+        self.assertFalse(missing, f"Add a replay (or a NOT_REPLAYED reason) for: {', '.join(sorted(missing))}")
+
+    def test_endpoints_stay_within_budget(self):
+        for replay in replays():
+            with self.subTest(url_name=replay.url_name):
+                url = reverse(replay.url_name, args=replay.args)
+                with CaptureQueriesContext(connection) as ctx:
+                    if replay.method == 'get':
+                        response = self.client.get(url, replay.data or {})
+                    elif replay.method == 'form':
+                        response = self.client.post(url, replay.data)
+                    else:
+                        response = self.client.post(url, json.dumps(replay.data), content_type='application/json')
+                    # A streamed body runs its queries while it is read
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                self.assertLess(response.status_code, 500, f"{replay.url_name} failed: {body[:300]}")
+                budget = query_budgets.budget_for(replay.url_name)
+                if budget is not None and len(ctx.captured_queries) > budget:
+                    repeated = query_budgets.repeated_queries(query['sql'] for query in ctx.captured_queries)
+                    self.fail(
+                        f"{replay.url_name} ran {len(ctx.captured_queries)} queries, budget {budget}"
+                        + ''.join(f"\n  {count}x {template[:200]}" for template, count in repeated)
+                    )
+
+    def test_repeated_queries_ignore_literals(self):
+        statements = [f"SELECT * FROM t WHERE id = {i} AND name = 'w{i}'" for i in range(6)]
+        statements.append("SELECT * FROM t WHERE id IN (1, 2, 3)")
+        self.assertEqual(
+            query_budgets.repeated_queries(statements),
+            [("SELECT ... FROM t WHERE id = ? AND name = ?", 6)],
+        )
+
+
+class BitmapIndexTests(TestCase):
+    """ The cohort index must follow every kind of write to the rows it reads. """
+
+    def setUp(self):
+        self.index = BitmapIndex(BITMAP_ATTRIBUTES)
+        for i in range(3):
+            employee_details.objects.create(aadhar=aadhar_of(i), name=f"Worker {i}", sex='Male', type='Employee')
+
+    def males(self):
+        return sorted(self.index.match({'attr': 'sex', 'value': 'male'}))
+
+    def test_in_place_save_of_current_row(self):
+        self.assertEqual(self.males(), [aadhar_of(0), aadhar_of(1), aadhar_of(2)])
+        worker = employee_details.objects.get(aadhar=aadhar_of(0))
+        worker.sex = 'Female'
+        worker.save()
+        self.assertEqual(self.males(), [aadhar_of(1), aadhar_of(2)])
+
+    def test_queryset_update_through_view(self):
+        self.males()
+        response = self.client.post(reverse('update_employee_data'), json.dumps({
+            'aadhar': aadhar_of(1), 'emp_no': 'E1', 'field': 'sex', 'value': 'Female',
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.males(), [aadhar_of(0), aadhar_of(2)])
+
+    def test_bulk_update_with_touch(self):
+        self.males()
+        workers = list(employee_details.objects.filter(aadhar=aadhar_of(2)))
+        workers[0].sex = 'Female'
+        employee_details.objects.bulk_update(workers, ['sex'])
+        latest.touch(employee_details, [aadhar_of(2)])
+        self.assertEqual(self.males(), [aadhar_of(0), aadhar_of(1)])
+
+    def test_delete_and_insert_between_refreshes(self):
+        self.males()
+        # Replace worker 0 by worker 3 behind the watermark's back: the pointer count stays the same
+        employee_details.objects.filter(aadhar=aadhar_of(0)).delete()
+        employee_details.objects.create(aadhar=aadhar_of(3), name='Worker 3', sex='Male', type='Employee')
+        LatestRecord.objects.filter(aadhar=aadhar_of(3)).update(updated_at=date(2000, 1, 1))
+        self.assertEqual(self.males(), [aadhar_of(1), aadhar_of(2), aadhar_of(3)])
+
+    def test_filtered_data_sees_in_place_update(self):
+        self.males()
+        employee_details.objects.filter(aadhar=aadhar_of(0)).update(sex='Female')  # no touch: the view must not care
+        response = self.client.post(reverse('get_filtered_data'), json.dumps({'sex': 'Female'}),
+                                    content_type='application/json')
+        self.assertEqual([row['aadhar'] for row in response.json()['data']], [aadhar_of(0)])
+
+
+class ProfileTests(TestCase):
+    def test_profile_matches_section_reads_in_two_queries(self):
+        aadhar = aadhar_of(0)
+        employee_details.objects.create(aadhar=aadhar, name='Worker 0', sex='Male', dob=date(1990, 5, 1))
+        vitals.objects.create(aadhar=aadhar, systolic='120', height='172.5')
+        heamatalogy.objects.create(aadhar=aadhar, hemoglobin='13', checked=True)
+        heamatalogy.objects.create(aadhar=aadhar, hemoglobin='14', entry_date=date(2020, 1, 1))  # newest by id
+        MedicalHistory.objects.create(aadhar=aadhar, personal_history={'smoking': {'yesNo': 'Yes'}},
+                                      children_data=[{'sex': 'F'}])
+        FitnessAssessment.objects.create(aadhar=aadhar, overall_fitness='fit')
+
+        with CaptureQueriesContext(connection) as ctx:
+            profile = assemble_profile(aadhar)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        self.assertEqual(profile['heamatalogy']['hemoglobin'], '14')
+        for key, model in PROFILE_SECTIONS:
+            with self.subTest(section=key):
+                record = model.objects.filter(aadhar=aadhar).order_by('-id').values().first() or empty_record(model)
+                expected = {k: v.isoformat() if isinstance(v, date) else v for k, v in record.items()}
+                self.assertEqual(profile[key], expected)
+
+    def test_unknown_worker(self):
+        self.assertIsNone(assemble_profile(aadhar_of(1)))
+
+
+class BulkUpserterTests(TestCase):
+    lookup = {'aadhar': aadhar_of(0), 'mrdNo': 'MRD1', 'entry_date': date.today()}  # auto_now on heamatalogy
+
+    def test_creates_then_updates_like_update_or_create(self):
+        upserter = BulkUpserter(heamatalogy)
+        upserter.add(self.lookup, {'hemoglobin': '12'})
+        upserter.add(self.lookup, {'hemoglobin': '13'})  # later values win
+        self.assertEqual(upserter.flush(), (1, 0))
+        upserter.add(self.lookup, {'hemoglobin': '14'})
+        self.assertEqual(upserter.flush(), (0, 1))
+        row = heamatalogy.objects.get()
+        self.assertEqual((row.hemoglobin, row.hemoglobin_num), ('14', 14.0))
+        self.assertEqual(LatestRecord.objects.get(aadhar=aadhar_of(0), model_label='backend.heamatalogy').record_id, row.id)
+
+    def test_lookups_differing_in_case_and_trailing_spaces_merge(self):
+        upserter = BulkUpserter(heamatalogy)
+        upserter.add(self.lookup, {'hemoglobin': '12'})
+        upserter.add({**self.lookup, 'mrdNo': 'mrd1  '}, {'hemoglobin': '13'})
+        self.assertEqual(upserter.flush(), (1, 0))
+        self.assertEqual(heamatalogy.objects.get().hemoglobin, '13')
+
+    def test_row_returned_by_a_case_insensitive_collation_is_updated(self):
+        existing = heamatalogy.objects.create(hemoglobin='12', **{**self.lookup, 'mrdNo': 'MRD1 '})
+        upserter = BulkUpserter(heamatalogy)
+        # What MySQL returns for mrdNo = 'mrd1'; SQLite compares bytes and would return nothing
+        upserter._rows_matching = lambda lookups: heamatalogy.objects.order_by('id')
+        upserter.add({**self.lookup, 'mrdNo': 'mrd1'}, {'hemoglobin': '15'})
+        self.assertEqual(upserter.flush(), (0, 1))
+        self.assertEqual(list(heamatalogy.objects.values_list('id', 'hemoglobin')), [(existing.id, '15')])
+
+
+class MedicalImportTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            employee_details.objects.create(aadhar=aadhar_of(i), name=f"Worker {i}", mrdNo=mrd_of(i),
+                                            year='2025', batch='B1', hospitalName='OHC')
+
+    def rows(self):
+        keys = views.BASIC_DETAILS_MAP
+        return [
+            (i + 4, {keys['aadhar']: aadhar_of(i), keys['year']: '2025', keys['batch']: 'B1',
+                     keys['hospitalName']: 'OHC', views.HAEMATOLOGY_MAP['hemoglobin']: '13'})
+            for i in range(3)
+        ]
+
+    def test_rows_are_written(self):
+        self.assertEqual(views.import_medical_rows(self.rows()), (3, 0, []))
+        self.assertEqual(heamatalogy.objects.count(), 3)
+
+    def test_failed_flush_counts_the_batch_as_failed(self):
+        with mock.patch.object(BulkUpserter, 'flush', side_effect=RuntimeError('deadlock')):
+            success_count, error_count, errors = views.import_medical_rows(self.rows())
+        self.assertEqual((success_count, error_count), (0, 3))
+        self.assertIn('deadlock', errors[0])
+        self.assertFalse(heamatalogy.objects.exists())
+
+
+class CampEmployeeTests(TestCase):
+    def setUp(self):
+        self.first = employee_details.objects.create(aadhar=aadhar_of(0), name='Worker 0', mrdNo='MRD0')
+        self.camp = employee_details.objects.create(aadhar=aadhar_of(0), name='Worker 0', mrdNo='MRD1',
+                                                    year='2025', batch='B1', hospitalName='City Hospital')
+
+    def test_camp_record_matches_ignoring_case_and_spaces(self):
+        resolved = views.resolve_camp_employees([(aadhar_of(0), '2025', 'b1', 'CITY HOSPITAL ')])
+        self.assertEqual([employee.id for employee in resolved], [self.camp.id])
+        self.assertEqual(employee_details.objects.count(), 2)
+
+    def test_new_camp_clones_the_first_record_once(self):
+        key = (aadhar_of(0), '2026', 'B2', 'City Hospital')
+        resolved = views.resolve_camp_employees([key, (aadhar_of(0), '2026', 'b2', 'city hospital'),
+                                                 (aadhar_of(9), '2026', 'B2', 'City Hospital')])
+        clone = resolved[0]
+        self.assertIs(resolved[1], clone)
+        self.assertIsNone(resolved[2])  # unknown Aadhar
+        self.assertEqual((clone.name, clone.year, clone.batch, clone.hospitalName),
+                         ('Worker 0', '2026', 'B2', 'City Hospital'))
+        self.assertNotIn(clone.mrdNo, ('MRD0', 'MRD1'))
+        self.assertTrue(Dashboard.objects.filter(mrdNo=clone.mrdNo, aadhar=aadhar_of(0)).exists())
+        self.assertTrue(FitnessAssessment.objects.filter(mrdNo=clone.mrdNo).exists())
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def enqueue_hr(self, workers=3):
+        return jobs.enqueue(ImportJob.Kind.HR, ContentFile(benchmarks.hr_workbook(workers), name='hr.xlsx'),
+                            {'data_type': 'employee'})
+
+    def test_job_runs_and_deletes_its_upload(self):
+        queued = self.enqueue_hr()
+        job = jobs.run(jobs.claim_next('worker-1'))
+        self.assertEqual(job.status, ImportJob.StatusChoices.SUCCEEDED)
+        self.assertEqual((job.rows_done, job.result['created']), (3, 3))
+        self.assertEqual(ImportJob.objects.get().file.name, queued.file.name)
+        self.assertFalse(job.file.storage.exists(queued.file.name))
+        self.assertIsNone(jobs.claim_next('worker-1'))
+
+    def test_each_job_is_claimed_once(self):
+        first, second = self.enqueue_hr(), self.enqueue_hr()
+        self.assertEqual(jobs.claim_next('worker-1').pk, first.pk)
+        self.assertEqual(jobs.claim_next('worker-2').pk, second.pk)
+        self.assertIsNone(jobs.claim_next('worker-3'))
+
+    def test_stale_job_is_queued_again_and_its_old_worker_stops(self):
+        self.enqueue_hr()
+        lost = jobs.claim_next('worker-1')
+        ImportJob.objects.update(heartbeat_at=lost.heartbeat_at - timedelta(seconds=jobs.LEASE_SECONDS + 1))
+        retry = jobs.claim_next('worker-2')
+        self.assertEqual((retry.pk, retry.worker, retry.attempts), (lost.pk, 'worker-2', 2))
+
+        with self.assertRaises(jobs.JobLost):
+            jobs.JobProgress(lost).advance()
+        jobs.run(lost)  # stops at its first progress write, leaving the job to worker-2
+        self.assertEqual(ImportJob.objects.get().status, ImportJob.StatusChoices.RUNNING)
+        self.assertEqual(jobs.run(retry).status, ImportJob.StatusChoices.SUCCEEDED)
+
+    def test_stale_appointment_job_fails_instead_of_booking_twice(self):
+        job = jobs.enqueue(ImportJob.Kind.APPOINTMENT, ContentFile(b'{"appointments": []}', name='a.json'))
+        jobs.claim_next('worker-1')
+        ImportJob.objects.update(heartbeat_at=job.created_at - timedelta(days=1))
+        self.assertEqual(jobs.release_stale(), [job])
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.StatusChoices.FAILED)
+        self.assertIn('worker-1', job.result['error'])
+        self.assertFalse(job.file.storage.exists(job.file.name))
+
+
+class MrdLengthCheckTests(TestCase):
+    """ Migration 0009 must refuse to narrow mrdNo over values that would not fit. """
+
+    check = staticmethod(importlib.import_module('backend.migrations.0009_visit_lookup_indexes').check_mrd_lengths)
+
+    def test_values_that_fit_pass(self):
+        heamatalogy.objects.create(aadhar=aadhar_of(0), mrdNo='M' * 255)
+        self.check(apps, None)
+
+    def test_longer_values_are_reported(self):
+        record = heamatalogy.objects.create(aadhar=aadhar_of(0), mrdNo='M' * 256)
+        with self.assertRaisesMessage(RuntimeError, f"backend_heamatalogy (ids {record.pk})"):
+            self.check(apps, None)
+
+
+class SequenceTests(TestCase):
+    """ Per-day numbers are consecutive, continue after numbers already issued and are given back on rollback. """
+
+    day = date(2026, 3, 9)
+
+    def test_reservations_are_consecutive_per_day(self):
+        self.assertEqual(list(sequences.reserve('test', self.day, 3)), [1, 2, 3])
+        self.assertEqual(sequences.next_value('test', self.day), 4)
+        self.assertEqual(sequences.next_value('test', self.day + timedelta(days=1)), 1)
+        self.assertEqual(sequences.mrd_numbers(2, self.day), ['00000109032026', '00000209032026'])
+
+    def test_first_reservation_continues_after_issued_mrds(self):
+        employee_details.objects.create(aadhar=aadhar_of(0), mrdNo='00004109032026')
+        self.assertEqual(sequences.next_mrd(self.day), '00004209032026')
+
+    def test_racing_creator_of_the_days_row(self):
+        def seed():
+            # Another caller creates the day's row between our UPDATE and INSERT
+            DailySequence.objects.create(name='test', day=self.day, last_value=5)
+            return 0
+        self.assertEqual(list(sequences.reserve('test', self.day, 2, seed=seed)), [6, 7])
+
+    def test_rolled_back_reservation_is_issued_again(self):
+        sequences.next_value('test', self.day)
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.assertEqual(sequences.next_value('test', self.day), 2)
+            raise ValueError
+        self.assertEqual(sequences.next_value('test', self.day), 2)
+
+    def test_failed_entry_gives_its_mrd_back(self):
+        payload = {'formData': {'aadhar': aadhar_of(0)}, 'formDataDashboard': {}, 'extraData': {}}
+        post = lambda: self.client.post(reverse('add_Entries'), json.dumps(payload), content_type='application/json')
+        with mock.patch.object(Dashboard.objects, 'create', side_effect=RuntimeError('disk full')):
+            self.assertEqual(post().status_code, 500)
+        self.assertFalse(employee_details.objects.exists())
+        self.assertEqual(post().json()['mrdNo'], f"000001{date.today():%d%m%Y}")
+
+
+class FakeConnection:
+    """ Stands in for a pymssql connection; `alive` False makes every query fail like a dropped socket. """
+
+    def __init__(self):
+        self.alive, self.closed, self.rollbacks = True, False, 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def execute(self, sql):
+                if not connection.alive:
+                    raise OSError("connection reset by peer")
+
+            def fetchone(self):
+                return (1,)
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """ pymssql_backend's pool, driven through fake connections since pymssql is not installed here. """
+
+    def pool(self, **options):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        config = {'min_size': 0, 'max_size': 2, 'max_idle': 300, 'max_lifetime': 3600, 'timeout': 0, 'check_after': 0}
+        return ConnectionPool(connect, **{**config, **options})
+
+    def test_returned_connection_is_rolled_back_and_reused(self):
+        pool = self.pool()
+        raw = pool.acquire()
+        pool.release(raw)
+        self.assertEqual((raw.rollbacks, pool.stats()['idle']), (1, 1))
+        self.assertIs(pool.acquire(), raw)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_dropped_connection_is_not_handed_out(self):
+        pool = self.pool()
+        raw = pool.acquire()
+        pool.release(raw)
+        raw.alive = False  # the server went away while it sat idle
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, raw)
+        self.assertTrue(raw.closed)
+        self.assertEqual(pool.stats(), {'idle': 0, 'in_use': 1, 'max_size': 2})
+
+    def test_suspect_connection_is_pinged_even_when_fresh(self):
+        pool = self.pool(check_after=3600)
+        raw = pool.acquire()
+        pool.release(raw, suspect=True)
+        raw.alive = False
+        self.assertIsNot(pool.acquire(), raw)
+        self.assertTrue(raw.closed)
+
+    def test_discarded_connection_frees_its_slot(self):
+        pool = self.pool(max_size=1)
+        raw = pool.acquire()
+        with self.assertRaisesMessage(OperationalError, 'pool exhausted'):
+            pool.acquire()
+        pool.discard(raw)
+        self.assertTrue(raw.closed)
+        self.assertIsNot(pool.acquire(), raw)
+
+    def test_expired_connection_is_closed_on_return(self):
+        pool = self.pool(max_lifetime=-1)
+        raw = pool.acquire()
+        pool.release(raw)
+        self.assertTrue(raw.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+
+def records(model, using='default'):
+    return list(model._base_manager.using(using).order_by('pk').values())
+
+
+class SnapshotTests(TestCase):
+    """ A dumped table loads back with its keys and stored dates, in both formats. """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for i in range(5):
+            heamatalogy.objects.create(aadhar=aadhar_of(i), hemoglobin=f"1{i}", checked=i % 2 == 0)
+        heamatalogy.objects.filter(aadhar=aadhar_of(0)).delete()  # a gap in the keys
+        heamatalogy.objects.update(entry_date=date(2021, 6, 1))  # auto_now would overwrite this on save()
+        MedicalHistory.objects.create(aadhar=aadhar_of(0), personal_history={'smoking': {'yesNo': 'yes'}})
+
+    def round_trip(self, fmt):
+        for model in (heamatalogy, MedicalHistory):
+            expected = records(model)
+            self.assertEqual(snapshot.dump_model(model, self.directory, fmt=fmt, batch_size=2)['rows'], len(expected))
+            model.objects.all().delete()
+            self.assertEqual(snapshot.load_model(model, self.directory, fmt, batch_size=2), len(expected))
+            self.assertEqual(records(model), expected)
+
+    def test_ndjson_round_trip(self):
+        self.round_trip('ndjson')
+
+    def test_parquet_round_trip(self):
+        self.round_trip('parquet')
+
+
+TRANSFER_TARGET = 'transfer_target'
+
+
+class TransferTests(TestCase):
+    """ A copy into a second SQLite database resumes where an interrupted run stopped. """
+
+    # The target alias is added in setUpClass, after the runner has checked the declared aliases
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings[TRANSFER_TARGET] = {**connections.settings['default'], 'NAME': ':memory:'}
+        call_command('migrate', 'backend', database=TRANSFER_TARGET, verbosity=0, skip_checks=True)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[TRANSFER_TARGET].close()
+        del connections[TRANSFER_TARGET]
+        del connections.settings[TRANSFER_TARGET]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for i in range(7):
+            heamatalogy.objects.create(aadhar=aadhar_of(i), hemoglobin=f"1{i}")
+        heamatalogy.objects.update(entry_date=date(2021, 6, 1))
+
+    def transfer(self, progress=None):
+        return transfer.transfer_model(heamatalogy, 'default', TRANSFER_TARGET, self.directory, page_size=3,
+                                       progress=progress)
+
+    def interrupt_after_first_page(self):
+        def progress(model, rows):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.transfer(progress)
+        self.assertEqual(len(records(heamatalogy, TRANSFER_TARGET)), 3)
+
+    def test_resumes_from_checkpoint(self):
+        self.interrupt_after_first_page()
+        checkpoint = self.transfer()
+        self.assertEqual((checkpoint.rows, checkpoint.done), (7, True))
+        self.assertEqual(records(heamatalogy, TRANSFER_TARGET), records(heamatalogy))
+        self.assertTrue(transfer.verify_model(heamatalogy, 'default', TRANSFER_TARGET)['match'])
+
+    def test_resumes_after_the_target_when_the_checkpoint_was_lost(self):
+        self.interrupt_after_first_page()
+        transfer.Checkpoint(self.directory, heamatalogy).reset()
+        self.transfer()
+        self.assertEqual(records(heamatalogy, TRANSFER_TARGET), records(heamatalogy))
+
+
+class RequestMetricsTests(TestCase):
+    """ A streamed response is recorded once its body has been read, with the queries run while reading it. """
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        for i in range(3):
+            employee_details.objects.create(aadhar=aadhar_of(i), name=f"Worker {i}")
+
+    def recorded(self):
+        return {row['view']: row for row in metrics.registry.snapshot()['views']}
+
+    def test_stream_is_recorded_when_read(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('userDataStream'), {'models': 'vitals'})
+            self.assertNotIn('userDataStream', self.recorded())
+            body = b''.join(response.streaming_content)
+        stats = self.recorded()['userDataStream']
+        self.assertEqual((stats['requests'], stats['streamed']), (1, 1))
+        self.assertEqual(stats['max_queries'], len(ctx.captured_queries))
+        self.assertEqual(stats['avg_response_bytes'], len(body))
+
+    def test_stream_closed_early_is_recorded_once(self):
+        response = self.client.get(reverse('userDataStream'), {'models': 'vitals', 'limit': 1})
+        next(iter(response.streaming_content))
+        response.close()
+        response.close()
+        self.assertEqual(self.recorded()['userDataStream']['requests'], 1)
+
+    def test_plain_response_is_recorded_at_once(self):
+        response = self.client.get(reverse('request_metrics'))
+        self.assertEqual(self.recorded()['request_metrics']['avg_response_bytes'], len(response.content))
+
+
+class VisitPagingTests(TestCase):
+    """ Same-day visits page in a stable order, so no visit is skipped or repeated. """
+
+    def test_same_day_visits_page_by_id(self):
+        aadhar = aadhar_of(0)
+        for i in range(3):
+            Consultation.objects.create(aadhar=aadhar, mrdNo=mrd_of(i), status='completed')
+            FitnessAssessment.objects.create(aadhar=aadhar, mrdNo=mrd_of(10 + i), status='completed')
+        pages = [
+            self.client.post(reverse('fetchVisitdata', args=(aadhar,)), json.dumps({'limit': 2, 'offset': offset}),
+                             content_type='application/json').json()['data']
+            for offset in (0, 2, 4)
+        ]
+        seen = [visit['mrdNo'] for page in pages for visit in page]
+        self.assertEqual(sorted(seen), sorted([mrd_of(i) for i in range(3)] + [mrd_of(10 + i) for i in range(3)]))
+        ids = [visit['id'] for page in pages for visit in page]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+
+class LatestRecordTests(TestCase):
+    """ Pointers follow single-row writes through the signals and bulk writes through refresh(). """
+
+    def pointer(self, model, aadhar):
+        return LatestRecord.objects.filter(model_label=model._meta.label_lower, aadhar=aadhar).values_list('record_id', flat=True).first()
+
+    def test_save_moves_pointer_to_newest_row(self):
+        first = vitals.objects.create(aadhar=aadhar_of(0), systolic='120', diastolic='80')
+        self.assertEqual(self.pointer(vitals, aadhar_of(0)), first.id)
+        second = vitals.objects.create(aadhar=aadhar_of(0), systolic='130', diastolic='85')
+        self.assertEqual(self.pointer(vitals, aadhar_of(0)), second.id)
+        first.systolic = '125'
+        first.save()  # an older row never takes the pointer back
+        self.assertEqual(self.pointer(vitals, aadhar_of(0)), second.id)
+
+    def test_save_of_current_row_restamps_pointer(self):
+        row = vitals.objects.create(aadhar=aadhar_of(0), systolic='120', diastolic='80')
+        LatestRecord.objects.filter(aadhar=aadhar_of(0)).update(updated_at=date(2000, 1, 1))
+        row.save()
+        stamp = LatestRecord.objects.get(aadhar=aadhar_of(0), model_label='backend.vitals').updated_at
+        self.assertGreater(stamp.date(), date(2000, 1, 1))
+
+    def test_delete_falls_back_to_previous_row(self):
+        first = vitals.objects.create(aadhar=aadhar_of(0), systolic='120', diastolic='80')
+        second = vitals.objects.create(aadhar=aadhar_of(0), systolic='130', diastolic='85')
+        second.delete()
+        self.assertEqual(self.pointer(vitals, aadhar_of(0)), first.id)
+        first.delete()
+        self.assertIsNone(self.pointer(vitals, aadhar_of(0)))
+
+    def test_refresh_after_bulk_create(self):
+        vitals.objects.bulk_create([
+            vitals(aadhar=aadhar_of(i % 2), systolic=str(110 + i), diastolic='80') for i in range(4)
+        ])
+        self.assertFalse(LatestRecord.objects.exists())  # bulk_create sends no signals
+        latest.refresh(vitals, [aadhar_of(0), aadhar_of(1), None])
+        for i in range(2):
+            newest = vitals.objects.filter(aadhar=aadhar_of(i)).order_by('-id').first()
+            self.assertEqual(self.pointer(vitals, aadhar_of(i)), newest.id)
+
+    def test_rebuild_matches_source_table(self):
+        for i in range(3):
+            vitals.objects.create(aadhar=aadhar_of(i), systolic='120', diastolic='80')
+            vitals.objects.create(aadhar=aadhar_of(i), systolic='125', diastolic='80')
+        vitals.objects.create(aadhar=None, systolic='120', diastolic='80')
+        LatestRecord.objects.filter(aadhar=aadhar_of(0)).update(record_id=0)
+        self.assertEqual(latest.rebuild(vitals), 3)
+        for i in range(3):
+            newest = vitals.objects.filter(aadhar=aadhar_of(i)).order_by('-id').first()
+            self.assertEqual(self.pointer(vitals, aadhar_of(i)), newest.id)
+
+    def test_latest_ids_for_selects_newest_rows_of_given_workers(self):
+        for i in range(3):
+            vitals.objects.create(aadhar=aadhar_of(i), systolic='120', diastolic='80')
+            vitals.objects.create(aadhar=aadhar_of(i), systolic='125', diastolic='80')
+        rows = vitals.objects.filter(id__in=latest.latest_ids_for(vitals, [aadhar_of(0), aadhar_of(2)]))
+        self.assertEqual(sorted(rows.values_list('aadhar', 'systolic')), [(aadhar_of(0), '125'), (aadhar_of(2), '125')])
+
+
+class CohortPlannerTests(TestCase):
+    """ Each table compiles to one subquery without changing which workers match. """
+
+    def setUp(self):
+        for i in range(4):
+            employee_details.objects.create(aadhar=aadhar_of(i), name=f"Worker {i}", sex='Male', type='Employee')
+        # Worker 0 meets both vitals conditions on different rows, worker 1 only one of them
+        vitals.objects.create(aadhar=aadhar_of(0), systolic='150', diastolic='80', systolic_status='high')
+        vitals.objects.create(aadhar=aadhar_of(0), systolic='120', diastolic='95', diastolic_status='high')
+        vitals.objects.create(aadhar=aadhar_of(1), systolic='150', diastolic='80', systolic_status='high')
+        Consultation.objects.create(aadhar=aadhar_of(2), special_cases='yes')
+        FitnessAssessment.objects.create(aadhar=aadhar_of(3), special_cases='yes')
+
+    def matching(self, planner):
+        return sorted(planner.apply(employee_details.objects.all()).values_list('aadhar', flat=True))
+
+    def test_required_predicates_may_match_different_rows(self):
+        planner = CohortPlanner()
+        planner.require(vitals, Q(systolic_status__iexact='high'))
+        planner.require(vitals, Q(diastolic_status__iexact='high'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.matching(planner), [aadhar_of(0)])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(queries[0]['sql'].count('"backend_vitals"'), 1)
+
+    def test_exclusion_ignores_rows_without_aadhar(self):
+        Consultation.objects.create(aadhar=None, special_cases='yes')
+        planner = CohortPlanner()
+        planner.exclude(Consultation, Q(special_cases='yes'))
+        self.assertEqual(self.matching(planner), [aadhar_of(0), aadhar_of(1), aadhar_of(3)])
+
+    def test_require_any_matches_either_table(self):
+        planner = CohortPlanner()
+        planner.require_any(
+            (FitnessAssessment, Q(special_cases__iexact='YES')),
+            (Consultation, Q(special_cases__iexact='YES')),
+        )
+        self.assertEqual(self.matching(planner), [aadhar_of(2), aadhar_of(3)])
+
+    def test_plan_lists_cheapest_steps_first(self):
+        FitnessAssessment.objects.create(aadhar=aadhar_of(0))
+        planner = CohortPlanner()
+        planner.require(vitals, Q(systolic__icontains='15'))
+        planner.exclude(Consultation, Q(special_cases='yes'))
+        planner.require(FitnessAssessment, Q(entry_date__gte=date(2000, 1, 1)))
+        self.assertEqual([step['cost'] for step in planner.describe()], [COST_EXACT, COST_RANGE, COST_SCAN])
+        self.assertEqual(self.matching(planner), [aadhar_of(0)])
+
+    def test_filtered_data_combines_criteria_per_table(self):
+        response = self.client.post(reverse('get_filtered_data'), json.dumps({
+            'param_1': {'param': 'systolic', 'value': 'high'},
+            'param_2': {'param': 'diastolic', 'value': 'high'},
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['aadhar'] for row in response.json()['data']], [aadhar_of(0)])
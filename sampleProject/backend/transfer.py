@@ -0,0 +1,260 @@
+"""
+Resumable table-by-table copy between two configured databases (MySQL to
+MSSQL for the migration, but any pair of DATABASES aliases works).
+
+Each model is copied in primary-key order, one keyset page at a time
+(WHERE pk > last ORDER BY pk), so no table is ever held in memory. Rows keep
+their primary keys, which keeps foreign keys and the mrdNo/aadhar links
+between tables intact, and are inserted raw: auto_now dates and save()
+overrides are not re-applied. Every page commits on its own and then
+advances a checkpoint file for the model; an interrupted run resumes after
+the last committed page (or after the highest key already in the target,
+should the process die between the commit and the checkpoint write).
+
+Models are grouped into levels by their foreign keys and each level is
+copied by a process pool, one model per worker. verify_model() compares row
+counts and an order-independent checksum of both copies.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import AutoField, Max
+
+TRANSFER_PAGE_SIZE = 2000
+
+
+def transfer_models(app_label='backend'):
+    """ Concrete, managed models of the app, parents before the models that reference them. """
+    return [
+        model for level in dependency_levels(
+            [m for m in apps.get_app_config(app_label).get_models() if m._meta.managed and not m._meta.proxy]
+        ) for model in level
+    ]
+
+
+def models_named(names, app_label='backend'):
+    """ transfer_models() narrowed to the given model names (all of them without names). """
+    models = transfer_models(app_label)
+    if not names:
+        return models
+    by_name = {model.__name__: model for model in models}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise LookupError(f"Unknown model(s): {', '.join(unknown)}")
+    return [model for model in models if model.__name__ in names]
+
+
+def dependency_levels(models):
+    """ Splits models into levels whose foreign keys only point at earlier levels (or outside the list). """
+    remaining = list(models)
+    done = set()
+    levels = []
+    while remaining:
+        level = [
+            model for model in remaining
+            if all(
+                field.related_model in done or field.related_model not in remaining or field.related_model is model
+                for field in model._meta.concrete_fields if field.is_relation
+            )
+        ]
+        if not level:  # a reference cycle: copy the rest together
+            level = remaining
+        levels.append(level)
+        done.update(level)
+        remaining = [model for model in remaining if model not in done]
+    return levels
+
+
+class Checkpoint:
+    """ Last committed primary key and row count of one model's copy, in <directory>/<app>.<model>.json. """
+
+    def __init__(self, directory, model):
+        self.path = os.path.join(directory, f"{model._meta.label_lower}.json")
+        self.last_pk = None
+        self.rows = 0
+        self.done = False
+        if os.path.exists(self.path):
+            with open(self.path) as fh:
+                state = json.load(fh)
+            self.last_pk, self.rows, self.done = state['last_pk'], state['rows'], state['done']
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump({'last_pk': self.last_pk, 'rows': self.rows, 'done': self.done}, fh)
+        os.replace(tmp, self.path)  # never leaves a half-written checkpoint behind
+
+    def reset(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.last_pk, self.rows, self.done = None, 0, False
+
+
+def has_identity(model):
+    """ Whether the model's key is an auto-incrementing column (IDENTITY on SQL Server). """
+    return isinstance(model._meta.pk, AutoField)
+
+
+@contextmanager
+def identity_insert(model, using):
+    """ SQL Server refuses explicit values for IDENTITY columns unless IDENTITY_INSERT is on for the table. """
+    connection = connections[using]
+    if connection.vendor != 'mssql' or not has_identity(model):
+        yield
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET IDENTITY_INSERT {table} ON")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET IDENTITY_INSERT {table} OFF")
+
+
+def insert_raw(model, objs, using):
+    """
+    Multi-row INSERTs of the objects' own values. Unlike bulk_create() no
+    pre_save() runs, so auto_now fields keep their stored dates.
+    """
+    fields = model._meta.concrete_fields
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    insert_sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) VALUES "
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            cursor.execute(insert_sql + ', '.join([row_sql] * len(batch)), [
+                field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in batch for field in fields
+            ])
+
+
+def reset_sequences(model, using):
+    """ Lets the database's own key generator continue after explicitly inserted keys (a no-op where none is needed). """
+    reset_sql = connections[using].ops.sequence_reset_sql(no_style(), [model])
+    if reset_sql:
+        with connections[using].cursor() as cursor:
+            for sql in reset_sql:
+                cursor.execute(sql)
+
+
+def transfer_model(model, source, target, checkpoint_dir, page_size=TRANSFER_PAGE_SIZE, progress=None):
+    """ Copies (the rest of) one model and returns its checkpoint. progress(model, rows) is called per page. """
+    checkpoint = Checkpoint(checkpoint_dir, model)
+    if checkpoint.done:
+        return checkpoint
+
+    pk_name = model._meta.pk.attname
+    copied_up_to = model._base_manager.using(target).aggregate(top=Max(pk_name))['top']
+    if copied_up_to is not None and (checkpoint.last_pk is None or copied_up_to > checkpoint.last_pk):
+        checkpoint.last_pk = copied_up_to
+
+    rows = model._base_manager.using(source).order_by(pk_name)
+    while True:
+        page = rows.filter(**{f"{pk_name}__gt": checkpoint.last_pk}) if checkpoint.last_pk is not None else rows
+        objs = list(page[:page_size])
+        if not objs:
+            break
+        with transaction.atomic(using=target), identity_insert(model, target):
+            insert_raw(model, objs, target)
+        checkpoint.last_pk = objs[-1].pk
+        checkpoint.rows += len(objs)
+        checkpoint.save()
+        if progress:
+            progress(model, checkpoint.rows)
+
+    reset_sequences(model, target)
+    checkpoint.done = True
+    checkpoint.save()
+    return checkpoint
+
+
+def _serialized(field, obj):
+    value = field.value_to_string(obj)
+    # JSONField hands back the decoded value itself
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+
+
+def table_checksum(model, using, page_size=TRANSFER_PAGE_SIZE):
+    """
+    (row count, checksum) of a model's rows. Each row is hashed from the
+    serialized field values, as dumpdata writes them, so both databases'
+    type quirks cancel out; row hashes are summed, so order does not matter.
+    """
+    fields = model._meta.concrete_fields
+    pk_name = model._meta.pk.attname
+    rows = model._base_manager.using(using).order_by(pk_name)
+    count = total = 0
+    last_pk = None
+    while True:
+        objs = list((rows.filter(**{f"{pk_name}__gt": last_pk}) if last_pk is not None else rows)[:page_size])
+        if not objs:
+            break
+        for obj in objs:
+            digest = hashlib.sha256('\x1f'.join(_serialized(field, obj) for field in fields).encode('utf-8'))
+            total = (total + int.from_bytes(digest.digest()[:8], 'big')) % (1 << 64)
+        count += len(objs)
+        last_pk = objs[-1].pk
+    return count, f"{total:016x}"
+
+
+def verify_model(model, source, target):
+    source_count, source_sum = table_checksum(model, source)
+    target_count, target_sum = table_checksum(model, target)
+    return {
+        'model': model._meta.label,
+        'source_rows': source_count,
+        'target_rows': target_count,
+        'match': source_count == target_count and source_sum == target_sum,
+    }
+
+
+def init_worker():
+    import django
+    django.setup()
+    # Never share a connection inherited from the parent process
+    connections.close_all()
+
+
+def _transfer_label(label, source, target, checkpoint_dir, page_size):
+    model = apps.get_model(label)
+    checkpoint = transfer_model(model, source, target, checkpoint_dir, page_size)
+    return label, checkpoint.rows
+
+
+def run_transfer(models, source, target, checkpoint_dir, workers=4, page_size=TRANSFER_PAGE_SIZE, report=print):
+    """ Copies every model, one dependency level at a time, `workers` tables in parallel within a level. """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    connections.close_all()  # the workers open their own
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        for level in dependency_levels(models):
+            futures = {
+                pool.submit(_transfer_label, model._meta.label, source, target, checkpoint_dir, page_size): model
+                for model in level
+            }
+            failures = []
+            for future in as_completed(futures):
+                model = futures[future]
+                try:
+                    label, rows = future.result()
+                except Exception as e:
+                    failures.append(f"{model._meta.label}: {e}")
+                    report(f"❌ {model._meta.label}: {e}")
+                    continue
+                totals[label] = rows
+                report(f"✅ {label}: {rows} rows")
+            if failures:
+                # Later levels may reference the failed tables; rerun to resume from the checkpoints
+                raise RuntimeError(f"{len(failures)} model(s) failed: " + '; '.join(failures))
+    return totals
@@ -21,6 +21,7 @@ urlpatterns = [
 
     # Core Data Fetching / Entry (Using Aadhar)
     path('userData', views.fetchdata, name = 'userData'),
+    path('userDataStream', views.fetchdata_stream, name = 'userDataStream'),
     path('get_worker_by_aadhar/', views.get_worker_by_aadhar, name='get_worker_by_aadhar'),
     path('userDataWithID', views.fetchdatawithID, name = 'userDataWithID'),
     path('adminData', views.fetchadmindata, name = 'adminData'),
@@ -29,6 +30,7 @@ urlpatterns = [
     path('updateProfileImage/<str:aadhar>', views.uploadImage, name='upload_image'),
     path('visitData/<str:aadhar>', views.fetchVisitdata, name = 'fetchVisitdata'),
     path('visitDataWithMrd/<str:mrdNo>', views.fetchVisitDataWithDate, name = 'fetchVisitdataWithDate'),
+    path('visitDataBundle', views.fetchVisitDataBundle, name = 'fetchVisitDataBundle'),
     path('update_employee_status/', views.update_employee_status, name='update_employee_status'),
     path('updateEmployeeData', views.update_employee_data, name='update_employee_data'),
 
@@ -83,6 +85,7 @@ urlpatterns = [
     path('get_notes/<str:aadhar>', views.get_notes, name='get_notes_by_aadhar'),
     path('get_notes/', views.get_notes_all, name='get_notes_all'),
     path('get_filtered_data', views.get_filtered_data, name='get_filtered_data'),
+    path('cohort_query', views.cohort_query, name='cohort_query'),
 
     # Forms (Using Aadhar from payload)
     path('form17/', views.create_form17, name='create_form17'),
@@ -161,6 +164,8 @@ urlpatterns = [
     path('get_red_status_count/', views.get_red_status_count, name='get_red_status_count'),
     path('hrupload/<str:data_type>', views.hrupload, name='hrupload'),
     path('medicalupload', views.MedicalDataUploadView.as_view(), name='medical_upload'),
+    path('import-jobs/<int:job_id>/', views.import_job_status, name='import_job_status'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
     path('get_investigation_details/<str:aadhar>', views.get_investigation_details, name = 'get_investigations-details'),
     path('update-pharmacy-stock/', views.update_pharmacy_stock, name='update_pharmacy_stock'),
     path('get-chemical-names/',  views.get_chemical_name_suggestions,  name='get-chemical-name-suggestions'),
@@ -646,6 +646,9 @@ def delete_member(request, member_id):
         }, status=500)
 
 
+from .profiles import assemble_profile, visit_bundles
+
+
 @csrf_exempt
 def fetchdatawithID(request):
     if request.method == "POST":
@@ -660,120 +663,14 @@ def fetchdatawithID(request):
             if not target_aadhar:
                 return JsonResponse({"error": "Aadhar number is required"}, status=400)
 
-            # 2. Fetch the specific Employee (Latest record)
-            # We order by -id to get the most recently added details for this Aadhar
-            employee = employee_details.objects.filter(aadhar=target_aadhar).values().order_by('-id').first()
+            # 2. Assemble the latest record of every section for this worker
+            employee = assemble_profile(target_aadhar, get_media_url_prefix(request))
 
             if not employee:
                 # Return empty list if user not found (matches frontend logic)
                 return JsonResponse({"data": []}, status=200)
 
-            # Handle Profile Pic URL
-            media_url_prefix = get_media_url_prefix(request)
-            if employee.get("profilepic"):
-                employee["profilepic_url"] = f"{media_url_prefix}{employee['profilepic']}"
-            else:
-                employee["profilepic_url"] = None
-
-            # 3. Helper function to fetch single latest record or generate defaults
-            def get_single_latest_record(model, aadhar):
-                """
-                Fetches the latest record for a specific Aadhar.
-                If no record exists, returns a dictionary with default values.
-                """
-                record = None
-                
-                # Determine ordering field (entry_date, date, or id)
-                sort_field = '-id' # Default fallback
-                if hasattr(model, 'entry_date'):
-                    sort_field = '-entry_date'
-                elif hasattr(model, 'date'):
-                    sort_field = '-date'
-                
-                # Query the model
-                # We filter by aadhar and take the first one based on sort order
-                record = model.objects.filter(aadhar=aadhar).values().order_by(sort_field, '-id').first()
-
-                if record:
-                    return record
-                
-                # --- GENERATE DEFAULT STRUCTURE IF NO DATA FOUND ---
-                # This ensures the frontend receives { "diabetes": false } instead of undefined
-                default_data = {}
-                if model and hasattr(model, '_meta'):
-                    try:
-                        for field in model._meta.get_fields():
-                            if field.concrete and not field.is_relation and not field.primary_key:
-                                default_val = None
-                                if isinstance(field, CharField): 
-                                    default_val = ""
-                                elif isinstance(field, BooleanField): 
-                                    default_val = False
-                                elif isinstance(field, JSONField):
-                                    # Specific defaults for known JSON fields
-                                    if field.name in ["normal_doses", "booster_doses"]: 
-                                        default_val = {"dates": [], "dose_names": []}
-                                    elif field.name == "surgical_history": 
-                                        default_val = {"comments":"", "children": []}
-                                    elif field.name == "vaccination": 
-                                        default_val = {"vaccination": []}
-                                    elif field.name in ["job_nature", "conditional_fit_feilds"]: 
-                                        default_val = []
-                                    else: 
-                                        default_val = {}
-                                default_data[field.name] = default_val
-                    except Exception as e:
-                        logger.error(f"Error creating default structure for {model.__name__}: {e}")
-                
-                return default_data
-
-            # 4. List of models to fetch
-            models_to_fetch = [
-                 Dashboard, vitals, MedicalHistory, heamatalogy, RoutineSugarTests,
-                 RenalFunctionTest, LipidProfile, LiverFunctionTest, ThyroidFunctionTest,
-                 AutoimmuneTest, CoagulationTest, EnzymesCardiacProfile, UrineRoutineTest,
-                 SerologyTest, MotionTest, CultureSensitivityTest, MensPack, WomensPack,
-                 OccupationalProfile, OthersTest, OphthalmicReport, XRay, USGReport,
-                 CTReport, MRIReport, FitnessAssessment, VaccinationRecord, Consultation,
-                 Prescription, SignificantNotes, Form17, Form38, Form39, Form40, Form27
-            ]
-
-            # 5. Loop through models and attach data to the employee object
-            for model_cls in models_to_fetch:
-                # Determine key name (matching frontend expectations)
-                model_name_lower = model_cls.__name__.lower()
-                
-                if model_cls == RenalFunctionTest: 
-                     key_name = "renalfunctiontests_and_electrolytes"
-                elif model_cls == XRay:
-                     key_name = "xray"
-                elif model_cls == MotionTest:
-                     key_name = "motiontest"
-                elif model_cls == CultureSensitivityTest:
-                     key_name = "culturesensitivitytest"
-                elif model_cls == USGReport:
-                     key_name = "usgreport" 
-                elif model_cls == CTReport:
-                     key_name = "ctreport" 
-                elif model_cls == MRIReport:
-                     key_name = "mrireport" 
-                else: 
-                     key_name = model_name_lower
-
-                # Fetch data
-                data_record = get_single_latest_record(model_cls, target_aadhar)
-                
-                # Date Serialization helper
-                # Convert python datetime/date objects to strings for JSON
-                if isinstance(data_record, dict):
-                    for k, v in data_record.items():
-                        if isinstance(v, (datetime, date)):
-                            data_record[k] = v.isoformat()
-
-                # Attach to employee dict
-                employee[key_name] = data_record
-
-            # 6. Return response
+            # 3. Return response
             # Frontend expects { data: [Object] }
             return JsonResponse({"data": [employee]}, status=200)
 
@@ -784,15 +681,37 @@ def fetchdatawithID(request):
     logger.warning("fetchdatawithID failed: Invalid request method.")
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Max, CharField, BooleanField
 from django.db.models.fields.json import JSONField
 from datetime import datetime, date
 import logging
 
+from . import latest as latest_records
+from . import sequences
+from .record_templates import empty_record
+
 logger = logging.getLogger(__name__)
 
+# Rows per round trip when full-table listings stream through QuerySet.iterator()
+EXPORT_CHUNK_SIZE = 2000
+
+# Models merged into every worker record by fetchdata / fetchdata_stream.
+# The response key for each one is model.__name__.lower().
+FETCHDATA_MODELS = [
+    Dashboard, vitals, MedicalHistory, heamatalogy, RoutineSugarTests,
+    RenalFunctionTest, LipidProfile, LiverFunctionTest, ThyroidFunctionTest,
+    AutoimmuneTest, CoagulationTest, EnzymesCardiacProfile, UrineRoutineTest,
+    SerologyTest, MotionTest, CultureSensitivityTest, MensPack, WomensPack,
+    OccupationalProfile, OthersTest, OphthalmicReport, XRay, USGReport,
+    CTReport, MRIReport, FitnessAssessment, VaccinationRecord, Consultation,
+    Prescription, SignificantNotes, Form17, Form38, Form39, Form40, Form27
+]
+
+FETCHDATA_STREAM_CHUNK_SIZE = 500
+
 
 @csrf_exempt
 def fetchdata(request):
@@ -801,17 +720,9 @@ def fetchdata(request):
 
     try:
         # ---------- STEP 1: FETCH LATEST EMPLOYEES ----------
-        latest_employees = (
-            employee_details.objects
-            .values("aadhar")
-            .annotate(latest_id=Max("id"))
-        )
-
-        latest_employee_ids = [emp["latest_id"] for emp in latest_employees if emp.get("latest_id")]
-
         employees = list(
             employee_details.objects
-            .filter(id__in=latest_employee_ids)
+            .filter(id__in=latest_records.latest_ids(employee_details))
             .values()
         )
 
@@ -851,34 +762,15 @@ def fetchdata(request):
 
                 pk_name = model._meta.pk.name
 
-                latest_ids = (
+                records = list(
                     model.objects
-                    .filter(aadhar__in=employee_keys)
-                    .values("aadhar")
-                    .annotate(latest_id=Max(pk_name))
+                    .filter(**{f"{pk_name}__in": latest_records.latest_ids(model)})
+                    .values()
                 )
 
-                ids = [row["latest_id"] for row in latest_ids if row.get("latest_id")]
-                records = list(model.objects.filter(**{f"{pk_name}__in": ids}).values())
-
-                # ---------- DEFAULT STRUCTURE ----------
-                default_structure = {}
-                for field in model._meta.fields:
-                    if field.primary_key or field.is_relation:
-                        continue
-
-                    if isinstance(field, CharField):
-                        default_structure[field.name] = ""
-                    elif isinstance(field, BooleanField):
-                        default_structure[field.name] = False
-                    elif isinstance(field, JSONField):
-                        default_structure[field.name] = {}
-                    else:
-                        default_structure[field.name] = None
-
                 return (
                     {rec["aadhar"]: rec for rec in records if "aadhar" in rec},
-                    default_structure
+                    empty_record(model)
                 )
 
             except Exception as e:
@@ -894,20 +786,10 @@ def fetchdata(request):
                 )
 
         # ---------- STEP 4: MODELS ----------
-        models_to_fetch = [
-            Dashboard, vitals, MedicalHistory, heamatalogy, RoutineSugarTests,
-            RenalFunctionTest, LipidProfile, LiverFunctionTest, ThyroidFunctionTest,
-            AutoimmuneTest, CoagulationTest, EnzymesCardiacProfile, UrineRoutineTest,
-            SerologyTest, MotionTest, CultureSensitivityTest, MensPack, WomensPack,
-            OccupationalProfile, OthersTest, OphthalmicReport, XRay, USGReport,
-            CTReport, MRIReport, FitnessAssessment, VaccinationRecord, Consultation,
-            Prescription, SignificantNotes, Form17, Form38, Form39, Form40, Form27
-        ]
-
         fetched_data = {}
         default_structures = {}
 
-        for model_cls in models_to_fetch:
+        for model_cls in FETCHDATA_MODELS:
             key = model_cls.__name__.lower()
             fetched_data[key], default_structures[key] = get_latest_records(model_cls)
 
@@ -942,6 +824,157 @@ def fetchdata(request):
         }, status=500)
 
 
+def _latest_employee_page(after_id, size):
+    """
+    Keyset page of the newest employee_details row per Aadhar, ordered by id.
+    Walks the LatestRecord pointers on (model_label, record_id), so each page
+    is an indexed range read instead of a GROUP BY over the whole table.
+    """
+    page_ids = list(
+        latest_records.latest_ids(employee_details)
+        .filter(record_id__gt=after_id)
+        .order_by("record_id")
+        .values_list("record_id", flat=True)[:size]
+    )
+    return list(employee_details.objects.filter(id__in=page_ids).order_by("id").values())
+
+
+def _latest_records_for_aadhars(model, aadhars):
+    """ Latest row of `model` for each Aadhar in `aadhars`, keyed by Aadhar. """
+    pk_name = model._meta.pk.name
+    records = model.objects.filter(**{f"{pk_name}__in": latest_records.latest_ids_for(model, aadhars)}).values()
+    return {rec["aadhar"]: rec for rec in records}
+
+
+@csrf_exempt
+def fetchdata_stream(request):
+    """
+    Cursor-paginated, streaming variant of fetchdata.
+
+    Parameters (query string or JSON body):
+      after  - employee_details.id cursor; only workers whose latest record id
+               is greater than this are returned (default 0).
+      limit  - maximum number of workers in this page. Omit to stream everyone.
+      models - list (or comma separated string) of section keys to merge,
+               e.g. ["dashboard", "vitals"]. Defaults to every section.
+      format - "ndjson" (default): one worker per line, the last line is
+               {"next_cursor": ...}; "json": {"data": [...], "next_cursor": ...}.
+
+    Workers are read and merged FETCHDATA_STREAM_CHUNK_SIZE at a time, so memory
+    stays flat regardless of the workforce size. next_cursor is null once the
+    last worker has been sent.
+    """
+    if request.method not in ("GET", "POST"):
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    params = request.GET.dict()
+    if request.method == "POST" and request.body:
+        try:
+            body = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+        if isinstance(body, dict):
+            params.update(body)
+
+    try:
+        after_id = int(params.get("after") or 0)
+        limit = int(params["limit"]) if params.get("limit") not in (None, "") else None
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "'after' and 'limit' must be integers"}, status=400)
+    if limit is not None and limit <= 0:
+        return JsonResponse({"error": "'limit' must be greater than zero"}, status=400)
+
+    output_format = str(params.get("format") or "ndjson").lower()
+    if output_format not in ("ndjson", "json"):
+        return JsonResponse({"error": "'format' must be 'ndjson' or 'json'"}, status=400)
+
+    available_models = {model.__name__.lower(): model for model in FETCHDATA_MODELS}
+    requested = params.get("models")
+    if requested:
+        if isinstance(requested, str):
+            requested = [name.strip() for name in requested.split(",") if name.strip()]
+        unknown = [name for name in requested if str(name).lower() not in available_models]
+        if unknown:
+            return JsonResponse({
+                "error": f"Unknown models: {', '.join(map(str, unknown))}",
+                "available": sorted(available_models),
+            }, status=400)
+        selected = {str(name).lower(): available_models[str(name).lower()] for name in requested}
+    else:
+        selected = available_models
+
+    try:
+        media_url_prefix = get_media_url_prefix(request)
+    except Exception as e:
+        media_url_prefix = ""
+        logger.error(f"Media URL error: {e}")
+
+    # One placeholder per section, shared by every worker missing it; it is only serialized.
+    default_structures = {key: empty_record(model) for key, model in selected.items()}
+
+    def merged_workers():
+        """ Yields merged worker dicts, then the next cursor (or None) last. """
+        cursor = after_id
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = FETCHDATA_STREAM_CHUNK_SIZE if remaining is None else min(FETCHDATA_STREAM_CHUNK_SIZE, remaining)
+            employees = _latest_employee_page(cursor, page_size)
+            if not employees:
+                yield None
+                return
+
+            aadhars = [emp["aadhar"] for emp in employees]
+            section_records = {key: _latest_records_for_aadhars(model, aadhars) for key, model in selected.items()}
+
+            for emp in employees:
+                emp["profilepic_url"] = f"{media_url_prefix}{emp['profilepic']}" if emp.get("profilepic") else None
+                for key, records in section_records.items():
+                    emp[key] = records.get(emp["aadhar"], default_structures[key])
+                yield emp
+
+            cursor = employees[-1]["id"]
+            if remaining is not None:
+                remaining -= len(employees)
+            if len(employees) < page_size:
+                yield None
+                return
+
+        # Page limit reached: only hand out a cursor if there is something after it.
+        yield cursor if _latest_employee_page(cursor, 1) else None
+
+    def ndjson_stream():
+        try:
+            for item in merged_workers():
+                if isinstance(item, dict):
+                    yield json.dumps(item, cls=DjangoJSONEncoder) + "\n"
+                else:
+                    yield json.dumps({"next_cursor": item}) + "\n"
+        except Exception:
+            logger.exception("fetchdata_stream failed while streaming")
+            yield json.dumps({"error": "Internal Server Error"}) + "\n"
+
+    def json_stream():
+        yield '{"data": ['
+        first = True
+        next_cursor = None
+        try:
+            for item in merged_workers():
+                if not isinstance(item, dict):
+                    next_cursor = item
+                    continue
+                yield ("" if first else ",") + json.dumps(item, cls=DjangoJSONEncoder)
+                first = False
+        except Exception:
+            logger.exception("fetchdata_stream failed while streaming")
+            yield '], "error": "Internal Server Error"}'
+            return
+        yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+    if output_format == "json":
+        return StreamingHttpResponse(json_stream(), content_type="application/json")
+    return StreamingHttpResponse(ndjson_stream(), content_type="application/x-ndjson")
+
+
 
 
 import json
@@ -1039,30 +1072,6 @@ def addEntries(request):
         print(extra_data)
         entry_date = date.today()
 
-        # --- MRD Number Logic ---
-        determined_mrd_no = None 
-        with transaction.atomic():
-            today_entries = employee_details.objects.filter(
-                entry_date=entry_date
-            ).select_for_update().order_by('-mrdNo')
-
-            highest_mrd_today = today_entries.first()
-            if highest_mrd_today and highest_mrd_today.mrdNo and len(highest_mrd_today.mrdNo) >= 6:
-                 try:
-                      current_sequence = int(highest_mrd_today.mrdNo[:6])
-                      next_sequence = current_sequence + 1
-                 except (ValueError, TypeError):
-                      logger.warning(f"Could not parse sequence from MRD '{highest_mrd_today.mrdNo}'. Starting sequence at 1.")
-                      next_sequence = 1
-            else:
-                next_sequence = 1
-            
-            seq_part = f"{next_sequence:06d}"
-            date_part = entry_date.strftime('%d%m%Y')
-            determined_mrd_no = f"{seq_part}{date_part}"
-        
-        logger.info(f"Generated new MRD number {determined_mrd_no} for aadhar: {aadhar}")
-
         # --- Prepare data for employee_details ---
         employee_defaults = {
             'name': employee_data.get('name', ''),
@@ -1126,7 +1135,6 @@ def addEntries(request):
             'prevcontractName': extra_data.get('prevcontractName', ''),
             'old_emp_no': extra_data.get('old_emp_no', ''),
             'otherRegister': extra_data.get('otherRegister', ''),
-            'mrdNo': determined_mrd_no,
         }
         
         
@@ -1134,10 +1142,16 @@ def addEntries(request):
         employee_defaults_filtered = {k: v for k, v in employee_defaults.items() if v is not None}
 
         with transaction.atomic():
+            # --- MRD Number Logic ---
+            # Reserved inside the block, so a failed entry gives its number back
+            determined_mrd_no = sequences.next_mrd(entry_date)
+            logger.info(f"Generated new MRD number {determined_mrd_no} for aadhar: {aadhar}")
+
             # 1. Create the new Record
             employee_entry = employee_details.objects.create(
                 aadhar=aadhar,
                 entry_date=entry_date,
+                mrdNo=determined_mrd_no,
                 **employee_defaults_filtered
             )
 
@@ -1413,23 +1427,70 @@ def uploadImage(request, aadhar):
 @csrf_exempt
 def fetchVisitdata(request, aadhar):
     """
-    Fetches all Dashboard visit records for a specific employee 
-    and combines them with the corresponding vitals data by mapping mrdNo.
+    Fetches all completed consultation and fitness visits for a specific employee,
+    each tagged with the register of its Dashboard entry (looked up in one query).
+
+    Optional parameters (query string or JSON body):
+      fromDate / toDate  -- YYYY-MM-DD, inclusive bounds on entry_date
+      limit / offset     -- page through the visits, newest first
     """
     # REST convention for fetching data is GET
     if request.method == "POST":
         try:
-            consultation_data = list(Consultation.objects.filter(aadhar=aadhar).filter(status = "completed").order_by('-entry_date').values())
-            fitness_data = list(FitnessAssessment.objects.filter(aadhar=aadhar).filter(status = "completed").order_by('-entry_date').values())
-            visit_data = []
-            for consult_data in consultation_data:
-                consult_data['register'] = Dashboard.objects.filter(mrdNo=consult_data['mrdNo']).values('register').first().get('register','')
-                fitness_data.append(consult_data)
-            for assessment_data in fitness_data:
-                assessment_data['register'] = Dashboard.objects.filter(mrdNo=assessment_data['mrdNo']).values('register').first().get('register','')
-                visit_data.append(assessment_data)
-            
-            return JsonResponse({"message": "Visit data fetched successfully", "data": visit_data}, status=200)
+            params = request.GET.dict()
+            if request.body:
+                try:
+                    body = json.loads(request.body)
+                    if isinstance(body, dict):
+                        params.update(body)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    pass
+
+            from_date = parse_date_internal(params.get('fromDate'))
+            to_date = parse_date_internal(params.get('toDate'))
+            try:
+                limit = int(params['limit']) if params.get('limit') not in (None, '') else None
+                offset = int(params.get('offset') or 0)
+            except (TypeError, ValueError):
+                return JsonResponse({"error": "limit and offset must be integers."}, status=400)
+            if (limit is not None and limit <= 0) or offset < 0:
+                return JsonResponse({"error": "limit must be positive and offset non-negative."}, status=400)
+
+            def completed_visits(model):
+                qs = model.objects.filter(aadhar=aadhar).filter(status = "completed")
+                if from_date:
+                    qs = qs.filter(entry_date__gte=from_date)
+                if to_date:
+                    qs = qs.filter(entry_date__lte=to_date)
+                # id breaks ties within a day, so pages stay stable across requests
+                qs = qs.order_by('-entry_date', '-id')
+                if limit is not None:
+                    # Either table can supply at most offset + limit rows of the merged page
+                    qs = qs[:offset + limit]
+                return list(qs.values())
+
+            consultation_data = completed_visits(Consultation)
+            fitness_data = completed_visits(FitnessAssessment)
+
+            if limit is not None:
+                visit_data = sorted(fitness_data + consultation_data, key=lambda v: (v['entry_date'] or date.min, v['id']), reverse=True)
+                has_more = len(visit_data) > offset + limit
+                visit_data = visit_data[offset:offset + limit]
+            else:
+                visit_data = fitness_data + consultation_data
+
+            # Register of the first Dashboard row per MRD, one query for the whole page
+            mrd_nos = {v['mrdNo'] for v in visit_data if v['mrdNo']}
+            registers = {}
+            for mrd, register in Dashboard.objects.filter(mrdNo__in=mrd_nos).order_by('pk').values_list('mrdNo', 'register'):
+                registers.setdefault(mrd, register)
+            for visit in visit_data:
+                visit['register'] = registers.get(visit['mrdNo'], '')
+
+            response = {"message": "Visit data fetched successfully", "data": visit_data}
+            if limit is not None:
+                response.update({"limit": limit, "offset": offset, "has_more": has_more})
+            return JsonResponse(response, status=200)
 
         except Exception as e:
             logger.exception(f"fetchVisitdata failed for aadhar {aadhar}: An unexpected error occurred.")
@@ -1460,53 +1521,10 @@ def fetchVisitDataWithDate(request, mrdNo):
             if not mrdNo:
                 return JsonResponse({"error": "MRD Number is required."}, status=400)
 
-            # 1. Define models that contain Visit Data (linked by mrdNo)
-            # 'employee' is excluded here, we handle it separately
-            visit_models = {
-                "dashboard": Dashboard, "vitals": vitals,
-                "msphistory": MedicalHistory, "haematology": heamatalogy, 
-                "routinesugartests": RoutineSugarTests,
-                "renalfunctiontests_and_electrolytes": RenalFunctionTest, 
-                "lipidprofile": LipidProfile, "liverfunctiontest": LiverFunctionTest,
-                "thyroidfunctiontest": ThyroidFunctionTest, "coagulationtest": CoagulationTest,
-                "enzymesandcardiacprofile": EnzymesCardiacProfile, "urineroutine": UrineRoutineTest,
-                "serology": SerologyTest, "motion": MotionTest, "menspack": MensPack,
-                "opthalamicreport": OphthalmicReport, "usg": USGReport, "mri": MRIReport,
-                "fitnessassessment": FitnessAssessment, "vaccination": VaccinationRecord,
-                "significant_notes": SignificantNotes, "consultation": Consultation,
-                "prescription": Prescription, "form17": Form17, "form38": Form38,
-                "form39": Form39, "form40": Form40, "form27": Form27,
-                "autoimmunetest": AutoimmuneTest, "routinecultureandsensitive": CultureSensitivityTest,
-                "womenpack": WomensPack, "occupationalprofile": OccupationalProfile,
-                "otherstest": OthersTest, "xray": XRay, "ct": CTReport,
-            }
+            # One batched query per section table (see backend.profiles.visit_bundles)
+            response_data = visit_bundles([mrdNo])[mrdNo]
 
-            response_data = {}
-            found_aadhar = None
-
-            # 2. Iterate through visit models to fetch data by MRD
-            for key, model_class in visit_models.items():
-                # We assume these models have an 'mrdNo' field
-                if hasattr(model_class, 'mrdNo'):
-                    instance = model_class.objects.filter(mrdNo=mrdNo).first()
-                    response_data[key] = serialize_model_instance(instance)
-                    
-                    # Capture the Aadhar from the first model where we find data 
-                    # (Usually Consultation or Vitals is the anchor)
-                    if instance and not found_aadhar and hasattr(instance, 'aadhar'):
-                        found_aadhar = instance.aadhar
-                else:
-                    # Fallback if a model in the list doesn't have mrdNo (shouldn't happen based on requirement)
-                    response_data[key] = None
-
-            # 3. Fetch Employee Details (Static Profile) using the found Aadhar
-            # Employee details usually don't have an mrdNo, they are linked by Aadhar
-            if found_aadhar:
-                employee_instance = employee_details.objects.filter(aadhar=found_aadhar).first()
-                response_data["employee"] = serialize_model_instance(employee_instance)
-            else:
-                response_data["employee"] = None
-                
+            if response_data["employee"] is None:
                 # Optional: If no clinical data was found at all for this MRD
                 is_empty = all(v is None for v in response_data.values())
                 if is_empty:
@@ -1523,6 +1541,38 @@ def fetchVisitDataWithDate(request, mrdNo):
     return JsonResponse({"error": "Invalid request method. Use GET."}, status=405)
 
 
+VISIT_BUNDLE_MAX_MRDS = 500
+
+@csrf_exempt
+def fetchVisitDataBundle(request):
+    """
+    Fetches the visit records of several MRD numbers at once.
+    Body: {"mrdNos": [...]}. Returns {"data": {mrdNo: <fetchVisitDataWithDate payload>}}.
+    """
+    if request.method != "POST":
+        logger.warning("fetchVisitDataBundle failed: Invalid request method. Only POST allowed.")
+        return JsonResponse({"error": "Invalid request method. Use POST."}, status=405)
+
+    try:
+        data = json.loads(request.body or b"{}")
+        mrd_nos = data.get("mrdNos")
+        if not isinstance(mrd_nos, list) or not mrd_nos:
+            return JsonResponse({"error": "mrdNos must be a non-empty list."}, status=400)
+        mrd_nos = [str(m).strip() for m in mrd_nos if m is not None and str(m).strip()]
+        if len(mrd_nos) > VISIT_BUNDLE_MAX_MRDS:
+            return JsonResponse({"error": f"At most {VISIT_BUNDLE_MAX_MRDS} MRD numbers per request."}, status=400)
+
+        bundles = visit_bundles(mrd_nos)
+        logger.info(f"Fetched visit bundles for {len(bundles)} MRD numbers")
+        return JsonResponse({"data": bundles}, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format."}, status=400)
+    except Exception as e:
+        logger.exception("fetchVisitDataBundle failed: An unexpected error occurred.")
+        return JsonResponse({"error": "An internal server error occurred.", "detail": str(e)}, status=500)
+
+
 import json
 import logging
 from datetime import date
@@ -3338,15 +3388,8 @@ def BookAppointment(request):
             if not appointment_date_obj:
                 return JsonResponse({"error": "Invalid appointment date format. Use YYYY-MM-DD."}, status=400)
 
-            # 2. Generate Appointment Number
-            with transaction.atomic():
-                existing_appointments = Appointment.objects.filter(date=appointment_date_obj).select_for_update().count()
-                next_appointment_number = existing_appointments + 1
-                appointment_no_gen = f"{next_appointment_number:04d}{appointment_date_obj.strftime('%d%m%Y')}"
-
-            # 3. Prepare Data Payload
+            # 2. Prepare Data Payload (the appointment number is reserved with the insert below)
             appointment_data = {
-                'appointment_no': appointment_no_gen, 
                 'booked_date': date.today(),
                 
                 # --- Classification Mapping ---
@@ -3391,7 +3434,10 @@ def BookAppointment(request):
             }
 
             filtered_appointment_data = {k: v for k, v in appointment_data.items() if v is not None}
-            appointment = Appointment.objects.create(**filtered_appointment_data)
+            with transaction.atomic():
+                # 3. Generate Appointment Number; a failed insert gives it back
+                filtered_appointment_data['appointment_no'] = sequences.next_appointment_no(appointment_date_obj)
+                appointment = Appointment.objects.create(**filtered_appointment_data)
 
             logger.info(f"Appointment {appointment.appointment_no} booked.")
             
@@ -3663,32 +3709,41 @@ def derive_visit_info(role, register):
     # Fallback if register spelling doesn't match exactly
     return "Preventive", "Other"
 
-@csrf_exempt
-def uploadAppointment(request):
-    if request.method != "POST":
-        return JsonResponse({"error": "Only POST allowed"}, status=405)
+APPOINTMENT_BATCH_SIZE = 500
 
-    try:
-        data = json.loads(request.body.decode('utf-8'))
-        appointments_data = data.get("appointments", [])
-        booked_by = data.get("bookedBy", "")
-        # Expecting at least header + 1 row
-        if not appointments_data or len(appointments_data) < 2:
-            return JsonResponse({"error": "No valid data found in Excel."}, status=400)
 
-        successful = 0
-        failed = []
-
-        # Iterate rows, skipping the header (start=1)
-        for i, row in enumerate(appointments_data[1:], start=1):
+def import_appointments(appointments_data, booked_by, progress=None):
+    """
+    Books one Appointment per row of an uploaded sheet (appointments_data[0]
+    is the header row). Returns (successful, failed) where failed holds one
+    message per rejected row. Each chunk of APPOINTMENT_BATCH_SIZE rows costs
+    one worker lookup, one number reservation per booked date and one bulk
+    insert.
+    """
+    successful = 0
+    failed = []
+
+    # Rows are handled in chunks, skipping the header (start=1)
+    rows = list(enumerate(appointments_data[1:], start=1))
+    for chunk in batched(rows, APPOINTMENT_BATCH_SIZE):
+        reported = len(failed)
+        # Newest employee_details record of every Aadhar in the chunk, in one read
+        workers = {
+            worker.aadhar: worker
+            for worker in employee_details.objects.filter(
+                id__in=latest_records.latest_ids_for(employee_details, {get_cell(row, 0) for _, row in chunk})
+            )
+        }
+        pending = []  # (row index, row, unsaved Appointment)
+        for i, row in chunk:
             try:
                 # --- 1. Extract Direct Fields (Order based on your Excel Image) ---
                 # 0: Aadhar, 1: Role, 2: Register, 3: Follow Up Reason, 4: Date, 5: Time
                 # 6: Year, 7: Batch, 8: Hospital, 9: Camp, 10: Booked By
-                
+
                 aadhar_no = get_cell(row, 0)
                 register = get_cell(row, 1)
-                
+
                 # Validation
                 if not aadhar_no or len(aadhar_no) != 12:
                     raise ValueError(f"Invalid Aadhar No: {aadhar_no}")
@@ -3700,7 +3755,7 @@ def uploadAppointment(request):
                 booked_time = parse_excel_time(row[4] if len(row) > 4 else None)
 
                 # --- 2. Retrieve Employee Details ---
-                worker = employee_details.objects.filter(aadhar=aadhar_no).last()
+                worker = workers.get(aadhar_no)
                 if worker: 
                     role = worker.type 
                 if not worker:
@@ -3723,11 +3778,11 @@ def uploadAppointment(request):
                 # --- 4. Handle Conditional Fields ---
                 # "Follow Up Reason" column (Index 3) is overloaded based on Register
                 col_dynamic_val = get_cell(row, 2) 
-                
+
                 bp_sugar_status = ""
                 bp_sugar_reason = ""
                 followup_reason = ""
-                
+
                 if "BP Sugar Check" in register:
                     bp_sugar_status = col_dynamic_val # e.g., "Normal People"
                 elif "BP Sugar Chart" in register:
@@ -3741,47 +3796,88 @@ def uploadAppointment(request):
                 hospital_name = get_cell(row, 7)
                 camp_name = get_cell(row, 8)
 
-                # --- 5. Save to Database ---
-                with transaction.atomic():
-                    # Generate Appt Number
-                    today_count = Appointment.objects.filter(date=booked_date).select_for_update().count()
-                    appt_no = f"{(today_count + 1):04d}{booked_date.strftime('%d%m%Y')}"
-
-                    Appointment.objects.create(
-                        appointment_no=appt_no,
-                        aadhar=aadhar_no,
-                        role=role,
-                        name=name,
-                        emp_no=emp_id,
-                        organization_name=organization,
-                        contractor_name=contractor_name,
-                        
-                        # Logic Fields
-                        visit_type=visit_type,
-                        register=register,
-                        purpose=purpose,
-                        
-                        # Date/Time
-                        date=booked_date,
-                        time=booked_time,
-                        booked_by=booked_by,
-                        
-                        # Conditionals
-                        year=year,
-                        batch=batch,
-                        hospital_name=hospital_name,
-                        camp_name=camp_name,
-                        bp_sugar_status=bp_sugar_status,
-                        bp_sugar_chart_reason=bp_sugar_reason,
-                        followup_reason=followup_reason,
-                        
-                    )
-                successful += 1
+                # --- 5. Queue for the chunk's bulk insert; numbered below ---
+                pending.append((i, row, Appointment(
+                    aadhar=aadhar_no,
+                    role=role,
+                    name=name,
+                    emp_no=emp_id,
+                    organization_name=organization,
+                    contractor_name=contractor_name,
+
+                    # Logic Fields
+                    visit_type=visit_type,
+                    register=register,
+                    purpose=purpose,
+
+                    # Date/Time
+                    date=booked_date,
+                    time=booked_time,
+                    booked_by=booked_by,
+
+                    # Conditionals
+                    year=year,
+                    batch=batch,
+                    hospital_name=hospital_name,
+                    camp_name=camp_name,
+                    bp_sugar_status=bp_sugar_status,
+                    bp_sugar_chart_reason=bp_sugar_reason,
+                    followup_reason=followup_reason,
+                )))
 
             except Exception as e:
                 failed.append(f"Row {i} (Aadhar: {get_cell(row,0)}): {str(e)}")
                 logger.error(f"Upload Error Row {i}: {e}")
 
+        # Each date's appointment numbers are reserved as one block
+        try:
+            with transaction.atomic():
+                by_date = defaultdict(list)
+                for _, _, appointment in pending:
+                    by_date[appointment.date].append(appointment)
+                for booked_date, appointments in by_date.items():
+                    for appointment, appointment_no in zip(appointments, sequences.appointment_numbers(len(appointments), booked_date)):
+                        appointment.appointment_no = appointment_no
+                Appointment.objects.bulk_create([appointment for _, _, appointment in pending])
+            successful += len(pending)
+        except Exception as e:
+            logger.error(f"Upload Error Rows {chunk[0][0]}-{chunk[-1][0]}: {e}")
+            failed.extend(f"Row {i} (Aadhar: {get_cell(row,0)}): {str(e)}" for i, row, _ in pending)
+
+        if progress is not None:
+            progress.advance(len(chunk), failed[reported:])
+
+    return successful, failed
+
+
+def import_appointment_file(upload, params, progress=None):
+    """ Background job entry point: the upload is the uploadAppointment JSON payload. """
+    appointments_data = json.load(upload).get("appointments", [])
+    if progress is not None:
+        progress.set_total(max(len(appointments_data) - 1, 0))
+    successful, failed = import_appointments(appointments_data, params.get("bookedBy", ""), progress)
+    return {"successful": successful, "failed": len(failed), "message": f"Success: {successful}, Failed: {len(failed)}"}
+
+
+@csrf_exempt
+def uploadAppointment(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST allowed"}, status=405)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        appointments_data = data.get("appointments", [])
+        booked_by = data.get("bookedBy", "")
+        # Expecting at least header + 1 row
+        if not appointments_data or len(appointments_data) < 2:
+            return JsonResponse({"error": "No valid data found in Excel."}, status=400)
+
+        if wants_background(request, data):
+            payload = ContentFile(json.dumps({"appointments": appointments_data}).encode('utf-8'), name="appointments.json")
+            return queue_import(request, ImportJob.Kind.APPOINTMENT, payload, {"bookedBy": booked_by}, booked_by)
+
+        successful, failed = import_appointments(appointments_data, booked_by)
+
         return JsonResponse({
             "message": f"Success: {successful}, Failed: {len(failed)}",
             "errors": failed
@@ -4387,7 +4483,8 @@ def fetchVisitdataAll(request):
         try:
             visits_qs = Dashboard.objects.all().order_by('-date', '-id')
             visits = []
-            for v in visits_qs:
+            # iterator() streams the rows instead of caching every model instance on the queryset
+            for v in visits_qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
                  v_data = model_to_dict(v); v_data['date'] = v.date.isoformat() if v.date else None
                  visits.append(v_data)
             logger.info(f"Fetched all {len(visits)} visit records.")
@@ -4503,6 +4600,38 @@ def get_total_quantity(entry_date, medicine_form, brand_name, chemical_name, dos
         return 0 # Return 0 or None on error
 
 
+from .bulk import BulkUpserter, fold
+
+STOCK_KEY_FIELDS = ('medicine_form', 'brand_name', 'chemical_name', 'dose_volume', 'expiry_date')
+STOCK_LOOKUP_CHUNK_SIZE = 500
+
+
+def stock_key(values):
+    """ A stock line's identity, compared the way the database collation does. """
+    return tuple(fold(values[field]) for field in STOCK_KEY_FIELDS)
+
+
+def get_total_quantities(keys):
+    """
+    get_total_quantity() for many stock lines at once: {stock_key: total}, 0
+    for lines in neither table. Costs two queries per STOCK_LOOKUP_CHUNK_SIZE
+    brand names instead of up to two per line.
+    """
+    keys = set(keys)
+    brands = sorted({key[1] for key in keys if key[1] is not None})
+    totals = {}
+    for start in range(0, len(brands), STOCK_LOOKUP_CHUNK_SIZE):
+        chunk = brands[start:start + STOCK_LOOKUP_CHUNK_SIZE]
+        # Active stock first (its first row per line), then the newest history row
+        for model, ordering in ((PharmacyStock, ('pk',)), (PharmacyStockHistory, ('-entry_date', 'pk'))):
+            rows = model.objects.filter(brand_name__in=chunk).order_by(*ordering).values(*STOCK_KEY_FIELDS, 'total_quantity')
+            for row in rows:
+                key = stock_key(row)
+                if key in keys and row['total_quantity'] is not None:
+                    totals.setdefault(key, row['total_quantity'])
+    return {key: totals.get(key, 0) for key in keys}
+
+
 @csrf_exempt # Should be GET
 def get_stock_history(request):
     """ Fetch stock history (archived/consumed items) """
@@ -4513,7 +4642,7 @@ def get_stock_history(request):
             ).values() # Fetch all fields
 
             data = []
-            for entry in stock_data:
+            for entry in stock_data.iterator(chunk_size=EXPORT_CHUNK_SIZE):
                 # Format dates safely
                 entry_date_fmt = entry.get("entry_date").strftime("%Y-%m-%d") if entry.get("entry_date") else None
                 expiry_date_fmt = entry.get("expiry_date").strftime("%b-%y") if entry.get("expiry_date") else None
@@ -4882,10 +5011,12 @@ def get_current_expiry(request):
                     expiry_date__lte=target_date,
                     expiry_date__gte=today 
                 )
-                medicines_processed_count = 0
+                expiry_medicines = list(expiry_medicines)
                 for medicine in expiry_medicines:
                     print("Medicine to expire: ",medicine)
-                    ExpiryRegister.objects.create(
+                # One INSERT and one DELETE for the whole batch
+                ExpiryRegister.objects.bulk_create([
+                    ExpiryRegister(
                         entry_date=medicine.entry_date, 
                         medicine_form=medicine.medicine_form, brand_name=medicine.brand_name,
                         chemical_name=medicine.chemical_name, dose_volume=medicine.dose_volume,
@@ -4893,8 +5024,10 @@ def get_current_expiry(request):
                         expiry_date=medicine.expiry_date,
                         total_quantity = medicine.total_quantity
                     )
-                    medicine.delete() 
-                    medicines_processed_count += 1
+                    for medicine in expiry_medicines
+                ])
+                PharmacyStock.objects.filter(pk__in=[medicine.pk for medicine in expiry_medicines]).delete()
+                medicines_processed_count = len(expiry_medicines)
 
                 logger.info(f"Processed {medicines_processed_count} soon-to-expire medicines.")
 
@@ -5260,7 +5393,9 @@ def get_investigation_details(request, aadhar):
 def update_daily_quantities(request):
     """
     Receives daily quantity updates and saves them based on
-    chemical, brand, dose, expiry_date, and date.
+    chemical, brand, dose, expiry_date, and date. The whole list is written
+    through one BulkUpserter; an entry repeated in the list counts once, with
+    its last quantity.
     """
     if DailyQuantity is None:
         return JsonResponse({'error': 'Server configuration error: DailyQuantity model not available.'}, status=500)
@@ -5278,6 +5413,7 @@ def update_daily_quantities(request):
         created_count = 0
         skipped_count = 0
         processed_entries = 0
+        valid_entries = []  # (lookup, quantity) of the entries that passed validation
 
         logger.info(f"Received {len(data)} entries for daily quantity update.")
         print(f"--- Starting Daily Quantity Update Transaction ---") # DEBUG START
@@ -5330,23 +5466,6 @@ def update_daily_quantities(request):
             # *** ADJUST THIS if your model field is DecimalField/FloatField etc. ***
             dose_volume_str = str(dose_volume)
 
-            # Look up amount_per_unit from PharmacyStock
-            amount_per_unit = 0
-            if HAS_STOCK_MODEL:
-                # We filter by the same attributes to find the relevant stock item
-                stock_item = PharmacyStock.objects.filter(
-                    chemical_name=chem_name,
-                    brand_name=brand_name,
-                    dose_volume=dose_volume_str,
-                    expiry_date=entry_expiry_date
-                ).first()
-                if stock_item:
-                    amount_per_unit = stock_item.amount_per_unit
-
-            from decimal import Decimal
-            # Calculate total amount
-            total_amount = Decimal(entry_quantity) * Decimal(amount_per_unit)
-
             lookup_keys = {
                 'chemical_name': chem_name,
                 'brand_name': brand_name,
@@ -5354,32 +5473,37 @@ def update_daily_quantities(request):
                 'expiry_date': entry_expiry_date,
                 'date': entry_date,
             }
-            defaults = {
+            print(f"  Lookup Keys for DB: {lookup_keys}") # DEBUG KEYS
+            valid_entries.append((lookup_keys, entry_quantity))
+
+        # Look up amount_per_unit from PharmacyStock, one query for every entry
+        amounts_per_unit = {}
+        if HAS_STOCK_MODEL and valid_entries:
+            # We filter by the same attributes to find the relevant stock item (its first row, as .first() did)
+            stock_items = PharmacyStock.objects.filter(
+                brand_name__in={lookup['brand_name'] for lookup, _ in valid_entries}
+            ).order_by('pk').values_list('chemical_name', 'brand_name', 'dose_volume', 'expiry_date', 'amount_per_unit')
+            for chem, brand, dose, expiry, amount_per_unit in stock_items:
+                amounts_per_unit.setdefault((fold(chem), fold(brand), fold(dose), expiry), amount_per_unit)
+
+        from decimal import Decimal
+        # --- Database upsert: one lookup query and one write per kind for the whole list ---
+        upserter = BulkUpserter(DailyQuantity)
+        for lookup_keys, entry_quantity in valid_entries:
+            amount_key = tuple(fold(lookup_keys[field]) for field in ('chemical_name', 'brand_name', 'dose_volume')) + (lookup_keys['expiry_date'],)
+            # Calculate total amount
+            total_amount = Decimal(entry_quantity) * Decimal(amounts_per_unit.get(amount_key, 0))
+            upserter.add(lookup_keys, {
                 'quantity': entry_quantity,
                 'total_amount': total_amount,
-                # Add expiry to defaults as well, in case it needs updating or setting on create
-                'expiry_date': entry_expiry_date, # Keep original expiry unless specific logic added
-            }
-            print(f"  Lookup Keys for DB: {lookup_keys}") # DEBUG KEYS
-            print(f"  Defaults for DB: {defaults}") # DEBUG DEFAULTS
-
-            # --- Database update_or_create ---
-            try:
-                obj, created = DailyQuantity.objects.update_or_create(
-                    defaults=defaults,
-                    **lookup_keys
-                )
-                action = "CREATED" if created else "UPDATED"
-                print(f"  DB Result: {action} record with ID: {obj.id}") # DEBUG DB RESULT
-                if created: created_count += 1
-                else: updated_count += 1
-            except Exception as db_error:
-                 logger.error(f"Database error processing entry #{processed_entries} {lookup_keys}: {db_error}")
-                 print(f"  DB ERROR: {db_error}") # DEBUG DB ERROR
-                 skipped_count += 1
-                 # Decide on transaction strategy: continue or rollback?
-                 # To rollback on first error: transaction.set_rollback(True); raise db_error
-                 # Current behavior: log error and continue with next entry
+            })
+        try:
+            created_count, updated_count = upserter.flush()
+        except Exception as db_error:
+            logger.error(f"Database error saving {len(valid_entries)} daily quantity entries: {db_error}")
+            print(f"  DB ERROR: {db_error}") # DEBUG DB ERROR
+            transaction.set_rollback(True)
+            skipped_count += len(valid_entries)
 
         # --- Response ---
         msg = f'Daily quantities processed: {created_count} created, {updated_count} updated, {skipped_count} skipped out of {processed_entries} received.'
@@ -5406,8 +5530,6 @@ def update_daily_quantities(request):
         print(f"--- CRITICAL ERROR: {type(e).__name__} - {e} ---") # DEBUG UNEXPECTED ERROR
         return JsonResponse({'error': f'An unexpected server error occurred: {type(e).__name__}'}, status=500)
 
-        from django.http import JsonResponse
-
 
 @csrf_exempt
 def remove_expired_medicine(request):
@@ -5466,11 +5588,6 @@ def get_expiry_register(request):
 
             data = []
             for entry in expired_medicines:
-                # Fetch total quantity using the helper
-                total_quantity = get_total_quantity(
-                    entry["entry_date"], entry["medicine_form"], entry["brand_name"],
-                    entry["chemical_name"], entry["dose_volume"], entry["expiry_date"]
-                )
                 data.append({
                     "id": entry["id"],
                     "medicine_form": entry["medicine_form"], "brand_name": entry["brand_name"],
@@ -5760,15 +5877,10 @@ def get_ward_consumables(request):
 
             # ---- Build Response ----
             data = []
-            for entry in consumables_qs.order_by("-consumed_date", "-entry_date"):
-                total_quantity = get_total_quantity(
-                    entry.entry_date,
-                    entry.medicine_form,
-                    entry.brand_name,
-                    entry.chemical_name,
-                    entry.dose_volume,
-                    entry.expiry_date
-                )
+            entries = list(consumables_qs.order_by("-consumed_date", "-entry_date"))
+            total_quantities = get_total_quantities(stock_key(vars(entry)) for entry in entries)
+            for entry in entries:
+                total_quantity = total_quantities[stock_key(vars(entry))]
 
                 data.append({
                     "id": entry.id,
@@ -6519,14 +6631,21 @@ def get_calibrations(request):
             calibration_status='pending'
         ).order_by("next_due_date")
 
+        pending_calibrations = list(pending_calibrations)
+
+        # Certificate of each instrument's last completed calibration, one query for the whole list
+        last_certificates = {}
+        completed = InstrumentCalibration.objects.filter(
+            instrument_number__in={i.instrument_number for i in pending_calibrations},
+            calibration_status='Completed'
+        ).order_by('-calibration_date', '-id').values_list('instrument_number', 'certificate_number')
+        for instrument_number, certificate_number in completed:
+            last_certificates.setdefault(fold(instrument_number), certificate_number)
+
         data = []
         for i in pending_calibrations:
-            last_completed_record = InstrumentCalibration.objects.filter(
-                instrument_number=i.instrument_number,
-                calibration_status='Completed'
-            ).order_by('-calibration_date', '-id').first()
-
-            certificate_to_display = last_completed_record.certificate_number if last_completed_record else i.certificate_number
+            last_key = fold(i.instrument_number)
+            certificate_to_display = last_certificates[last_key] if last_key in last_certificates else i.certificate_number
 
             data.append({
                 "id": i.id,
@@ -7028,7 +7147,8 @@ logger = logging.getLogger(__name__)
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, date
 import pandas as pd
 from io import BytesIO
 import logging
@@ -7062,85 +7182,147 @@ def clean_id(value):
 
 logger = logging.getLogger(__name__)
 
+HR_DATE_FIELDS = ("dob", "doj")
+HR_ID_FIELDS = ("aadhar", "mrdNo", "emp_no", "country_id", "other_site_id")
+HR_DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d")
+HR_FETCH_CHUNK_SIZE = 1000
 
-@csrf_exempt
-def hrupload(request, data_type):
-    if request.method != "POST":
-        return JsonResponse({"error": "Only POST allowed"}, status=405)
 
-    try:
-        data_type = data_type.lower()
-        if data_type not in ["employee", "contractor", "visitor"]:
-            return JsonResponse({"error": "Invalid data type"}, status=400)
+def clean_date_column(column):
+    """ Column-wise parse_date(): Excel dates as-is, strings in HR_DATE_FORMATS, anything else None. """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        parsed = column
+    else:
+        is_timestamp = column.map(lambda v: isinstance(v, (datetime, date)))
+        parsed = pd.to_datetime(column.where(is_timestamp), errors="coerce")
+        is_text = column.map(lambda v: isinstance(v, str))
+        if is_text.any():
+            text = column[is_text].str.split(" ").str[0]
+            for fmt in HR_DATE_FORMATS:
+                parsed = parsed.fillna(pd.to_datetime(text, format=fmt, errors="coerce").reindex(column.index))
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
 
-        if "file" not in request.FILES:
-            return JsonResponse({"error": "File missing"}, status=400)
 
-        df = pd.read_excel(
-            BytesIO(request.FILES["file"].read()),
-            header=[0, 1]
-        )
+def clean_id_column(column):
+    """ Column-wise clean_id(): blanks to "", whole floats without ".0", strings stripped. """
+    if pd.api.types.is_integer_dtype(column):
+        return column.astype(str)
+    if pd.api.types.is_float_dtype(column):
+        return column.map(lambda v: "" if pd.isna(v) else str(int(v)))
+    return column.map(clean_id)
 
-        # Flatten headers
-        df.columns = [
-            "_".join(map(str, col)).strip()
-            for col in df.columns.values
-        ]
 
-        field_mapping = map_excel_headers_to_model_fields(data_type)
+def clean_text_column(column):
+    return column.astype(str).str.strip().where(column.notna(), "")
 
-        to_create = []
-        to_update = []
-        i = 0
-        for _, row in df.iterrows():
-            record = {}
 
-            for excel_col, model_field in field_mapping.items():
-                if excel_col not in row:
-                    continue
-
-                value = row[excel_col]
+# ------------------------------------------------------------------
+# Background import jobs (see backend/jobs.py)
+# ------------------------------------------------------------------
+from django.urls import reverse
 
-                if model_field in ("dob", "doj"):
-                    record[model_field] = parse_date(value)
+from . import jobs as import_jobs
+from .models import ImportJob
 
-                elif model_field in ("aadhar", "mrdNo", "emp_no", "country_id", "other_site_id"):
-                    record[model_field] = clean_id(value)
 
-                else:
-                    record[model_field] = str(value).strip() if pd.notna(value) else ""
+def wants_background(request, data=None):
+    """ True when an upload asks to be queued: background=1 in the query string, form or JSON body. """
+    value = request.GET.get('background') or request.POST.get('background')
+    if value is None and data is not None:
+        value = data.get('background')
+    return str(value).strip().lower() in ('1', 'true', 'yes')
 
 
-            aadhar = record.get("aadhar")
-            if not aadhar:
-                continue  
-            i+=1
-            print(i, aadhar)
-            # Fetch latest record for this aadhar
-            latest = (
-                employee_details.objects
-                .filter(aadhar=aadhar)
-                .order_by("-id")   # OR -created_at
-                .first()
-            )
+def queue_import(request, kind, upload, params=None, submitted_by=''):
+    job = import_jobs.enqueue(kind, upload, params, submitted_by)
+    return JsonResponse({
+        "job_id": job.pk,
+        "status": job.status,
+        "status_url": reverse('import_job_status', args=[job.pk]),
+        "message": "Import queued",
+    }, status=202)
 
-            if latest:
-                # UPDATE latest record
-                for field, value in record.items():
-                    if field == "mrdNo":
-                        continue  # explicitly protect mrdNo
-                    setattr(latest, field, value)
 
-                # ensure type can be updated
-                latest.type = data_type.capitalize()
+@csrf_exempt
+def import_job_status(request, job_id):
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET allowed"}, status=405)
+    job = ImportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "Import job not found"}, status=404)
+    return JsonResponse(import_jobs.job_status(job), status=200)
 
-                to_update.append(latest)
 
-            else:
-                # CREATE new record
-                record["type"] = data_type.capitalize()
+def import_hr_file(upload, params, progress=None):
+    """
+    Imports an HR sheet of params["data_type"] into employee_details: new
+    Aadhars are created, known ones get only their changed columns. Each chunk
+    of HR_FETCH_CHUNK_SIZE Aadhars is written in its own transaction; wrap the
+    call in one to make the whole file all-or-nothing.
+    """
+    data_type = params["data_type"]
+    df = pd.read_excel(
+        BytesIO(upload.read()),
+        header=[0, 1]
+    )
+
+    # Flatten headers
+    df.columns = [
+        "_".join(map(str, col)).strip()
+        for col in df.columns.values
+    ]
+
+    field_mapping = map_excel_headers_to_model_fields(data_type)
+
+    # 1. Clean whole columns at once; a later header mapped to the same field wins
+    records = pd.DataFrame(index=df.index)
+    for excel_col, model_field in field_mapping.items():
+        if excel_col not in df.columns:
+            continue
+        column = df[excel_col]
+        if model_field in HR_DATE_FIELDS:
+            records[model_field] = clean_date_column(column)
+        elif model_field in HR_ID_FIELDS:
+            records[model_field] = clean_id_column(column)
+        else:
+            records[model_field] = clean_text_column(column)
+
+    if "aadhar" not in records.columns:
+        records["aadhar"] = ""
+    # One row per Aadhar: the last occurrence in the sheet wins
+    records = records[records["aadhar"] != ""].drop_duplicates("aadhar", keep="last")
+    record_type = data_type.capitalize()
+    fields = list(records.columns)
+    update_fields = [f for f in fields if f != "mrdNo"] + ["type"]  # mrdNo is explicitly protected
+    if progress is not None:
+        progress.set_total(len(records))
+
+    created = updated = unchanged = 0
+    for start in range(0, len(records), HR_FETCH_CHUNK_SIZE):
+        chunk = records.iloc[start:start + HR_FETCH_CHUNK_SIZE].to_dict("records")
+
+        # 2. Latest existing row of every Aadhar in the chunk, in one read
+        existing = {}
+        for row in employee_details.objects.filter(
+            id__in=latest_records.latest_ids_for(employee_details, [record["aadhar"] for record in chunk])
+        ).values("id", *update_fields):
+            existing[row["aadhar"]] = row
+
+        # 3. Diff: new Aadhars are created, existing ones get only their changed columns
+        to_create = []
+        changes_by_fields = defaultdict(list)
+        for record in chunk:
+            record["type"] = record_type
+            current = existing.get(record["aadhar"])
+            if current is None:
                 record["mrdNo"] = "0"
                 to_create.append(employee_details(**record))
+                continue
+            changed = {f: record[f] for f in update_fields if record[f] != current[f]}
+            if not changed:
+                unchanged += 1
+                continue
+            changes_by_fields[tuple(sorted(changed))].append(employee_details(id=current["id"], **changed))
 
         with transaction.atomic():
             if to_create:
@@ -7148,22 +7330,49 @@ def hrupload(request, data_type):
                     to_create,
                     batch_size=1000
                 )
+                # bulk_create sends no post_save, so move the pointers here
+                latest_records.refresh(employee_details, [emp.aadhar for emp in to_create])
+
+            for changed_fields, objs in changes_by_fields.items():
+                employee_details.objects.bulk_update(objs, fields=list(changed_fields), batch_size=1000)
+            if changes_by_fields:
+                # Updated rows may be the current ones; bulk_update sends no post_save either
+                latest_records.touch(employee_details, [
+                    record["aadhar"] for record in chunk if record["aadhar"] in existing
+                ])
+
+        created += len(to_create)
+        updated += sum(len(objs) for objs in changes_by_fields.values())
+        if progress is not None:
+            progress.advance(len(chunk))
+
+    return {
+        "created": created,
+        "updated": updated,
+        "unchanged": unchanged,
+        "message": f"{created} HR data added and {updated} updated successfully"
+    }
 
-            if to_update:
-                employee_details.objects.bulk_update(
-                    to_update,
-                    fields=[
-                        f.name for f in employee_details._meta.fields
-                        if f.name not in ("id", "mrdNo")
-                    ],
-                    batch_size=1000
-                )
 
-        return JsonResponse({
-            "created": len(to_create),
-            "updated": len(to_update),
-            "message": f"{len(to_create)} HR data added and {len(to_update)} updated successfully"
-        }, status=200)
+@csrf_exempt
+def hrupload(request, data_type):
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST allowed"}, status=405)
+
+    try:
+        data_type = data_type.lower()
+        if data_type not in ["employee", "contractor", "visitor"]:
+            return JsonResponse({"error": "Invalid data type"}, status=400)
+
+        if "file" not in request.FILES:
+            return JsonResponse({"error": "File missing"}, status=400)
+
+        if wants_background(request):
+            return queue_import(request, ImportJob.Kind.HR, request.FILES["file"], {"data_type": data_type})
+
+        with transaction.atomic():
+            result = import_hr_file(request.FILES["file"], {"data_type": data_type})
+        return JsonResponse(result, status=200)
 
     except Exception as e:
         logger.exception("HR Upload Failed")
@@ -7863,11 +8072,21 @@ MRI_MAP = {
     'mri_Lower_limb_comments':'MRI_Lower limb_COMMENTS (If Abnormal)',
 }
 
-def parse_hierarchical_excel_py(worksheet):
+EXCEL_HEADER_ROWS = 3
+IMPORT_BATCH_SIZE = 500
+
 
-    header_row1 = [cell.value for cell in worksheet[1]]
-    header_row2 = [cell.value for cell in worksheet[2]]
-    header_row3 = [cell.value for cell in worksheet[3]]
+def iter_hierarchical_excel_rows(worksheet):
+    """
+    Lazily yields (excel_row_number, row_data) for every non-empty data row of
+    a sheet with three header rows. Works on read-only worksheets, so only the
+    current row is held in memory.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header_rows = [list(next(rows, ())) for _ in range(EXCEL_HEADER_ROWS)]
+    width = max(len(r) for r in header_rows)
+    # Read-only sheets may trim trailing empty cells
+    header_row1, header_row2, header_row3 = [r + [None] * (width - len(r)) for r in header_rows]
 
     combined_headers = []
     last_l1_header = ''
@@ -7884,20 +8103,32 @@ def parse_hierarchical_excel_py(worksheet):
         full_header = '_'.join(filter(None, [str(h).strip() for h in [l1_header, l2_header, l3_header]]))
         combined_headers.append(full_header)
     
-    json_data = []
-    for row_cells in worksheet.iter_rows(min_row=4):
+    for row_number, row_values in enumerate(rows, start=EXCEL_HEADER_ROWS + 1):
         row_data = {}
-        for i, cell in enumerate(row_cells):
+        for i, cell_value in enumerate(row_values):
             if i < len(combined_headers):
-                cell_value = cell.value
                 if isinstance(cell_value, datetime):
                     cell_value = cell_value.strftime('%Y-%m-%d')
                 row_data[combined_headers[i]] = cell_value
 
         if any(val is not None and str(val).strip() != '' for val in row_data.values()):
-            json_data.append(row_data)
-            
-    return json_data
+            yield row_number, row_data
+
+
+def parse_hierarchical_excel_py(worksheet):
+    return [row_data for _, row_data in iter_hierarchical_excel_rows(worksheet)]
+
+
+def batched(iterable, size):
+    """ Yields lists of up to `size` items without materialising the iterable. """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def _populate_data(model, model_map, row_data):
@@ -7949,17 +8180,115 @@ def _populate_data(model, model_map, row_data):
     return instance_data
 
     
+def _visit_lookup(employee, entry_date):
+    return {
+        'emp_no': employee.emp_no,
+        'aadhar': employee.aadhar,
+        'entry_date': entry_date,
+        'mrdNo': employee.mrdNo, # This is the crucial link you asked for
+    }
+
+
 def process_model_data(model, model_map, row_data, employee, entry_date):
     
     data = _populate_data(model, model_map, row_data)
     if data:
-        model.objects.update_or_create(
+        model.objects.update_or_create(**_visit_lookup(employee, entry_date), defaults=data)
+
+
+def queue_model_data(upserters, model, model_map, row_data, employee, entry_date):
+    """ Batched process_model_data: queues the row on the model's BulkUpserter, written on flush(). """
+    data = _populate_data(model, model_map, row_data)
+    if data:
+        if model not in upserters:
+            upserters[model] = BulkUpserter(model)
+        upserters[model].add(_visit_lookup(employee, entry_date), data)
+
+
+def _camp_key(aadhar, year, batch, hospital_name):
+    return tuple('' if value is None else str(value).strip() for value in (aadhar, year, batch, hospital_name))
+
+
+def _camp_match_key(key):
+    """ A camp key as the MySQL collation compares it: ignoring case and surrounding spaces. """
+    return tuple(value.strip().casefold() for value in key)
+
+
+def resolve_camp_employees(keys):
+    """
+    Visit record for each (aadhar, year, batch, hospitalName) key of an upload
+    batch: the newest record matching all four keys, else a copy of the
+    worker's first record re-stamped for this camp with a newly reserved MRD
+    number (with its Dashboard and FitnessAssessment rows), else None when the
+    Aadhar is unknown. Repeated keys share one record, as they did when every
+    row queried the table itself. Keys compare case-insensitively, as the
+    per-row query did through the MySQL collation; a clone keeps the
+    spelling of the upload.
+    """
+    wanted = {_camp_match_key(key) for key in keys}
+    matches, first_records = {}, {}
+    records = employee_details.objects.filter(aadhar__in={key[0] for key in keys}).order_by('id')
+    for record in records.iterator(chunk_size=IMPORT_BATCH_SIZE):
+        key = _camp_match_key(_camp_key(record.aadhar, record.year, record.batch, record.hospitalName))
+        first_records.setdefault(key[0], record)
+        if key in wanted:
+            matches[key] = record
+
+    resolved, clones = [], []
+    for key in keys:
+        match_key = _camp_match_key(key)
+        employee = matches.get(match_key)
+        if employee is None and match_key[0] in first_records:
+            employee = copy.copy(first_records[match_key[0]])
+            employee.pk = None
+            employee.id = None
+            employee.year, employee.batch, employee.hospitalName = key[1:]
+            employee.type_of_visit = "Preventive"
+            employee.register = "Annual / Periodical"
+            employee.purpose = "Medical Examination"
+            if not employee.profilepic:
+                employee.profilepic_url = ''
+            matches[match_key] = employee
+            clones.append(employee)
+        resolved.append(employee)
+    if not clones:
+        return resolved
+
+    for employee, mrd_no in zip(clones, sequences.mrd_numbers(len(clones), date.today())):
+        employee.mrdNo = mrd_no
+    employee_details.objects.bulk_create(clones, batch_size=IMPORT_BATCH_SIZE)
+    Dashboard.objects.bulk_create([
+        Dashboard(
+            mrdNo=employee.mrdNo,
+            type_of_visit=employee.type_of_visit,
+            register=employee.register,
+            purpose=employee.purpose,
+            hospitalName=employee.hospitalName,
+            batch=employee.batch,
+            year=employee.year,
+            emp_no=employee.emp_no,
+            type=employee.type,
+            entry_date=employee.entry_date,
+            status=employee.status,
+            date=timezone.now().date(),
+            visitOutcome="Annual Checkup Completed",
+            aadhar=employee.aadhar,
+        )
+        for employee in clones
+    ], batch_size=IMPORT_BATCH_SIZE)
+    FitnessAssessment.objects.bulk_create([
+        FitnessAssessment(
+            mrdNo=employee.mrdNo,
+            status=FitnessAssessment.StatusChoices.COMPLETED,
             emp_no=employee.emp_no,
             aadhar=employee.aadhar,
-            entry_date=entry_date,
-            mrdNo=employee.mrdNo, # This is the crucial link you asked for
-            defaults=data
         )
+        for employee in clones
+    ], batch_size=IMPORT_BATCH_SIZE)
+    # bulk_create sends no post_save, so move the pointers here
+    for model in (employee_details, Dashboard, FitnessAssessment):
+        latest_records.refresh(model, {employee.aadhar for employee in clones})
+    return resolved
 # ==============================================================================
 # MAIN UPLOAD VIEW (HANDLES FILE UPLOAD)
 # ==============================================================================
@@ -7969,8 +8298,12 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
+import copy
+import itertools
 import openpyxl
 
+from .bulk import BulkUpserter
+
 # Make sure to import all your models and maps
 # from .models import employee_details, vitals, heamatalogy, ...etc
 # from .maps import BASIC_DETAILS_MAP, VITALS_MAP, HAEMATOLOGY_MAP, ...etc
@@ -7979,19 +8312,170 @@ import openpyxl
 # ==============================================================================
 # MAIN UPLOAD VIEW (HANDLES FILE UPLOAD)
 # ==============================================================================
+def import_medical_rows(rows, progress=None):
+    """
+    Imports parsed medical camp rows ((row_number, row_data) pairs) batch by
+    batch, each batch in its own transaction. Returns (success_count,
+    error_count, errors); rows that fail are reported, not raised.
+    """
+    success_count = 0
+    error_count = 0
+    errors = []
+    for batch in batched(rows, IMPORT_BATCH_SIZE):
+        reported = len(errors)
+        counted = success_count
+        with transaction.atomic():
+            # Investigation rows of the batch are written together after the loop
+            upserters = {}
+            keyed_rows = []
+            for row_number, row in batch:
+                # Identifier for error messages
+                s_no_key = 'DETAILS_BASIC DETAILS_S.NO' # Make sure this matches your parsed header for S.No if it exists
+                row_identifier = f"Row {row_number}"
+
+                # --- Step 1: Extract Key Fields ---
+                try:
+                    aadhar_val = str(row.get(BASIC_DETAILS_MAP['aadhar'], '')).strip()
+                    year_val = str(row.get(BASIC_DETAILS_MAP['year'], '')).strip()
+                    batch_val = str(row.get(BASIC_DETAILS_MAP['batch'], '')).strip()
+                    hospital_val = str(row.get(BASIC_DETAILS_MAP['hospitalName'], '')).strip()
+
+                    # Validate that all 4 keys are present
+                    if not all([aadhar_val, year_val, batch_val, hospital_val]):
+                        missing = []
+                        if not aadhar_val: missing.append("Aadhar")
+                        if not year_val: missing.append("Year")
+                        if not batch_val: missing.append("Batch")
+                        if not hospital_val: missing.append("Hospital")
+
+                        errors.append(f"{row_identifier}: Missing required fields: {', '.join(missing)}")
+                        error_count += 1
+                        continue
+
+                except Exception as e:
+                    errors.append(f"{row_identifier}: Data extraction error: {e}")
+                    error_count += 1
+                    continue
+
+                keyed_rows.append((row_number, row, (aadhar_val, year_val, batch_val, hospital_val)))
+
+            # --- Step 2: Resolve the visit records of the whole batch at once ---
+            try:
+                with transaction.atomic():
+                    employees = resolve_camp_employees([key for _, _, key in keyed_rows])
+            except Exception as e:
+                errors.append(f"Rows {batch[0][0]}-{batch[-1][0]}: Database query error: {e}")
+                error_count += len(keyed_rows)
+                employees = []
+
+            for (row_number, row, _), employee in zip(keyed_rows, employees):
+                row_identifier = f"Row {row_number}"
+                if not employee:
+                    continue
+
+                # --- Step 3: Check the visit has an MRD Number ---
+                current_mrd = employee.mrdNo
+                current_entry_date = employee.entry_date
+
+                if not current_mrd:
+                    errors.append(f"{row_identifier}: Employee found but MRD Number is missing in database.")
+                    error_count += 1
+                    continue
+                # assessment_data = FitnessAssessment.objects.filter(
+                #     mrdNo = current_mrd)
+                # if not assessment_data.exists():
+                #     errors.append(f"{row_identifier}: No FitnessAssessment record found for MRD Number {current_mrd}.")
+                #     error_count += 1
+                #     continue
+                # assessment_data.status = FitnessAssessment.StatusChoices.COMPLETED
+                # assessment_data.save()
+
+                # --- Step 4: Process Medical Data ---
+                # The employee object passed here already contains the correct mrdNo and basic info
+
+                try:
+                    queue_model_data(upserters, heamatalogy, HAEMATOLOGY_MAP, row, employee, current_entry_date)
+                    queue_model_data(upserters, RoutineSugarTests, SUGAR_TESTS_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, RenalFunctionTest, RENAL_FUNCTION_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, LipidProfile, LIPID_PROFILE_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, LiverFunctionTest, LIVER_FUNCTION_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, ThyroidFunctionTest, THYROID_FUNCTION_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, AutoimmuneTest, AUTOIMMUNE_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, CoagulationTest, COAGULATION_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, EnzymesCardiacProfile, ENZYMES_CARDIAC_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, UrineRoutineTest, URINE_ROUTINE_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, SerologyTest, SEROLOGY_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, MotionTest, MOTION_TEST_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, CultureSensitivityTest, CULTURE_SENSITIVITY_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, MensPack, MENS_PACK_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, WomensPack, WOMENS_PACK_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, OccupationalProfile, OCCUPATIONAL_PROFILE_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, OthersTest, OTHERS_TEST_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, OphthalmicReport, OPHTHALMIC_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, XRay, XRAY_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, USGReport, USG_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, CTReport, CT_MAP, row, employee, current_entry_date)
+                    # queue_model_data(upserters, MRIReport, MRI_MAP, row, employee, current_entry_date)
+
+                    success_count += 1
+
+                except Exception as e:
+                    # Catch model saving errors
+                    errors.append(f"{row_identifier}: Error saving test results: {e}")
+                    error_count += 1
+                    continue
+
+            try:
+                with transaction.atomic():
+                    for upserter in upserters.values():
+                        upserter.flush()
+            except Exception as e:
+                # The batch's queued rows were counted as successes but none of them was written
+                queued = success_count - counted
+                errors.append(f"Rows {batch[0][0]}-{batch[-1][0]}: Error saving test results for {queued} row(s): {e}")
+                success_count -= queued
+                error_count += queued
+
+        if progress is not None:
+            progress.advance(len(batch), errors[reported:])
+    return success_count, error_count, errors
+
+
+def import_medical_file(upload, params, progress=None):
+    """ Background job entry point: imports a whole medical camp workbook, committing batch by batch. """
+    workbook = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.active
+        if progress is not None and worksheet.max_row:
+            progress.set_total(max(worksheet.max_row - EXCEL_HEADER_ROWS, 0))
+        success_count, error_count, errors = import_medical_rows(iter_hierarchical_excel_rows(worksheet), progress)
+    finally:
+        workbook.close()
+    return {
+        'success_count': success_count,
+        'error_count': error_count,
+        'message': f'Processed {success_count} records, {error_count} failed.',
+    }
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class MedicalDataUploadView(View):
     def post(self, request, *args, **kwargs):
         uploaded_file = request.FILES.get('file')      
         if not uploaded_file:
             return JsonResponse({'status': 'error', 'message': 'No file was uploaded.'}, status=400)
+        if wants_background(request):
+            return queue_import(request, ImportJob.Kind.MEDICAL, uploaded_file)
 
         try:
-            workbook = openpyxl.load_workbook(uploaded_file, data_only=True)
+            # Read-only mode streams rows from the file instead of building the whole sheet in memory
+            workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
             worksheet = workbook.active
-            json_data = parse_hierarchical_excel_py(worksheet)
+            rows = iter_hierarchical_excel_rows(worksheet)
+            first_row = next(rows, None)
         
-            if not json_data:
+            if first_row is None:
+                workbook.close()
                 return JsonResponse({'status': 'error', 'message': 'Excel file is empty.'}, status=400)
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': f'Failed to parse Excel file: {e}'}, status=400)
@@ -7999,156 +8483,10 @@ class MedicalDataUploadView(View):
         success_count = 0
         error_count = 0
         errors = []
-        x = 1
         try:
             with transaction.atomic():
-                for i, row in enumerate(json_data):
-                    # Identifier for error messages
-                    s_no_key = 'DETAILS_BASIC DETAILS_S.NO' # Make sure this matches your parsed header for S.No if it exists
-                    row_identifier = f"Row {i + 4}"
-
-                    # --- Step 1: Extract Key Fields ---
-                    try:
-                        aadhar_val = str(row.get(BASIC_DETAILS_MAP['aadhar'], '')).strip()
-                        year_val = str(row.get(BASIC_DETAILS_MAP['year'], '')).strip()
-                        batch_val = str(row.get(BASIC_DETAILS_MAP['batch'], '')).strip()
-                        hospital_val = str(row.get(BASIC_DETAILS_MAP['hospitalName'], '')).strip()
-
-                        # Validate that all 4 keys are present
-                        if not all([aadhar_val, year_val, batch_val, hospital_val]):
-                            missing = []
-                            if not aadhar_val: missing.append("Aadhar")
-                            if not year_val: missing.append("Year")
-                            if not batch_val: missing.append("Batch")
-                            if not hospital_val: missing.append("Hospital")
-                            
-                            errors.append(f"{row_identifier}: Missing required fields: {', '.join(missing)}")
-                            error_count += 1
-                            continue
-
-                    except Exception as e:
-                        errors.append(f"{row_identifier}: Data extraction error: {e}")
-                        error_count += 1
-                        continue
-
-                    # --- Step 2: Fetch the specific Employee Record using ALL 4 Keys ---
-                    try:
-                        # We use .filter().first() or .get() to find the specific visit record
-                        # Note: Field names inside filter() must match your employee_details model exactly
-                        employee = employee_details.objects.filter(
-                            aadhar=aadhar_val,
-                            year=year_val,
-                            batch=batch_val,
-                            hospitalName=hospital_val 
-                        ).last()
-
-                        if not employee:
-                            employee = employee_details.objects.filter(
-                            aadhar=aadhar_val
-                            ).first()
-                            if not employee:
-                                continue
-                            employee.year=year_val
-                            employee.batch=batch_val
-                            employee.hospitalName=hospital_val
-                            employee.type_of_visit = "Preventive"
-                            employee.register = "Annual / Periodical"
-                            employee.purpose = "Medical Examination"
-                            employee.pk = None
-                            employee.id = None
-                            mrd_no = str(x) + "12012026"
-                            if(x > 9999):
-                                mrd_no = "0"+ str(mrd_no)
-                            elif(x > 999):
-                                mrd_no = "00"+ str(mrd_no)
-                            elif(x > 99):
-                                mrd_no = "000"+ str(mrd_no)
-                            elif(x > 9):
-                                mrd_no = "0000"+ str(mrd_no)
-                            else:
-                                mrd_no = "00000"+ str(mrd_no)
-                            x += 1
-                            employee.mrdNo = mrd_no
-                            employee.save()
-                            Dashboard.objects.create(
-                                mrdNo = employee.mrdNo,
-                                type_of_visit = employee.type_of_visit,
-                                register = employee.register,
-                                purpose = employee.purpose,
-                                hospitalName = employee.hospitalName,
-                                batch = employee.batch,
-                                year = employee.year,
-                                emp_no = employee.emp_no,
-                                type = employee.type,
-                                entry_date = employee.entry_date,
-                                status = employee.status,
-                                date = timezone.now().date(),
-                                visitOutcome = "Annual Checkup Completed",
-                                aadhar = employee.aadhar
-                            )
-                            FitnessAssessment.objects.create(
-                                mrdNo = employee.mrdNo,
-                                status = FitnessAssessment.StatusChoices.COMPLETED,
-                                emp_no = employee.emp_no,
-                                aadhar = employee.aadhar
-                            )
-                        
-                        current_mrd = employee.mrdNo
-                        current_entry_date = employee.entry_date
-                        
-                        if not current_mrd:
-                            errors.append(f"{row_identifier}: Employee found but MRD Number is missing in database.")
-                            error_count += 1
-                            continue
-                        # assessment_data = FitnessAssessment.objects.filter(
-                        #     mrdNo = current_mrd)
-                        # if not assessment_data.exists():
-                        #     errors.append(f"{row_identifier}: No FitnessAssessment record found for MRD Number {current_mrd}.")
-                        #     error_count += 1
-                        #     continue
-                        # assessment_data.status = FitnessAssessment.StatusChoices.COMPLETED
-                        # assessment_data.save()
-
-                    except Exception as e:
-                        errors.append(f"{row_identifier}: Database query error: {e}")
-                        error_count += 1
-                        continue
-
-                    # --- Step 4: Process Medical Data ---
-                    # The employee object passed here already contains the correct mrdNo and basic info
-                    
-                    try:
-                        process_model_data(heamatalogy, HAEMATOLOGY_MAP, row, employee, current_entry_date)
-                        process_model_data(RoutineSugarTests, SUGAR_TESTS_MAP, row, employee, current_entry_date)
-                        # process_model_data(RenalFunctionTest, RENAL_FUNCTION_MAP, row, employee, current_entry_date)
-                        # process_model_data(LipidProfile, LIPID_PROFILE_MAP, row, employee, current_entry_date)
-                        # process_model_data(LiverFunctionTest, LIVER_FUNCTION_MAP, row, employee, current_entry_date)
-                        # process_model_data(ThyroidFunctionTest, THYROID_FUNCTION_MAP, row, employee, current_entry_date)
-                        # process_model_data(AutoimmuneTest, AUTOIMMUNE_MAP, row, employee, current_entry_date)
-                        # process_model_data(CoagulationTest, COAGULATION_MAP, row, employee, current_entry_date)
-                        # process_model_data(EnzymesCardiacProfile, ENZYMES_CARDIAC_MAP, row, employee, current_entry_date)
-                        # process_model_data(UrineRoutineTest, URINE_ROUTINE_MAP, row, employee, current_entry_date)
-                        # process_model_data(SerologyTest, SEROLOGY_MAP, row, employee, current_entry_date)
-                        # process_model_data(MotionTest, MOTION_TEST_MAP, row, employee, current_entry_date)
-                        # process_model_data(CultureSensitivityTest, CULTURE_SENSITIVITY_MAP, row, employee, current_entry_date)
-                        # process_model_data(MensPack, MENS_PACK_MAP, row, employee, current_entry_date)
-                        # process_model_data(WomensPack, WOMENS_PACK_MAP, row, employee, current_entry_date)
-                        # process_model_data(OccupationalProfile, OCCUPATIONAL_PROFILE_MAP, row, employee, current_entry_date)
-                        # process_model_data(OthersTest, OTHERS_TEST_MAP, row, employee, current_entry_date)
-                        # process_model_data(OphthalmicReport, OPHTHALMIC_MAP, row, employee, current_entry_date)
-                        # process_model_data(XRay, XRAY_MAP, row, employee, current_entry_date)
-                        # process_model_data(USGReport, USG_MAP, row, employee, current_entry_date)
-                        # process_model_data(CTReport, CT_MAP, row, employee, current_entry_date)
-                        # process_model_data(MRIReport, MRI_MAP, row, employee, current_entry_date)
-                        
-                        success_count += 1
+                success_count, error_count, errors = import_medical_rows(itertools.chain([first_row], rows))
 
-                    except Exception as e:
-                        # Catch model saving errors
-                        errors.append(f"{row_identifier}: Error saving test results: {e}")
-                        error_count += 1
-                        continue
-                
                 # If you want to strictly reject the file if ANY row fails:
                 if error_count > 0:
                     raise Exception(f"Validation/Processing failed for {error_count} row(s).")
@@ -8161,6 +8499,8 @@ class MedicalDataUploadView(View):
                 'error_count': error_count,
                 'errors': errors,
             }, status=400)
+        finally:
+            workbook.close()
 
         return JsonResponse({
             'status': 'success',
@@ -8754,6 +9094,8 @@ def update_employee_data(request):
             # This generates a SQL UPDATE statement directly.
             # It handles Primary Key updates correctly (renaming) and prevents "INSERT" behavior.
             rows_affected = employee_details.objects.filter(aadhar=aadhar).update(**{field: new_value})
+            # QuerySet.update() sends no post_save; mark the worker's pointer as changed
+            latest_records.touch(employee_details, [aadhar])
 
             if rows_affected > 0:
                 return JsonResponse({'success': True, 'message': 'Updated successfully'}, status=200)
@@ -8780,6 +9122,55 @@ from django.db.models import Q, Max, Subquery, OuterRef
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from .models import *  # Ensure all your models are imported
+from .cohort import CohortPlanner
+from .bitmaps import CohortQueryError, cohort_index
+from .numeric import numeric_lookup, parse_numeric
+
+
+def range_filter(model, param, low, high):
+    """
+    Range criterion on a measurement. Compares the indexed numeric shadow
+    column when the model has one and both bounds are numbers; otherwise falls
+    back to comparing the text column.
+    """
+    field = numeric_lookup(model, param)
+    low_num, high_num = parse_numeric(low), parse_numeric(high)
+    if field != param and low_num is not None and high_num is not None:
+        return Q(**{f"{field}__gte": low_num, f"{field}__lte": high_num})
+    return Q(**{f"{param}__gte": low, f"{param}__lte": high})
+
+INVESTIGATION_FILTER_MODELS = {
+    'heamatalogy': heamatalogy,
+    'routinesugartests': RoutineSugarTests,
+    'lipidprofile': LipidProfile,
+    'liverfunctiontest': LiverFunctionTest,
+    'thyroidfunctiontest': ThyroidFunctionTest,
+    'renalfunctiontests_and_electrolytes': RenalFunctionTest,
+    'urineroutinetest': UrineRoutineTest,
+    'autoimmunetest': AutoimmuneTest,
+    'coagulationtest': CoagulationTest,
+    'enzymescardiacprofile': EnzymesCardiacProfile,
+    'serologytest': SerologyTest,
+    'motiontest': MotionTest,
+    'culturesensitivitytest': CultureSensitivityTest,
+    'menspack' : MensPack,
+    'womenspack' : WomensPack,
+    'occupationalprofile': OccupationalProfile,
+    'otherstest': OthersTest,
+    'opthalmicreport': OphthalmicReport,
+    'xray': XRay,
+    'usgreport' : USGReport,
+    'ctreport' : CTReport,
+    'mrireport' : MRIReport,
+}
+
+STATUTORY_FILTER_MODELS = {
+    'Form17': Form17,
+    'Form38': Form38,
+    'Form39': Form39,
+    'Form40': Form40,
+    'Form27': Form27,
+}
 
 @csrf_exempt
 def get_filtered_data(request):
@@ -8790,12 +9181,7 @@ def get_filtered_data(request):
         filters_map = json.loads(request.body)
         
         # 1. Start with the latest record for every employee
-        latest_ids = (
-            employee_details.objects.values("aadhar")
-            .annotate(latest_id=Max("id"))
-            .values_list("latest_id", flat=True)
-        )
-        queryset = employee_details.objects.filter(id__in=latest_ids)
+        queryset = employee_details.objects.filter(id__in=latest_records.latest_ids(employee_details))
 
         # 2. Basic Employee Details Filters
         if filters_map.get('role'):
@@ -8841,104 +9227,69 @@ def get_filtered_data(request):
                 if filters_map.get('from'): queryset = queryset.filter(since_date__gte=filters_map['from'])
                 if filters_map.get('to'): queryset = queryset.filter(since_date__lte=filters_map['to'])
 
-        # 3. Vitals Filters (Subquery)
+        # 3. Clinical filters are collected per table and compiled by the
+        #    cohort planner into one subquery per table (see backend/cohort.py)
+        planner = CohortPlanner()
+
+        # Vitals Filters
         for key, val in filters_map.items():
             if key.startswith('param_'):
                 param = val.get('param')
                 if val.get('value'): # BMI Category Case
-                    v_aadhars = vitals.objects.filter(**{f"{param}_status__iexact": val.get('value')}).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=v_aadhars)    
+                    planner.require(vitals, Q(**{f"{param}_status__iexact": val.get('value')}))
                 else:
-                    v_query = Q(**{f"{param}__gte": val.get('from'), f"{param}__lte": val.get('to')})
-                    v_aadhars = vitals.objects.filter(v_query).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=v_aadhars)
+                    planner.require(vitals, range_filter(vitals, param, val.get('from'), val.get('to')))
 
         
         for habit in ['smoking', 'alcohol', 'paan/beetle']:
             if filters_map.get(habit):
                 # Search inside the JSON structure: {"smoking": {"yesNo": "Yes"}}
-                print("Applying Habit Filter:", habit, filters_map[habit])
-                mh_aadhars = MedicalHistory.objects.filter(
-                    personal_history__contains={habit: {"yesNo": filters_map[habit]}}
-                ).values_list('aadhar', flat=True)
-                queryset = queryset.filter(aadhar__in=mh_aadhars)
+                planner.require(MedicalHistory, Q(personal_history__contains={habit: {"yesNo": filters_map[habit]}}))
 
         # Diet
         if filters_map.get('diet'):
-            mh_aadhars = MedicalHistory.objects.filter(
-                personal_history__diet__contains=filters_map['diet']
-            ).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=mh_aadhars)
-
-        if filters_map.get('drugAllergy'):
-            print("Applying Drug Allergy Filter:", filters_map['drugAllergy'])
-            mh_aadhars = MedicalHistory.objects.filter(
-                allergy_fields__contains= {"drug": {"yesNo": filters_map['drugAllergy']}}
-            ).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=mh_aadhars)
-
-        if filters_map.get('foodAllergy'):
-            print("Applying Food Allergy Filter:", filters_map['foodAllergy'])
-            mh_aadhars = MedicalHistory.objects.filter(
-                allergy_fields__contains= {"food": {"yesNo": filters_map['foodAllergy']}}
-            ).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=mh_aadhars)
-
-        if filters_map.get('otherAllergies'):
-            print("Applying Other Allergy Filter:", filters_map['otherAllergies'])
-            mh_aadhars = MedicalHistory.objects.filter(
-                allergy_fields__contains= {"others": {"yesNo": filters_map['otherAllergies']}}
-            ).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=mh_aadhars)
+            planner.require(MedicalHistory, Q(personal_history__diet__contains=filters_map['diet']))
+
+        for filter_key, allergy in [('drugAllergy', 'drug'), ('foodAllergy', 'food'), ('otherAllergies', 'others')]:
+            if filters_map.get(filter_key):
+                planner.require(MedicalHistory, Q(allergy_fields__contains={allergy: {"yesNo": filters_map[filter_key]}}))
 
         # Personal History Conditions (e.g., personal_HTN)
         for key, val in filters_map.items():
             if key.startswith('personal_'):
                 condition = key.replace('personal_', '')
                 # Filter if the medical_data JSON has entries for this condition
-                mh_aadhars = MedicalHistory.objects.filter(
-                    medical_data__has_key=condition
-                ).values_list('aadhar', flat=True)
                 if val == 'No':
-                    queryset = queryset.exclude(aadhar__in=mh_aadhars)
+                    planner.exclude(MedicalHistory, Q(medical_data__has_key=condition))
                 else:
-                    queryset = queryset.filter(aadhar__in=mh_aadhars)
+                    planner.require(MedicalHistory, Q(medical_data__has_key=condition))
 
         # 5. Fitness Assessment
         for key, val in filters_map.items():
             if key.startswith('fitness_'):
                 # val is an object like {"tremors": "Positive", "overall_fitness": "fit"}
                 f_query = Q()
-                print("Applying Fitness Filter:", val)
                 for f_key, f_val in val.items():
                     if f_key == "job_nature":
                         f_query &= Q(**{f"{f_key}__icontains": f_val})
                     else:
                         f_query &= Q(**{f"{f_key}__iexact": f_val})
-                f_aadhars = FitnessAssessment.objects.filter(f_query).values_list('aadhar', flat=True)
-                queryset = queryset.filter(aadhar__in=f_aadhars)
+                planner.require(FitnessAssessment, f_query)
 
         # 6. Special Cases & Shifting Ambulance
         if filters_map.get('specialCase'):
             sc_val = filters_map['specialCase']
-            sc_aadhars = FitnessAssessment.objects.filter(special_cases__iexact=sc_val).values_list('aadhar', flat=True)
-            c_aadhars = Consultation.objects.filter(special_cases__iexact=sc_val).values_list('aadhar', flat=True)
-            queryset = queryset.filter(Q(aadhar__in=sc_aadhars) | Q(aadhar__in=c_aadhars))
+            planner.require_any(
+                (FitnessAssessment, Q(special_cases__iexact=sc_val)),
+                (Consultation, Q(special_cases__iexact=sc_val)),
+            )
 
         if filters_map.get('shiftingAmbulance'):
             sa = filters_map['shiftingAmbulance']
+            sa_query = Q(shifting_required__iexact=sa['val'])
             if sa.get('from') and sa.get('to'):
-                sa_aadhars = Consultation.objects.filter(
-                    shifting_required__iexact=sa['val'],
-                    entry_date__gte=sa['from'],
-                    entry_date__lte=sa['to']
-                ).values_list('aadhar', flat=True)
-                queryset = queryset.filter(aadhar__in=sa_aadhars)
-            else:
-                sa_aadhars = Consultation.objects.filter(
-                    shifting_required__iexact=sa['val']
-                ).values_list('aadhar', flat=True)
-                queryset = queryset.filter(aadhar__in=sa_aadhars)
+                sa_query &= Q(entry_date__gte=sa['from'], entry_date__lte=sa['to'])
+            planner.require(Consultation, sa_query)
 
 
         # 8. Statutory Forms
@@ -8948,9 +9299,7 @@ def get_filtered_data(request):
             sf_query = Q()
             if sf.get('from'): sf_query &= Q(entry_date__gte=sf['from'])
             if sf.get('to'): sf_query &= Q(entry_date__lte=sf['to'])
-            
-            sf_aadhars = form_model.objects.filter(sf_query).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=sf_aadhars)
+            planner.require(form_model, sf_query)
 
         # 9. Significant Notes
         if filters_map.get('significantNotes'):
@@ -8958,8 +9307,7 @@ def get_filtered_data(request):
             sn_query = Q()
             for sn_key, sn_val in sn.items():
                 sn_query &= Q(**{f"{sn_key}__iexact": sn_val})
-            sn_aadhars = SignificantNotes.objects.filter(sn_query).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=sn_aadhars)
+            planner.require(SignificantNotes, sn_query)
         
         if any(k in filters_map for k in ['disease', 'vaccine', 'vaccine_status']):
             v_query = Q()
@@ -8971,133 +9319,67 @@ def get_filtered_data(request):
                 v_query |= Q(vaccination__contains=[{'disease_name': val.capitalize()}])
             
             if filters_map.get('vaccine'):
-                print("Applying Vaccine Filter:", filters_map['vaccine'])
                 v_query &= Q(vaccination__contains=[{'prophylaxis': filters_map['vaccine']}])
             
             if filters_map.get('vaccine_status'):
                 v_query &= Q(vaccination__contains=[{'status': filters_map['vaccine_status']}])
 
-            vac_aadhars = VaccinationRecord.objects.filter(v_query).values_list('aadhar', flat=True)
-            queryset = queryset.filter(aadhar__in=vac_aadhars)
+            planner.require(VaccinationRecord, v_query)
         
         for key, value in filters_map.items():
             if key.startswith('investigation_'):
                 form_name = value.get('form')   # e.g., 'heamatalogy'
                 param = value.get('param')      # e.g., 'hemoglobin'
                 
-                # Dynamically find the model (handling case differences)
-                model_map = {
-                    'heamatalogy': heamatalogy,
-                    'routinesugartests': RoutineSugarTests,
-                    'lipidprofile': LipidProfile,
-                    'liverfunctiontest': LiverFunctionTest,
-                    'thyroidfunctiontest': ThyroidFunctionTest,
-                    'renalfunctiontests_and_electrolytes': RenalFunctionTest,
-                    'urineroutinetest': UrineRoutineTest,
-                    'autoimmunetest': AutoimmuneTest,
-                    'coagulationtest': CoagulationTest,
-                    'enzymescardiacprofile': EnzymesCardiacProfile,
-                    'urineroutinetest': UrineRoutineTest,
-                    'serologytest': SerologyTest,
-                    'motiontest': MotionTest,
-                    'culturesensitivitytest': CultureSensitivityTest,
-                    'menspack' : MensPack,
-                    'womenspack' : WomensPack,
-                    'occupationalprofile': OccupationalProfile,
-                    'otherstest': OthersTest,
-                    'opthalmicreport': OphthalmicReport,
-                    'xray': XRay,
-                    'usgreport' : USGReport,
-                    'ctreport' : CTReport,
-                    'mrireport' : MRIReport,    
-                }
-                
-                model_class = model_map.get(form_name.lower())
+                model_class = INVESTIGATION_FILTER_MODELS.get(form_name.lower())
                 if model_class:
                     inv_query = Q()
                     # Range filter (numeric)
                     if value.get('from') and value.get('to'):
-                        # Using icontains on the comments field as per your JS logic 
-                        # where values are often stored as strings in "param_comments"
-                        inv_query &= Q(**{f"{param}__gte": value['from']})
-                        inv_query &= Q(**{f"{param}__lte": value['to']})
+                        inv_query &= range_filter(model_class, param, value['from'], value['to'])
                     
                     # Status filter (Normal/Abnormal)
                     if value.get('status'):
-                        inv_query &= Q(**{f"{param}_comments__iexact": value['status']}) | Q(**{f"{param}_comments__iexact": value['status']})
+                        inv_query &= Q(**{f"{param}_comments__iexact": value['status']})
                     
-                    inv_aadhars = model_class.objects.filter(inv_query).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=inv_aadhars)
+                    planner.require(model_class, inv_query)
                 
             if key.startswith('referrals_'):
-                print("Applying Referral Filter:", key, value)
                 ref = value
-                ref_query = Q()
                 if ref.get('referred') == 'No':
                     ref_query = Q(referral__iexact='no') | Q(referral__isnull=True)
                 else:
-                    print("Applying Referral Filters:", ref)
                     ref_query = Q(referral__iexact='yes')
                     if ref.get('speciality'): ref_query &= Q(speciality__iexact=ref['speciality'])
                     if ref.get('hospitalName'): ref_query &= Q(hospital_name__icontains=ref['hospitalName'])
                     if ref.get('doctorName'): ref_query &= Q(doctor_name__icontains=ref['doctorName'])
-                
-                ref_aadhars = Consultation.objects.filter(ref_query).values_list('aadhar', flat=True)
-                queryset = queryset.filter(aadhar__in=ref_aadhars)
+                planner.require(Consultation, ref_query)
             
             if key.startswith('statutory_'):
-                print("Applying Statutory Filter:", key, value)
-                form_type = value.get('formType')
-                from_date = value.get('from')
-                to_date = value.get('to')
-                
-                
-                model_map = {
-                    'Form17': Form17,
-                    'Form38': Form38,
-                    'Form39': Form39,
-                    'Form40': Form40,
-                    'Form27': Form27,
-                }
-                
-                model_class = model_map.get(form_type)
+                model_class = STATUTORY_FILTER_MODELS.get(value.get('formType'))
                 if model_class:
                     stat_query = Q()
-                    
-                    if from_date and to_date:
-                        stat_query &= Q(entry_date__range=(from_date, to_date))
-                    
-                    stat_aadhars = model_class.objects.filter(stat_query).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=stat_aadhars)
+                    if value.get('from') and value.get('to'):
+                        stat_query &= Q(entry_date__range=(value['from'], value['to']))
+                    planner.require(model_class, stat_query)
 
             if key.startswith('significant_'):
-                print("Applying Significant Notes Filter:", key, value)
                 sn = value
                 if sn.get('special_case'):
-                    print("Filtering Significant Notes by special_case:", sn['special_case'])
-                    sn_aadhars = Consultation.objects.filter(special_cases__iexact=sn['special_case']).values_list('aadhar', flat=True)
-                    sn_aadhars = list(sn_aadhars)
-                    sn_aadhars.extend(FitnessAssessment.objects.filter(special_cases__iexact=sn['special_case']).values_list('aadhar', flat=True))
-                    queryset = queryset.filter(aadhar__in=sn_aadhars)
+                    planner.require_any(
+                        (Consultation, Q(special_cases__iexact=sn['special_case'])),
+                        (FitnessAssessment, Q(special_cases__iexact=sn['special_case'])),
+                    )
                 if sn.get('communicable_disease'):
-                    print("Filtering Significant Notes by communicable_disease:", sn['communicable_disease'])
-                    sn_aadhars = SignificantNotes.objects.filter(communicable_disease__iexact=sn['communicable_disease']).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=sn_aadhars)
+                    planner.require(SignificantNotes, Q(communicable_disease__iexact=sn['communicable_disease']))
                 if sn.get('incident_type'):
-                    print("Filtering Significant Notes by incident_type:", sn['incident_type'])
-                    sn_aadhars = SignificantNotes.objects.filter(incident_type__iexact=sn['incident_type']).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=sn_aadhars)
+                    planner.require(SignificantNotes, Q(incident_type__iexact=sn['incident_type']))
                 if sn.get('incident'):
-                    print("Filtering Significant Notes by incident:", sn['incident'])
-                    sn_aadhars = SignificantNotes.objects.filter(incident__icontains=sn['incident']).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=sn_aadhars)
+                    planner.require(SignificantNotes, Q(incident__icontains=sn['incident']))
                 if sn.get('illness_type'):
-                    print("Filtering Significant Notes by illness_type:", sn['illness_type'])
-                    sn_aadhars = SignificantNotes.objects.filter(illness_type__iexact=sn['illness_type']).values_list('aadhar', flat=True)
-                    queryset = queryset.filter(aadhar__in=sn_aadhars)
+                    planner.require(SignificantNotes, Q(illness_type__iexact=sn['illness_type']))
             
             if key.startswith('purpose_'):
-                print("Applying Purpose Filter:", key, value)
                 purpose = value
                 p_query = Q()
                 if purpose.get('type_of_vsit'):
@@ -9108,16 +9390,69 @@ def get_filtered_data(request):
                     p_query &= Q(date__gte=purpose['fromDate'])
                 if purpose.get('toDate'):
                     p_query &= Q(date__lte=purpose['toDate'])
+                planner.require(Dashboard, p_query)
 
-                apt_aadhars = Dashboard.objects.filter(p_query).values_list('aadhar', flat=True)
-                queryset = queryset.filter(aadhar__in=apt_aadhars)
+        queryset = planner.apply(queryset)
 
         # Final serialization
         results = list(queryset.values(
             "id", "aadhar", "emp_no", "name", "sex", "dob", "type", "status", "nationality"
         ).order_by("-id"))
 
-        return JsonResponse({'data': results, 'count': len(results)}, status=200)
+        response = {'data': results, 'count': len(results)}
+        if filters_map.get('explain'):
+            # Debug aid: the compiled per-table plan and the database's EXPLAIN output
+            response['plan'] = planner.describe()
+            response['explain'] = queryset.explain()
+        return JsonResponse(response, status=200)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 
+@csrf_exempt
+def cohort_query(request):
+    """
+    Cohort counts from the bitmap index (backend/bitmaps.py), over each worker's latest records.
+    GET  -> {"attributes": {attribute: {value: worker count}}}
+    POST -> body {"query": <expression>, "limit": 1000, "offset": 0}
+            returns {"count": n, "aadhars": [...page...]}
+    Expressions: {"attr": name, "value": v} | {"attr": name, "in": [...]} |
+                 {"and": [...]} | {"or": [...]} | {"not": <expression>}
+    """
+    try:
+        if request.method == "GET":
+            return JsonResponse({'attributes': cohort_index.value_counts()}, status=200)
+        if request.method != "POST":
+            return JsonResponse({'error': 'Invalid method'}, status=405)
+
+        body = json.loads(request.body or b"{}")
+        if not body.get('query'):
+            return JsonResponse({'error': 'query is required'}, status=400)
+        limit = int(body.get('limit', 1000))
+        offset = int(body.get('offset', 0))
+        aadhars = cohort_index.match(body['query'])
+        return JsonResponse({'count': len(aadhars), 'aadhars': aadhars[offset:offset + limit]}, status=200)
+
+    except (CohortQueryError, ValueError, TypeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        logger.exception("cohort_query failed: An unexpected error occurred.")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+# ------------------------------------------------------------------
+# Request metrics (see backend/metrics.py)
+# ------------------------------------------------------------------
+from .metrics import registry as metrics_registry
+
+
+@csrf_exempt
+def request_metrics(request):
+    """ GET: per-view timings of this process over the last metrics window. DELETE: start a new window. """
+    if request.method == "DELETE":
+        metrics_registry.reset()
+        return JsonResponse({"message": "Metrics reset"}, status=200)
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET and DELETE allowed"}, status=405)
+    return JsonResponse(metrics_registry.snapshot(), status=200)
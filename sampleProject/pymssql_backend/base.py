@@ -12,6 +12,8 @@ from django.db.backends.base.schema import BaseDatabaseSchemaEditor
 from django.db.backends.base.creation import BaseDatabaseCreation
 from django.db.utils import InterfaceError, OperationalError
 
+from . import pool as connection_pool
+
 
 class Database:
     InterfaceError = InterfaceError
@@ -19,7 +21,39 @@ class Database:
 
 
 class DatabaseFeatures(BaseDatabaseFeatures):
-    pass
+    # pymssql hands rows over as they arrive from the server, so fetchmany()
+    # holds one chunk at a time; DatabaseWrapper.chunked_cursor() gives the
+    # stream a connection of its own so the caller can keep querying meanwhile.
+    can_use_chunked_reads = True
+
+
+class StreamingCursor:
+    """
+    Cursor on a dedicated connection for QuerySet.iterator(). FreeTDS allows
+    one active result set per connection: streaming on the request's own
+    connection would cut the stream short as soon as the loop body ran
+    another query. The connection is handed back when the cursor closes.
+    """
+
+    def __init__(self, raw, release):
+        self._raw = raw
+        self._release = release
+        self._cursor = raw.cursor()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        try:
+            self._cursor.close()
+        finally:
+            self._release(raw)
 
 
 class DatabaseOperations(BaseDatabaseOperations):
@@ -40,6 +74,10 @@ class DatabaseOperations(BaseDatabaseOperations):
         else:
             return ""
 
+    def bulk_batch_size(self, fields, objs):
+        # SQL Server accepts at most 2100 parameters per statement
+        return max(2000 // max(len(fields), 1), 1)
+
 
 
 
@@ -116,29 +154,59 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             'port': int(settings_dict.get('PORT', 1433)),
         }
 
+    # Pool the connections of this wrapper come from; None unless OPTIONS['POOL'] is set
+    _pool = None
+
+    def pool_options(self):
+        """ The pool settings from OPTIONS['POOL'] ({} for True), or None to connect directly. """
+        options = self.settings_dict.get('OPTIONS', {}).get('POOL', False)
+        if options is False or options is None:
+            return None
+        return {} if options is True else options
+
     def get_new_connection(self, conn_params):
-        return pymssql.connect(**conn_params)
+        options = self.pool_options()
+        if options is None:
+            return pymssql.connect(**conn_params)
+        self._pool = connection_pool.get_pool(self.alias, conn_params, pymssql.connect, options)
+        return self._pool.acquire()
 
     def create_cursor(self, name=None):
         return self.connection.cursor()
 
+    def chunked_cursor(self):
+        # Another connection would not see this transaction's uncommitted rows
+        if self.in_atomic_block:
+            return self.cursor()
+        options = self.pool_options()
+        conn_params = self.get_connection_params()
+        if options is None:
+            raw, release = pymssql.connect(**conn_params), connection_pool.close_quietly
+        else:
+            pool = connection_pool.get_pool(self.alias, conn_params, pymssql.connect, options)
+            raw, release = pool.acquire(), pool.release
+        raw.autocommit(True)
+        return self._prepare_cursor(StreamingCursor(raw, release))
+
     def init_connection_state(self):
         pass
 
     def is_usable(self):
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-        except:
-            return False
-        return True
+        # The driver's connected flag stays True after the server drops the socket, so ask the server
+        return connection_pool.ping(self.connection)
 
     def _set_autocommit(self, autocommit):
         self.connection.autocommit(autocommit)
 
     def _close(self):
-        if self.connection is not None:
+        if self.connection is None:
+            return
+        if self._pool is None:
             self.connection.close()
+        elif self.errors_occurred and not self.is_usable():
+            # Broken by the error that occurred; free its slot instead of returning it
+            self._pool.discard(self.connection)
+        else:
+            self._pool.release(self.connection)
     
             
@@ -0,0 +1,215 @@
+"""
+Process-wide connection pool for pymssql_backend, off unless OPTIONS['POOL']
+is set.
+
+With CONN_MAX_AGE 0 Django closes its connection after every request; through
+the pool that "close" hands the pymssql connection back instead, so the next
+request skips the TCP and login handshake. Configure it in the DATABASES entry:
+
+    'OPTIONS': {
+        'POOL': {
+            'min_size': 1,        # idle connections kept even when past max_idle
+            'max_size': 10,       # open connections per process, idle or in use
+            'max_idle': 300,      # seconds an idle connection may sit before it is closed
+            'max_lifetime': 3600, # seconds before a connection is retired regardless
+            'timeout': 30,        # seconds to wait for a free connection when max_size are in use
+            'check_after': 0,     # idle seconds after which a checkout pings the server first
+        },
+    }
+
+'POOL': True uses the defaults below; without 'POOL' (or with False) every
+connection is opened directly, as before. Eviction happens on checkout and
+return; there is no background thread. By default every checkout pings the
+server (SELECT 1) before handing a connection out, which is still far cheaper
+than a new login. Raising check_after skips the ping for connections returned
+less than that many seconds ago, at the risk of handing out one the server
+has dropped meanwhile; connections returned after a database error are always
+pinged.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+POOL_DEFAULTS = {
+    'min_size': 1,
+    'max_size': 10,
+    'max_idle': 300,
+    'max_lifetime': 3600,
+    'timeout': 30,
+    'check_after': 0,
+}
+
+
+def is_connected(raw):
+    """
+    What the driver knows locally about the connection: True/False, or None
+    when it cannot tell. Only False is conclusive; a dropped socket still reads
+    True until the next round trip.
+    """
+    conn = getattr(raw, '_conn', None)  # pymssql keeps the _mssql connection here
+    connected = getattr(conn, 'connected', None)
+    return bool(connected) if connected is not None else None
+
+
+def ping(raw):
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+def close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+class _Entry:
+    __slots__ = ('raw', 'created_at', 'returned_at', 'suspect')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = self.returned_at = time.monotonic()
+        self.suspect = False
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size, max_size, max_idle, max_lifetime, timeout, check_after):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("POOL needs 1 <= max_size and min_size <= max_size")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle = deque()   # most recently returned on the right
+        self._in_use = {}      # id(raw) -> _Entry
+        self._cond = threading.Condition()
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use)
+
+    def stats(self):
+        with self._cond:
+            return {'idle': len(self._idle), 'in_use': len(self._in_use), 'max_size': self.max_size}
+
+    def _expired(self, entry, now):
+        return now - entry.created_at > self.max_lifetime
+
+    def _evict_idle(self, now):
+        """ Closes idle connections past max_idle (oldest first, down to min_size) or max_lifetime. """
+        kept = deque()
+        while self._idle:
+            entry = self._idle.popleft()
+            stale = now - entry.returned_at > self.max_idle and len(self._idle) + len(kept) >= self.min_size
+            if stale or self._expired(entry, now):
+                close_quietly(entry.raw)
+            else:
+                kept.append(entry)
+        self._idle = kept
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+                while self._idle:
+                    # Most recently used first, so surplus connections age out at the other end
+                    entry = self._idle.pop()
+                    needs_check = entry.suspect or now - entry.returned_at >= self.check_after
+                    if is_connected(entry.raw) is False or (needs_check and not ping(entry.raw)):
+                        close_quietly(entry.raw)
+                        continue
+                    entry.suspect = False
+                    self._in_use[id(entry.raw)] = entry
+                    return entry.raw
+                if self.size < self.max_size:
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise OperationalError(f"Connection pool exhausted: {self.max_size} connections in use")
+                self._cond.wait(remaining)
+            # Reserve the slot before connecting outside the lock
+            placeholder = object()
+            self._in_use[id(placeholder)] = None
+
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                del self._in_use[id(placeholder)]
+                self._cond.notify()
+            raise
+        with self._cond:
+            del self._in_use[id(placeholder)]
+            self._in_use[id(raw)] = _Entry(raw)
+        return raw
+
+    def release(self, raw, suspect=False):
+        """ Returns a connection; suspect ones (returned after an error) are pinged before their next use. """
+        with self._cond:
+            entry = self._in_use.pop(id(raw), None)
+            if entry is None:
+                close_quietly(raw)
+                return
+            now = time.monotonic()
+            if self._expired(entry, now) or is_connected(raw) is False:
+                close_quietly(raw)
+            else:
+                try:
+                    raw.rollback()  # drop whatever transaction the borrower left open
+                except Exception:
+                    close_quietly(raw)
+                else:
+                    entry.returned_at = now
+                    entry.suspect = suspect
+                    self._idle.append(entry)
+            self._cond.notify()
+
+    def discard(self, raw):
+        """ Closes a connection that must not be reused and frees its slot. """
+        with self._cond:
+            self._in_use.pop(id(raw), None)
+            close_quietly(raw)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                close_quietly(self._idle.pop().raw)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(alias, conn_params, connect, options):
+    """
+    The pool for a database alias and its connection parameters, created on
+    first use. Pools are per process: a forked worker starts with none.
+    """
+    global _pools_pid
+    key = (alias, tuple(sorted(conn_params.items())))
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            # Sockets inherited from the parent must not be shared; drop them without closing
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            config = {**POOL_DEFAULTS, **options}
+            pool = _pools[key] = ConnectionPool(lambda: connect(**conn_params), **config)
+        return pool
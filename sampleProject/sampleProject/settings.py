@@ -67,7 +67,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'backend.middleware.SimpleMiddleware',
+    'backend.middleware.RequestMetricsMiddleware',
 ]
 
 # CHANGED FROM OHC.urls